@@ -0,0 +1,224 @@
+"""
+Benchmark de la inactivación de fincas con miles de filas dependientes.
+
+Uso:
+    python -m benchmarks.bench_farm_deactivation --farms 5 --plots-per-farm 2000 \\
+        --collaborators-per-farm 500 --invitations-per-farm 500 --transactions 200000
+
+Genera con `benchmarks.datagen` fincas con muchos lotes, transacciones, colaboradores e
+invitaciones pendientes, y mide para cada finca dos formas de inactivarla, ambas dentro de una
+transacción que se revierte al final (así las dos ven los mismos datos):
+
+- `row_by_row`: carga cada fila dependiente en la sesión y cambia su estado una por una,
+  como hacía `delete_farm` antes de `utils.farm_deactivation`.
+- `set_based`: `utils.farm_deactivation.deactivate_farm`, un UPDATE por tabla.
+
+Reporta la mediana y el máximo del tiempo, las sentencias SQL ejecutadas y las filas afectadas.
+"""
+import sys
+import json
+import random
+import argparse
+import statistics
+import time
+from sqlalchemy import event
+from dataBase import SessionLocal, engine
+from models.models import Users, UserRoleFarm, Plots, Invitations, Notifications, Transactions, Farms
+from utils.pg_copy import copy_rows, reserve_ids
+from utils.farm_deactivation import deactivate_farm, DEACTIVATION_STATES
+from utils.state import get_state_id
+from benchmarks.datagen import generate_dataset, generate_users
+from benchmarks.seed import ensure_reference_data, BENCH_EMAIL_DOMAIN
+
+
+class StatementCounter:
+    """Cuenta las sentencias que ejecuta el engine mientras está activo."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self)
+
+
+def load_dependents(reference: dict, dataset: dict, collaborators: int, invitations: int, seed: int):
+    """
+    Agrega a cada finca del conjunto `collaborators` colaboradores activos e `invitations`
+    invitaciones pendientes con su notificación, cargados con COPY.
+    """
+    rng = random.Random(seed)
+    first_farm_id, last_farm_id = dataset["farm_ids"]
+    farm_ids = range(first_farm_id, last_farm_id + 1)
+    owner_ids = range(dataset["user_ids"][0], dataset["user_ids"][1] + 1)
+    operator_role = reference["roles"]["Operador de campo"]
+    active_urf = reference["user_role_farm_states"]["Activo"]
+    pending_invitation = reference["invitation_states"]["Pendiente"]
+    pending_notification = reference["notification_states"]["Pendiente"]
+    notification_type = reference["notification_types"]["Invitations"]
+    collaborator_count = len(farm_ids) * collaborators
+    invitation_count = len(farm_ids) * invitations
+
+    raw_connection = engine.raw_connection()
+    try:
+        cursor = raw_connection.cursor()
+        first_user_id = reserve_ids(cursor, Users.__tablename__, "user_id", collaborator_count)
+        first_invitation_id = reserve_ids(cursor, Invitations.__tablename__, "invitation_id", invitation_count)
+        raw_connection.commit()
+
+        copy_rows(cursor, Users.__tablename__,
+                  ["user_id", "name", "email", "password_hash", "verification_token", "session_token", "user_state_id"],
+                  generate_users(rng, reference, first_user_id, collaborator_count, f"{dataset['run_tag']}-collab"))
+        copy_rows(cursor, UserRoleFarm.__tablename__, ["role_id", "user_id", "farm_id", "user_role_farm_state_id"], (
+            (operator_role, first_user_id + i, farm_ids[i // collaborators], active_urf)
+            for i in range(collaborator_count)
+        ))
+        copy_rows(cursor, Invitations.__tablename__,
+                  ["invitation_id", "email", "suggested_role_id", "invitation_state_id", "farm_id", "inviter_user_id"], (
+            (first_invitation_id + i, f"invitado-{dataset['run_tag']}-{i}@{BENCH_EMAIL_DOMAIN}", operator_role,
+             pending_invitation, farm_ids[i // invitations], owner_ids[i // invitations])
+            for i in range(invitation_count)
+        ))
+        copy_rows(cursor, Notifications.__tablename__,
+                  ["message", "notification_date", "user_id", "invitation_id", "notification_type_id",
+                   "notification_state_id", "farm_id"], (
+            ("Invitación generada", "now", owner_ids[i // invitations], first_invitation_id + i, notification_type,
+             pending_notification, farm_ids[i // invitations])
+            for i in range(invitation_count)
+        ))
+        raw_connection.commit()
+        for model in (Users, UserRoleFarm, Invitations, Notifications):
+            cursor.execute(f"ANALYZE {model.__tablename__}")
+        raw_connection.commit()
+        cursor.close()
+    finally:
+        raw_connection.close()
+
+
+def deactivate_row_by_row(db, farm_id: int, include_transactions: bool) -> dict:
+    """Inactiva la finca cargando y modificando cada fila dependiente en la sesión."""
+    states = {key: get_state_id(db, name, entity) for key, (entity, name) in DEACTIVATION_STATES.items()}
+    affected = {}
+    farm = db.query(Farms).filter(Farms.farm_id == farm_id).first()
+    farm.farm_state_id = states["inactive_farm"]
+    affected["farms"] = 1
+
+    memberships = db.query(UserRoleFarm).filter(UserRoleFarm.farm_id == farm_id).all()
+    for membership in memberships:
+        membership.user_role_farm_state_id = states["inactive_urf"]
+    affected["user_role_farm"] = len(memberships)
+
+    plots = db.query(Plots).filter(Plots.farm_id == farm_id).all()
+    for plot in plots:
+        plot.plot_state_id = states["inactive_plot"]
+    affected["plots"] = len(plots)
+
+    if include_transactions:
+        transactions = db.query(Transactions).filter(Transactions.plot_id.in_([plot.plot_id for plot in plots])).all()
+        for transaction in transactions:
+            transaction.transaction_state_id = states["inactive_transaction"]
+        affected["transactions"] = len(transactions)
+
+    invitations = db.query(Invitations).filter(
+        Invitations.farm_id == farm_id,
+        Invitations.invitation_state_id == states["pending_invitation"]
+    ).all()
+    notifications = 0
+    for invitation in invitations:
+        invitation.invitation_state_id = states["rejected_invitation"]
+        for notification in db.query(Notifications).filter(
+            Notifications.invitation_id == invitation.invitation_id,
+            Notifications.notification_state_id == states["pending_notification"]
+        ):
+            notification.notification_state_id = states["answered_notification"]
+            notifications += 1
+    affected["invitations"] = len(invitations)
+    affected["notifications"] = notifications
+
+    db.flush()
+    return affected
+
+
+def measure(farm_ids, include_transactions: bool, repetitions: int) -> dict:
+    """Mide ambas estrategias sobre cada finca, revirtiendo la transacción después de cada una."""
+    strategies = {
+        "row_by_row": deactivate_row_by_row,
+        "set_based": lambda db, farm_id, include: deactivate_farm(db, farm_id, include_transactions=include),
+    }
+    results = {}
+    for name, strategy in strategies.items():
+        timings, statements, affected = [], [], None
+        for _ in range(repetitions):
+            for farm_id in farm_ids:
+                db = SessionLocal()
+                try:
+                    with StatementCounter() as counter:
+                        started = time.perf_counter()
+                        affected = strategy(db, farm_id, include_transactions)
+                        timings.append((time.perf_counter() - started) * 1000)
+                    statements.append(counter.count)
+                finally:
+                    db.rollback()
+                    db.close()
+        results[name] = {
+            "runs": len(timings),
+            "latency_ms": {"p50": round(statistics.median(timings), 2), "max": round(max(timings), 2)},
+            "statements": {"p50": statistics.median(statements), "max": max(statements)},
+            "affected_last_farm": affected,
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la inactivación de fincas")
+    parser.add_argument("--farms", type=int, default=5)
+    parser.add_argument("--plots-per-farm", type=int, default=2000)
+    parser.add_argument("--collaborators-per-farm", type=int, default=500)
+    parser.add_argument("--invitations-per-farm", type=int, default=500)
+    parser.add_argument("--transactions", type=int, default=200_000)
+    parser.add_argument("--include-transactions", action="store_true",
+                        help="Inactivar también las transacciones de los lotes")
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--run-tag", help="Etiqueta de los datos (por defecto s<semilla>); cambiarla para repetir una semilla")
+    parser.add_argument("--output", help="Guardar el resultado en este archivo JSON")
+    args = parser.parse_args(argv)
+
+    if args.farms <= 0 or args.plots_per_farm <= 0:
+        parser.error("--farms y --plots-per-farm deben ser positivos")
+
+    dataset = generate_dataset(
+        users=args.farms, farms_per_user=1, plots_per_farm=args.plots_per_farm,
+        transactions=args.transactions, notifications=0, seed=args.seed, run_tag=args.run_tag
+    )
+    db = SessionLocal()
+    try:
+        reference = ensure_reference_data(db)
+    finally:
+        db.close()
+    load_dependents(reference, dataset, args.collaborators_per_farm, args.invitations_per_farm, args.seed)
+
+    farm_ids = list(range(dataset["farm_ids"][0], dataset["farm_ids"][1] + 1))
+    results = {
+        "parameters": vars(args),
+        "strategies": measure(farm_ids, args.include_transactions, args.repetitions),
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    for name, result in results["strategies"].items():
+        print(f"{name}: p50={result['latency_ms']['p50']} ms, max={result['latency_ms']['max']} ms, "
+              f"{result['statements']['p50']} sentencias, afectadas={result['affected_last_farm']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+Benchmark de latencia del login.
+
+Uso:
+    python -m benchmarks.bench_login --manifest bench_manifest.json --requests 500 --concurrency 10
+
+Ejecuta el escenario `login` contra la aplicación real y comprueba, con la cabecera
+Server-Timing, que cada login cuesta como máximo `--max-queries` sentencias SQL (una lectura
+del usuario y una escritura combinada). Termina con código 1 si se supera.
+"""
+import sys
+import json
+import asyncio
+import argparse
+from benchmarks.run import run_benchmarks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de latencia del login")
+    parser.add_argument("--manifest", default="bench_manifest.json")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--login-users", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-queries", type=float, default=2)
+    parser.add_argument("--output", help="Guardar el resultado en este archivo JSON")
+    args = parser.parse_args(argv)
+
+    with open(args.manifest, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    results = asyncio.run(run_benchmarks(
+        manifest, ["login"], args.requests, args.concurrency, args.warmup, args.seed, args.login_users
+    ))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    login = results["scenarios"]["login"]
+    queries = login["queries_per_request"]
+    if login["errors"]:
+        print(f"El login respondió con error en {login['errors']} de {login['requests']} solicitudes")
+        return 1
+    if queries is None or queries > args.max_queries:
+        print(f"El login usa {queries} consultas por solicitud (máximo {args.max_queries})")
+        return 1
+    print(f"Login: {queries} consultas por solicitud, p50={login['latency_ms']['p50']} ms, "
+          f"p95={login['latency_ms']['p95']} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
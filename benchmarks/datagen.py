@@ -0,0 +1,289 @@
+"""
+Generador de datos sintéticos de alto volumen (millones de transacciones, cientos de miles
+de notificaciones) que escribe con `COPY` de Postgres en bloques, con memoria constante.
+
+Uso:
+    python -m benchmarks.datagen --users 2000 --farms-per-user 2 --plots-per-farm 15 \\
+        --transactions 5000000 --notifications 500000 --seed 7
+
+Las distribuciones buscan parecerse a producción:
+- Fechas de transacción estacionales: los ingresos se concentran en la cosecha principal
+  (octubre a diciembre) y en la mitaca (abril a junio); los gastos tienen picos de
+  fertilización y de mano de obra en cosecha.
+- Mezcla de categorías por tipo de transacción (`TransactionTypes`) con pesos por categoría.
+- Coordenadas de lotes dentro de la zona cafetera colombiana, respetando los rangos válidos
+  de latitud, longitud y altitud.
+
+Los IDs se reservan por adelantado en las secuencias, de modo que las filas hijas se
+calculan aritméticamente sin mantener listas de IDs en memoria.
+"""
+import sys
+import math
+import random
+import calendar
+import argparse
+import datetime
+from dataBase import SessionLocal, engine
+from models.models import Users, Farms, Plots, UserRoleFarm, Transactions, Notifications
+from utils.pg_copy import copy_rows, reserve_ids, DEFAULT_CHUNK_SIZE
+from utils.security import hash_password
+from benchmarks.seed import ensure_reference_data, default_run_tag, BENCH_PASSWORD, BENCH_EMAIL_DOMAIN
+
+# Pesos mensuales (enero a diciembre) de las fechas por tipo de transacción
+INCOME_MONTH_WEIGHTS = [2, 2, 3, 8, 10, 8, 3, 2, 3, 14, 18, 14]
+EXPENSE_MONTH_WEIGHTS = [5, 6, 10, 10, 8, 6, 5, 5, 10, 11, 12, 9]
+
+# Proporción de transacciones de ingreso frente a gasto
+INCOME_SHARE = 0.3
+
+# Pesos de categorías conocidas; las demás categorías reciben peso 1
+CATEGORY_WEIGHTS = {
+    "Venta de café": 8,
+    "Venta de subproductos": 1.5,
+    "Otros ingresos": 0.5,
+    "Mano de obra": 6,
+    "Fertilizantes": 4,
+    "Insumos": 3,
+    "Transporte": 1.5,
+    "Mantenimiento": 1,
+}
+
+# Mediana (lognormal) del valor de una transacción por tipo, en pesos
+INCOME_MEDIAN_VALUE = 2_500_000
+EXPENSE_MEDIAN_VALUE = 400_000
+
+# Zona cafetera colombiana (dentro de los rangos que exige el modelo Plots)
+LATITUDE_RANGE = (1.0, 11.5)
+LONGITUDE_RANGE = (-78.0, -72.0)
+ALTITUDE_RANGE = (1000.0, 2300.0)
+
+
+def _table(model) -> str:
+    return model.__table__.name
+
+
+def _weighted_categories(categories: dict):
+    names = list(categories)
+    return [categories[name] for name in names], [CATEGORY_WEIGHTS.get(name, 1) for name in names]
+
+
+def seasonal_date(rng: random.Random, month_weights: list, today: datetime.date, years: int) -> datetime.date:
+    """
+    Genera una fecha dentro de los últimos `years` años con la distribución mensual indicada.
+
+    Args:
+        rng (random.Random): Generador aleatorio.
+        month_weights (list): Doce pesos, de enero a diciembre.
+        today (datetime.date): Fecha de referencia; no se generan fechas futuras.
+        years (int): Número de años hacia atrás.
+
+    Returns:
+        datetime.date: Fecha generada.
+    """
+    month = rng.choices(range(1, 13), weights=month_weights)[0]
+    year = today.year - rng.randrange(years)
+    day = rng.randint(1, calendar.monthrange(year, month)[1])
+    generated = datetime.date(year, month, day)
+    if generated > today:
+        generated = generated.replace(year=year - 1, day=min(day, calendar.monthrange(year - 1, month)[1]))
+    return generated
+
+
+def generate_users(rng, reference, first_id, count, run_tag):
+    password_hash = hash_password(BENCH_PASSWORD)
+    verified_state = reference["user_states"]["Verificado"]
+    for i in range(count):
+        yield (
+            first_id + i, f"Usuario datagen {i}", f"datagen-{run_tag}-{i}@{BENCH_EMAIL_DOMAIN}",
+            password_hash, None, None, verified_state
+        )
+
+
+def generate_farms(rng, reference, first_id, count, run_tag):
+    area_unit_id = reference["area_units"]["Hectárea"]
+    active_state = reference["farm_states"]["Activo"]
+    for i in range(count):
+        yield (first_id + i, f"Finca {run_tag} {i}", round(rng.uniform(2, 800), 2), area_unit_id, active_state)
+
+
+def generate_user_role_farms(reference, first_user_id, first_farm_id, farms, farms_per_user):
+    owner_role = reference["roles"]["Propietario"]
+    active_state = reference["user_role_farm_states"]["Activo"]
+    for i in range(farms):
+        yield (owner_role, first_user_id + i // farms_per_user, first_farm_id + i, active_state)
+
+
+def generate_plots(rng, reference, first_id, first_farm_id, farms, plots_per_farm):
+    variety_ids = list(reference["coffee_varieties"].values())
+    area_unit_id = reference["area_units"]["Hectárea"]
+    active_state = reference["plot_states"]["Activo"]
+    for farm_index in range(farms):
+        # Los lotes de una finca quedan agrupados alrededor de un punto central
+        center_lat = rng.uniform(*LATITUDE_RANGE)
+        center_lon = rng.uniform(*LONGITUDE_RANGE)
+        center_alt = rng.uniform(*ALTITUDE_RANGE)
+        for p in range(plots_per_farm):
+            latitude = min(max(center_lat + rng.gauss(0, 0.01), LATITUDE_RANGE[0]), LATITUDE_RANGE[1])
+            longitude = min(max(center_lon + rng.gauss(0, 0.01), LONGITUDE_RANGE[0]), LONGITUDE_RANGE[1])
+            altitude = min(max(center_alt + rng.gauss(0, 40), ALTITUDE_RANGE[0]), ALTITUDE_RANGE[1])
+            yield (
+                first_id + farm_index * plots_per_farm + p, f"Lote {p}",
+                f"{longitude:.8f}", f"{latitude:.8f}", f"{altitude:.2f}",
+                rng.choice(variety_ids), first_farm_id + farm_index,
+                round(rng.uniform(0.3, 12), 2), area_unit_id, active_state
+            )
+
+
+def generate_transactions(rng, reference, count, first_plot_id, plots, plots_per_farm, farms_per_user,
+                          first_user_id, years):
+    categories = reference["transaction_categories"]
+    income_categories = _weighted_categories(categories["Ingreso"])
+    expense_categories = _weighted_categories(categories["Gasto"])
+    active_state = reference["transaction_states"]["Activo"]
+    today = datetime.date.today()
+    income_mu, expense_mu = math.log(INCOME_MEDIAN_VALUE), math.log(EXPENSE_MEDIAN_VALUE)
+    for _ in range(count):
+        # Sesgo hacia los primeros lotes: unos pocos concentran más movimientos
+        plot_index = min(int(plots * rng.random() ** 1.5), plots - 1)
+        owner_id = first_user_id + (plot_index // plots_per_farm) // farms_per_user
+        if rng.random() < INCOME_SHARE:
+            category_ids, weights = income_categories
+            month_weights, mu = INCOME_MONTH_WEIGHTS, income_mu
+        else:
+            category_ids, weights = expense_categories
+            month_weights, mu = EXPENSE_MONTH_WEIGHTS, expense_mu
+        yield (
+            first_plot_id + plot_index, None,
+            seasonal_date(rng, month_weights, today, years).isoformat(), active_state,
+            f"{max(round(rng.lognormvariate(mu, 0.8), -2), 1000):.2f}",
+            rng.choices(category_ids, weights=weights)[0], owner_id
+        )
+
+
+def generate_notifications(rng, reference, count, first_user_id, users, first_farm_id, farms_per_user):
+    notification_type = reference["notification_types"]["Invitations"]
+    states = list(reference["notification_states"].values())
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for _ in range(count):
+        user_index = rng.randrange(users)
+        yield (
+            "Notificación generada", (now - datetime.timedelta(minutes=rng.randint(0, 60 * 24 * 180))).isoformat(),
+            first_user_id + user_index, None, notification_type, rng.choice(states),
+            first_farm_id + user_index * farms_per_user + rng.randrange(farms_per_user)
+        )
+
+
+def generate_dataset(users: int, farms_per_user: int, plots_per_farm: int, transactions: int,
+                     notifications: int, seed: int, years: int = 3, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     run_tag: str = None) -> dict:
+    """
+    Genera y carga el conjunto de datos con COPY.
+
+    Args:
+        users (int): Usuarios propietarios a crear.
+        farms_per_user (int): Fincas por usuario.
+        plots_per_farm (int): Lotes por finca.
+        transactions (int): Transacciones totales.
+        notifications (int): Notificaciones totales.
+        seed (int): Semilla del generador aleatorio.
+        years (int): Años de historial de transacciones.
+        chunk_size (int): Filas por bloque de COPY.
+        run_tag (str): Etiqueta de nombres y correos (por defecto `s<semilla>`); usar una distinta
+            para cargar dos veces la misma semilla en una base de datos.
+
+    Returns:
+        dict: Filas cargadas por tabla y rangos de IDs generados.
+    """
+    rng = random.Random(seed)
+    db = SessionLocal()
+    try:
+        reference = ensure_reference_data(db)
+    finally:
+        db.close()
+
+    farms = users * farms_per_user
+    plots = farms * plots_per_farm
+    run_tag = default_run_tag(seed, run_tag)
+    counts = {}
+
+    raw_connection = engine.raw_connection()
+    try:
+        cursor = raw_connection.cursor()
+        first_user_id = reserve_ids(cursor, _table(Users), "user_id", users)
+        first_farm_id = reserve_ids(cursor, _table(Farms), "farm_id", farms)
+        first_plot_id = reserve_ids(cursor, _table(Plots), "plot_id", plots)
+        raw_connection.commit()
+
+        loads = [
+            (Users, ["user_id", "name", "email", "password_hash", "verification_token", "session_token", "user_state_id"],
+             generate_users(rng, reference, first_user_id, users, run_tag)),
+            (Farms, ["farm_id", "name", "area", "area_unit_id", "farm_state_id"],
+             generate_farms(rng, reference, first_farm_id, farms, run_tag)),
+            (UserRoleFarm, ["role_id", "user_id", "farm_id", "user_role_farm_state_id"],
+             generate_user_role_farms(reference, first_user_id, first_farm_id, farms, farms_per_user)),
+            (Plots, ["plot_id", "name", "longitude", "latitude", "altitude", "coffee_variety_id", "farm_id",
+                     "area", "area_unit_id", "plot_state_id"],
+             generate_plots(rng, reference, first_plot_id, first_farm_id, farms, plots_per_farm)),
+            (Transactions, ["plot_id", "description", "transaction_date", "transaction_state_id", "value",
+                            "transaction_category_id", "creator_id"],
+             generate_transactions(rng, reference, transactions, first_plot_id, plots, plots_per_farm,
+                                   farms_per_user, first_user_id, years)),
+            (Notifications, ["message", "notification_date", "user_id", "invitation_id", "notification_type_id",
+                             "notification_state_id", "farm_id"],
+             generate_notifications(rng, reference, notifications, first_user_id, users, first_farm_id,
+                                    farms_per_user)),
+        ]
+        for model, columns, rows in loads:
+            counts[_table(model)] = copy_rows(cursor, _table(model), columns, rows, chunk_size)
+            raw_connection.commit()
+            print(f"{_table(model)}: {counts[_table(model)]} filas")
+
+        for model, _, _ in loads:
+            cursor.execute(f"ANALYZE {_table(model)}")
+        raw_connection.commit()
+        cursor.close()
+    finally:
+        raw_connection.close()
+
+    return {
+        "run_tag": run_tag,
+        "rows": counts,
+        "user_ids": [first_user_id, first_user_id + users - 1] if users else [],
+        "farm_ids": [first_farm_id, first_farm_id + farms - 1] if farms else [],
+        "plot_ids": [first_plot_id, first_plot_id + plots - 1] if plots else [],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos de alto volumen con COPY")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--farms-per-user", type=int, default=2)
+    parser.add_argument("--plots-per-farm", type=int, default=10)
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--notifications", type=int, default=200_000)
+    parser.add_argument("--years", type=int, default=3, help="Años de historial de transacciones")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--run-tag", help="Etiqueta de los datos (por defecto s<semilla>); cambiarla para repetir una semilla")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.users <= 0 or args.farms_per_user <= 0 or args.plots_per_farm <= 0:
+        parser.error("--users, --farms-per-user y --plots-per-farm deben ser positivos")
+
+    result = generate_dataset(
+        users=args.users,
+        farms_per_user=args.farms_per_user,
+        plots_per_farm=args.plots_per_farm,
+        transactions=args.transactions,
+        notifications=args.notifications,
+        seed=args.seed,
+        run_tag=args.run_tag,
+        years=args.years,
+        chunk_size=args.chunk_size,
+    )
+    print(f"Generación {result['run_tag']} completada: {result['rows']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+Suite de benchmarks de carga de CoffeeTech.
+
+Uso:
+    python -m benchmarks.run seed --users 50 --plots-per-farm 10 --manifest bench_manifest.json
+    python -m benchmarks.run run --manifest bench_manifest.json --concurrency 20 --requests 200 --output baseline.json
+    python -m benchmarks.run compare baseline.json candidate.json
+
+`run` ejecuta los escenarios contra la aplicación FastAPI real (en proceso, vía ASGI, con sus
+eventos de inicio y apagado), abre las sesiones de los usuarios con el endpoint de login y
+escribe un JSON con latencias p50/p95/p99, throughput, tasa de error y consultas SQL por
+solicitud (tomadas de la cabecera Server-Timing). `compare` muestra la diferencia entre dos
+resultados y termina con código 1 si alguna regresión supera el umbral.
+"""
+import re
+import sys
+import math
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import subprocess
+import datetime
+
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """
+    Percentil por rango más cercano sobre una lista ya ordenada.
+
+    Args:
+        sorted_values (list): Valores ordenados.
+        pct (float): Percentil entre 0 y 100.
+
+    Returns:
+        float: Valor del percentil, o 0 si la lista está vacía.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _queries_from_response(response):
+    match = SERVER_TIMING_QUERIES.search(response.headers.get("server-timing", ""))
+    return int(match.group(1)) if match else None
+
+
+def _is_error(response) -> bool:
+    if response.status_code >= 400:
+        return True
+    try:
+        return response.json().get("status") == "error"
+    except Exception:
+        return False
+
+
+def summarize(samples: list, elapsed: float) -> dict:
+    """
+    Resume las muestras de un escenario.
+
+    Args:
+        samples (list): Tuplas (latencia en segundos, es_error, consultas o None).
+        elapsed (float): Duración del escenario en segundos.
+
+    Returns:
+        dict: Conteo, errores, tasa de error, throughput, latencias y consultas por solicitud.
+    """
+    latencies = sorted(latency * 1000 for latency, _, _ in samples)
+    errors = sum(1 for _, is_error, _ in samples if is_error)
+    queries = [count for _, _, count in samples if count is not None]
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+        },
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+async def run_scenario(client, scenario, ctx, requests: int, concurrency: int) -> dict:
+    """
+    Ejecuta un escenario `requests` veces con `concurrency` trabajadores concurrentes.
+
+    Returns:
+        dict: Resumen del escenario (ver `summarize`).
+    """
+    samples = []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await scenario(client, ctx)
+                samples.append((time.perf_counter() - start, _is_error(response), _queries_from_response(response)))
+            except Exception:
+                samples.append((time.perf_counter() - start, True, None))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(samples, time.perf_counter() - start)
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+async def run_benchmarks(manifest: dict, scenario_names: list, requests: int, concurrency: int,
+                         warmup: int, seed: int, login_users: int) -> dict:
+    import os
+    import httpx
+
+    # Los escenarios repiten login con pocos usuarios desde una sola IP: sin esto el limitador
+    # de intentos de autenticación respondería 429
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    from main import app
+    from benchmarks.scenarios import SCENARIOS, ScenarioContext, open_sessions
+
+    ctx = ScenarioContext(manifest, random.Random(seed), login_users=login_users)
+    # ASGITransport no envía los eventos de lifespan: se ejecutan aquí (datos de referencia,
+    # listener de invalidaciones, pool de hashing...) para medir lo mismo que en producción
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+        await open_sessions(client, ctx)
+        for name in scenario_names:
+            scenario = SCENARIOS[name]
+            if warmup:
+                await run_scenario(client, scenario, ctx, warmup, min(concurrency, warmup))
+            results[name] = await run_scenario(client, scenario, ctx, requests, concurrency)
+            print(f"{name:<20} p50={results[name]['latency_ms']['p50']:>8} ms  "
+                  f"p95={results[name]['latency_ms']['p95']:>8} ms  "
+                  f"rps={results[name]['throughput_rps']:>8}  "
+                  f"queries={results[name]['queries_per_request']}  errors={results[name]['errors']}")
+
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "concurrency": concurrency,
+            "requests_per_scenario": requests,
+            "warmup": warmup,
+            "seed": seed,
+            "dataset": manifest["params"],
+        },
+        "scenarios": results,
+    }
+
+
+def compare_results(baseline: dict, candidate: dict, threshold: float) -> bool:
+    """
+    Imprime la diferencia entre dos resultados.
+
+    Args:
+        baseline (dict): Resultado de referencia.
+        candidate (dict): Resultado a comparar.
+        threshold (float): Aumento relativo de p95 (p. ej. 0.1 = 10 %) considerado regresión.
+
+    Returns:
+        bool: Verdadero si ninguna métrica retrocedió más allá del umbral.
+    """
+    ok = True
+    print(f"{'escenario':<20} {'p95 base':>10} {'p95 nuevo':>10} {'cambio':>8} {'consultas':>12} {'rps':>16}")
+    for name, new in candidate["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if old is None:
+            print(f"{name:<20} (nuevo escenario)")
+            continue
+        old_p95, new_p95 = old["latency_ms"]["p95"], new["latency_ms"]["p95"]
+        change = (new_p95 - old_p95) / old_p95 if old_p95 else 0.0
+        old_q, new_q = old["queries_per_request"], new["queries_per_request"]
+        regression = change > threshold or (old_q is not None and new_q is not None and new_q > old_q)
+        ok = ok and not regression
+        print(f"{name:<20} {old_p95:>10} {new_p95:>10} {change:>+8.1%} {str(old_q) + '->' + str(new_q):>12} "
+              f"{str(old['throughput_rps']) + '->' + str(new['throughput_rps']):>16}{'  REGRESIÓN' if regression else ''}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de carga de CoffeeTech")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = subparsers.add_parser("seed", help="Siembra el conjunto de datos sintético")
+    seed_parser.add_argument("--users", type=int, default=50)
+    seed_parser.add_argument("--farms-per-user", type=int, default=3)
+    seed_parser.add_argument("--plots-per-farm", type=int, default=10)
+    seed_parser.add_argument("--transactions-per-plot", type=int, default=50)
+    seed_parser.add_argument("--notifications-per-user", type=int, default=20)
+    seed_parser.add_argument("--seed", type=int, default=42)
+    seed_parser.add_argument("--run-tag", help="Etiqueta de los datos (por defecto s<semilla>); cambiarla para repetir una semilla")
+    seed_parser.add_argument("--create-schema", action="store_true", help="Crear las tablas que no existan")
+    seed_parser.add_argument("--manifest", default="bench_manifest.json")
+
+    run_parser = subparsers.add_parser("run", help="Ejecuta los escenarios de carga")
+    run_parser.add_argument("--manifest", default="bench_manifest.json")
+    run_parser.add_argument("--scenarios", default="login,list-farm,list-plots,list-transactions,financial-report,create-transaction")
+    run_parser.add_argument("--requests", type=int, default=200, help="Solicitudes por escenario")
+    run_parser.add_argument("--concurrency", type=int, default=10)
+    run_parser.add_argument("--warmup", type=int, default=20)
+    run_parser.add_argument("--login-users", type=int, default=5)
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--output", default="bench_results.json")
+
+    compare_parser = subparsers.add_parser("compare", help="Compara dos resultados")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "seed":
+        from dataBase import SessionLocal, engine
+        from benchmarks.seed import seed_dataset, create_schema
+
+        if args.create_schema:
+            create_schema(engine)
+        db = SessionLocal()
+        try:
+            manifest = seed_dataset(
+                db,
+                users=args.users,
+                farms_per_user=args.farms_per_user,
+                plots_per_farm=args.plots_per_farm,
+                transactions_per_plot=args.transactions_per_plot,
+                notifications_per_user=args.notifications_per_user,
+                seed=args.seed,
+                run_tag=args.run_tag,
+            )
+        finally:
+            db.close()
+        with open(args.manifest, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        print(f"Conjunto de datos sembrado ({manifest['params']['run_tag']}); manifiesto en {args.manifest}")
+        return 0
+
+    if args.command == "run":
+        with open(args.manifest, encoding="utf-8") as f:
+            manifest = json.load(f)
+        scenario_names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+        results = asyncio.run(run_benchmarks(
+            manifest, scenario_names, args.requests, args.concurrency, args.warmup, args.seed, args.login_users
+        ))
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Resultados escritos en {args.output}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+    return 0 if compare_results(baseline, candidate, args.threshold) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
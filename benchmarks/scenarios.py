@@ -0,0 +1,120 @@
+"""
+Escenarios de carga sobre la aplicación FastAPI real. Cada escenario elige sus datos del
+manifiesto generado por `benchmarks.seed` y ejecuta una solicitud HTTP.
+"""
+import datetime
+
+
+class ScenarioContext:
+    """
+    Datos del manifiesto que usan los escenarios.
+
+    Los usuarios se reparten en dos grupos: los primeros `login_users` solo se usan en el
+    escenario de login y el resto, con la sesión que abre `open_sessions`, en los demás.
+    """
+
+    def __init__(self, manifest: dict, rng, login_users: int = 5):
+        users = manifest["users"]
+        login_users = min(login_users, max(len(users) - 1, 1))
+        self.login_pool = users[:login_users]
+        self.session_pool = users[login_users:] or users
+        self.farm_plots = {int(farm_id): plots for farm_id, plots in manifest["farm_plots"].items()}
+        self.transaction_types = manifest["transaction_types"]
+        self.rng = rng
+
+    def session_user(self) -> dict:
+        return self.rng.choice(self.session_pool)
+
+    def user_farm(self):
+        user = self.session_user()
+        return user, self.rng.choice(user["farm_ids"])
+
+    def user_plot(self):
+        user, farm_id = self.user_farm()
+        return user, farm_id, self.rng.choice(self.farm_plots[farm_id])
+
+
+async def open_sessions(client, ctx: ScenarioContext):
+    """
+    Inicia sesión con cada usuario de los escenarios a través de `/auth/login`, de modo que
+    los tokens sean del tipo que emite la configuración actual (firmados o `user_sessions`).
+
+    Raises:
+        RuntimeError: Si algún login falla.
+    """
+    for user in ctx.session_pool:
+        response = await client.post("/auth/login", json={
+            "email": user["email"],
+            "password": user["password"],
+            "fcm_token": "benchmark-fcm-token",
+        }, headers={"User-Agent": "coffeetech-benchmark"})
+        body = response.json()
+        if response.status_code != 200 or body.get("status") != "success":
+            raise RuntimeError(f"No se pudo iniciar sesión con {user['email']}: {body}")
+        user["session_token"] = body["data"]["session_token"]
+
+
+async def login(client, ctx: ScenarioContext):
+    user = ctx.rng.choice(ctx.login_pool)
+    return await client.post("/auth/login", json={
+        "email": user["email"],
+        "password": user["password"],
+        "fcm_token": "benchmark-fcm-token",
+    })
+
+
+async def list_farm(client, ctx: ScenarioContext):
+    user = ctx.session_user()
+    return await client.post("/farm/list-farm", params={"session_token": user["session_token"]})
+
+
+async def list_plots(client, ctx: ScenarioContext):
+    user, farm_id = ctx.user_farm()
+    return await client.get(f"/plots/list-plots/{farm_id}", params={"session_token": user["session_token"]})
+
+
+async def list_transactions(client, ctx: ScenarioContext):
+    user, _, plot_id = ctx.user_plot()
+    return await client.get(f"/transaction/list-transactions/{plot_id}", params={"session_token": user["session_token"]})
+
+
+async def financial_report(client, ctx: ScenarioContext):
+    user, farm_id = ctx.user_farm()
+    today = datetime.date.today()
+    return await client.post(
+        "/reports/financial-report",
+        params={"session_token": user["session_token"]},
+        json={
+            "plot_ids": ctx.farm_plots[farm_id],
+            "fechaInicio": (today - datetime.timedelta(days=365)).isoformat(),
+            "fechaFin": today.isoformat(),
+            "include_transaction_history": False,
+        },
+    )
+
+
+async def create_transaction(client, ctx: ScenarioContext):
+    user, _, plot_id = ctx.user_plot()
+    type_name = ctx.rng.choice(list(ctx.transaction_types))
+    return await client.post(
+        "/transaction/create-transaction",
+        params={"session_token": user["session_token"]},
+        json={
+            "plot_id": plot_id,
+            "transaction_type_name": type_name,
+            "transaction_category_name": ctx.rng.choice(ctx.transaction_types[type_name]),
+            "description": "Benchmark",
+            "value": ctx.rng.randint(10_000, 1_000_000),
+            "transaction_date": datetime.date.today().isoformat(),
+        },
+    )
+
+
+SCENARIOS = {
+    "login": login,
+    "list-farm": list_farm,
+    "list-plots": list_plots,
+    "list-transactions": list_transactions,
+    "financial-report": financial_report,
+    "create-transaction": create_transaction,
+}
@@ -0,0 +1,317 @@
+"""
+Siembra una base de datos Postgres local con un conjunto de datos sintético y reproducible
+para los benchmarks de carga.
+
+Todos los registros se crean a través del esquema de `models.models`. El resultado es un
+manifiesto JSON con las credenciales e IDs que usan los escenarios. Las sesiones no se
+siembran: `benchmarks.run` las abre con el endpoint de login, como un cliente real.
+"""
+import random
+import datetime
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from models.models import (
+    Base, UserStates, Users, Roles, Permissions, RolePermission, FarmStates, Farms, PlotStates, Plots,
+    CoffeeVarieties, AreaUnits, NotificationStates, NotificationTypes, Notifications, TransactionStates,
+    TransactionTypes, TransactionCategories, Transactions, UserRoleFarmStates, UserRoleFarm, InvitationStates
+)
+from utils.security import hash_password
+from utils.reference import publish_reference_change
+from utils.state import publish_state_change
+
+# Contraseña común de los usuarios sintéticos (cumple validate_password_strength)
+BENCH_PASSWORD = "Bench#Passw0rd"
+
+BENCH_EMAIL_DOMAIN = "bench.coffeetech.test"
+
+INSERT_CHUNK_SIZE = 1000
+
+# Datos de referencia que los endpoints buscan por nombre
+REFERENCE_STATES = {
+    UserStates: ["Verificado", "No Verificado"],
+    FarmStates: ["Activo", "Inactiva"],
+    PlotStates: ["Activo", "Inactivo"],
+    UserRoleFarmStates: ["Activo", "Inactivo", "Inactiva"],
+    TransactionStates: ["Activo", "Inactivo"],
+    NotificationStates: ["Pendiente", "Respondida"],
+    InvitationStates: ["Pendiente", "Aceptada", "Rechazada"],
+}
+REFERENCE_PERMISSIONS = [
+    "add_plot", "edit_plot", "delete_plot", "read_plots",
+    "edit_farm", "delete_farm",
+    "add_transaction", "edit_transaction", "delete_transaction", "read_transaction",
+    "read_financial_report", "read_collaborators",
+    "add_administrator_farm", "add_operator_farm",
+    "edit_administrator_farm", "edit_operator_farm",
+    "delete_administrator_farm", "delete_operator_farm",
+]
+REFERENCE_ROLES = ["Propietario", "Administrador de finca", "Operador de campo"]
+REFERENCE_AREA_UNITS = [("Hectárea", "ha"), ("Metro cuadrado", "m²")]
+REFERENCE_COFFEE_VARIETIES = ["Castillo", "Caturra", "Colombia", "Típica", "Borbón"]
+REFERENCE_TRANSACTION_CATEGORIES = {
+    "Ingreso": ["Venta de café", "Venta de subproductos", "Otros ingresos"],
+    "Gasto": ["Fertilizantes", "Mano de obra", "Insumos", "Transporte", "Mantenimiento"],
+}
+REFERENCE_NOTIFICATION_TYPES = ["Invitations", "Invitation_accepted", "invitation_rejected"]
+
+
+def _get_or_create(db: Session, model, **fields):
+    instance = db.query(model).filter_by(**fields).first()
+    if instance is None:
+        instance = model(**fields)
+        db.add(instance)
+        db.flush()
+    return instance
+
+
+def ensure_reference_data(db: Session) -> dict:
+    """
+    Crea los datos de referencia que falten (estados, roles, permisos, unidades, variedades,
+    tipos y categorías de transacción, tipos de notificación) y devuelve sus IDs por nombre.
+
+    Args:
+        db (Session): Sesión de base de datos.
+
+    Returns:
+        dict: IDs de referencia agrupados por entidad.
+    """
+    reference = {}
+    for model, names in REFERENCE_STATES.items():
+        pk = model.__table__.primary_key.columns.values()[0].name
+        reference[model.__tablename__] = {name: getattr(_get_or_create(db, model, name=name), pk) for name in names}
+
+    permissions = {}
+    for name in REFERENCE_PERMISSIONS:
+        permission = db.query(Permissions).filter(Permissions.name == name).first()
+        if permission is None:
+            permission = Permissions(name=name, description=name.replace("_", " "))
+            db.add(permission)
+            db.flush()
+        permissions[name] = permission.permission_id
+
+    roles = {name: _get_or_create(db, Roles, name=name).role_id for name in REFERENCE_ROLES}
+    owner_permissions = {
+        row.permission_id for row in db.query(RolePermission).filter(RolePermission.role_id == roles["Propietario"])
+    }
+    for permission_id in permissions.values():
+        if permission_id not in owner_permissions:
+            db.add(RolePermission(role_id=roles["Propietario"], permission_id=permission_id))
+
+    area_units = {}
+    for name, abbreviation in REFERENCE_AREA_UNITS:
+        unit = db.query(AreaUnits).filter(AreaUnits.name == name).first()
+        if unit is None:
+            unit = AreaUnits(name=name, abbreviation=abbreviation)
+            db.add(unit)
+            db.flush()
+        area_units[name] = unit.area_unit_id
+
+    varieties = {name: _get_or_create(db, CoffeeVarieties, name=name).coffee_variety_id for name in REFERENCE_COFFEE_VARIETIES}
+
+    categories = {}
+    for type_name, category_names in REFERENCE_TRANSACTION_CATEGORIES.items():
+        transaction_type = _get_or_create(db, TransactionTypes, name=type_name)
+        categories[type_name] = {
+            name: _get_or_create(
+                db, TransactionCategories, name=name, transaction_type_id=transaction_type.transaction_type_id
+            ).transaction_category_id
+            for name in category_names
+        }
+
+    notification_types = {
+        name: _get_or_create(db, NotificationTypes, name=name).notification_type_id
+        for name in REFERENCE_NOTIFICATION_TYPES
+    }
+
+    # Los workers en ejecución recargan los IDs de estados y roles, unidades y variedades
+    publish_state_change(db)
+    publish_reference_change(db)
+    db.commit()
+    reference.update({
+        "permissions": permissions,
+        "roles": roles,
+        "area_units": area_units,
+        "coffee_varieties": varieties,
+        "transaction_categories": categories,
+        "notification_types": notification_types,
+    })
+    return reference
+
+
+def _insert_returning(db: Session, model, rows: list, *returning) -> list:
+    results = []
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        chunk = rows[start:start + INSERT_CHUNK_SIZE]
+        results.extend(db.execute(insert(model).values(chunk).returning(*returning)).all())
+    return results
+
+
+def default_run_tag(seed: int, run_tag: str = None) -> str:
+    """Etiqueta de los nombres y correos generados: la indicada o `s<semilla>`."""
+    return run_tag or f"s{seed}"
+
+
+def seed_dataset(
+    db: Session,
+    users: int = 50,
+    farms_per_user: int = 3,
+    plots_per_farm: int = 10,
+    transactions_per_plot: int = 50,
+    notifications_per_user: int = 20,
+    seed: int = 42,
+    run_tag: str = None,
+) -> dict:
+    """
+    Crea usuarios verificados, sus fincas (como propietarios), lotes,
+    transacciones y notificaciones.
+
+    Args:
+        db (Session): Sesión de base de datos.
+        users (int): Número de usuarios.
+        farms_per_user (int): Fincas por usuario.
+        plots_per_farm (int): Lotes por finca.
+        transactions_per_plot (int): Transacciones por lote.
+        notifications_per_user (int): Notificaciones por usuario.
+        seed (int): Semilla del generador aleatorio; con la misma semilla se generan los mismos datos.
+        run_tag (str): Etiqueta de nombres y correos (por defecto `s<semilla>`); usar una distinta
+            para sembrar dos veces la misma semilla en una base de datos.
+
+    Returns:
+        dict: Manifiesto con los parámetros, usuarios (email, contraseña y fincas)
+        y lotes por finca.
+    """
+    rng = random.Random(seed)
+    reference = ensure_reference_data(db)
+    password_hash = hash_password(BENCH_PASSWORD)
+    run_tag = default_run_tag(seed, run_tag)
+
+    verified_state = reference["user_states"]["Verificado"]
+    user_rows = [
+        {
+            "name": f"Usuario benchmark {i}",
+            "email": f"bench-{run_tag}-{i}@{BENCH_EMAIL_DOMAIN}",
+            "password_hash": password_hash,
+            "user_state_id": verified_state,
+        }
+        for i in range(users)
+    ]
+    user_ids = {email: user_id for user_id, email in _insert_returning(db, Users, user_rows, Users.user_id, Users.email)}
+
+    area_unit_id = reference["area_units"]["Hectárea"]
+    farm_rows = [
+        {
+            "name": f"Finca {run_tag} {u}-{f}",
+            "area": round(rng.uniform(5, 500), 2),
+            "area_unit_id": area_unit_id,
+            "farm_state_id": reference["farm_states"]["Activo"],
+        }
+        for u in range(users) for f in range(farms_per_user)
+    ]
+    farm_ids = {name: farm_id for farm_id, name in _insert_returning(db, Farms, farm_rows, Farms.farm_id, Farms.name)}
+
+    urf_rows = []
+    user_farms = {}
+    for u, user_row in enumerate(user_rows):
+        user_id = user_ids[user_row["email"]]
+        user_farms[user_row["email"]] = []
+        for f in range(farms_per_user):
+            farm_id = farm_ids[f"Finca {run_tag} {u}-{f}"]
+            user_farms[user_row["email"]].append(farm_id)
+            urf_rows.append({
+                "user_id": user_id,
+                "farm_id": farm_id,
+                "role_id": reference["roles"]["Propietario"],
+                "user_role_farm_state_id": reference["user_role_farm_states"]["Activo"],
+            })
+    _insert_returning(db, UserRoleFarm, urf_rows, UserRoleFarm.user_role_farm_id)
+
+    variety_ids = list(reference["coffee_varieties"].values())
+    plot_rows = [
+        {
+            "name": f"Lote {p}",
+            "farm_id": farm_id,
+            "coffee_variety_id": rng.choice(variety_ids),
+            "latitude": round(rng.uniform(1.0, 11.0), 6),
+            "longitude": round(rng.uniform(-77.5, -72.5), 6),
+            "altitude": round(rng.uniform(1200, 2100), 2),
+            "area": round(rng.uniform(0.5, 10), 2),
+            "area_unit_id": area_unit_id,
+            "plot_state_id": reference["plot_states"]["Activo"],
+        }
+        for farm_id in farm_ids.values() for p in range(plots_per_farm)
+    ]
+    farm_plots = {}
+    for plot_id, farm_id in _insert_returning(db, Plots, plot_rows, Plots.plot_id, Plots.farm_id):
+        farm_plots.setdefault(farm_id, []).append(plot_id)
+
+    categories = [
+        category_id
+        for type_categories in reference["transaction_categories"].values()
+        for category_id in type_categories.values()
+    ]
+    owner_by_farm = {farm_id: user_ids[email] for email, farms in user_farms.items() for farm_id in farms}
+    today = datetime.date.today()
+    transaction_rows = [
+        {
+            "plot_id": plot_id,
+            "description": "Transacción de benchmark",
+            "transaction_date": today - datetime.timedelta(days=rng.randint(0, 365)),
+            "transaction_state_id": reference["transaction_states"]["Activo"],
+            "value": rng.randint(10_000, 5_000_000),
+            "transaction_category_id": rng.choice(categories),
+            "creator_id": owner_by_farm[farm_id],
+        }
+        for farm_id, plot_ids in farm_plots.items() for plot_id in plot_ids for _ in range(transactions_per_plot)
+    ]
+    _insert_returning(db, Transactions, transaction_rows, Transactions.transaction_id)
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    notification_rows = [
+        {
+            "message": "Notificación de benchmark",
+            "notification_date": now - datetime.timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+            "user_id": user_ids[email],
+            "notification_type_id": reference["notification_types"]["Invitations"],
+            "notification_state_id": reference["notification_states"]["Pendiente"],
+            "farm_id": rng.choice(farms),
+        }
+        for email, farms in user_farms.items() for _ in range(notifications_per_user)
+    ]
+    _insert_returning(db, Notifications, notification_rows, Notifications.notification_id)
+
+    db.commit()
+
+    return {
+        "params": {
+            "users": users,
+            "farms_per_user": farms_per_user,
+            "plots_per_farm": plots_per_farm,
+            "transactions_per_plot": transactions_per_plot,
+            "notifications_per_user": notifications_per_user,
+            "seed": seed,
+            "run_tag": run_tag,
+        },
+        "users": [
+            {
+                "email": email,
+                "password": BENCH_PASSWORD,
+                "farm_ids": farms,
+            }
+            for email, farms in user_farms.items()
+        ],
+        "farm_plots": {str(farm_id): plot_ids for farm_id, plot_ids in farm_plots.items()},
+        "transaction_types": {
+            type_name: list(type_categories.keys())
+            for type_name, type_categories in reference["transaction_categories"].items()
+        },
+    }
+
+
+def create_schema(engine):
+    """
+    Crea las tablas del esquema que no existan (útil en una base de datos de benchmark vacía).
+
+    Args:
+        engine (Engine): Engine de la base de datos de benchmark.
+    """
+    Base.metadata.create_all(bind=engine)
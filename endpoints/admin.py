@@ -0,0 +1,81 @@
+from fastapi import APIRouter
+from utils.security import verify_admin_token
+from utils.response import create_response
+from utils.instrumentation import get_route_sql_stats, reset_route_sql_stats
+from utils.slow_queries import get_slow_queries, reset_slow_queries, SLOW_QUERY_THRESHOLD_MS
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/sql-stats", summary="Estadísticas SQL por ruta")
+def sql_stats(admin_token: str):
+    """
+    Devuelve el número de consultas y el tiempo de base de datos acumulados por ruta.
+
+    - **admin_token**: Token de administración (variable de entorno ADMIN_TOKEN).
+
+    **Respuestas**:
+    - **200**: Agregados por ruta.
+    - **403**: Token de administración inválido.
+    """
+    if not verify_admin_token(admin_token):
+        logger.warning("Intento de acceso a /sql-stats con token de administración inválido")
+        return create_response("error", "Token de administración inválido", status_code=403)
+
+    return create_response("success", "Estadísticas SQL obtenidas correctamente", {"routes": get_route_sql_stats()})
+
+
+@router.post("/sql-stats/reset", summary="Reiniciar estadísticas SQL por ruta")
+def reset_sql_stats(admin_token: str):
+    """
+    Reinicia los agregados de consultas SQL por ruta.
+
+    - **admin_token**: Token de administración (variable de entorno ADMIN_TOKEN).
+    """
+    if not verify_admin_token(admin_token):
+        logger.warning("Intento de reinicio de /sql-stats con token de administración inválido")
+        return create_response("error", "Token de administración inválido", status_code=403)
+
+    reset_route_sql_stats()
+    return create_response("success", "Estadísticas SQL reiniciadas correctamente")
+
+
+@router.get("/slow-queries", summary="Registro de consultas lentas")
+def slow_queries(admin_token: str):
+    """
+    Devuelve las consultas que superaron el umbral de lentitud (SLOW_QUERY_THRESHOLD_MS),
+    agrupadas por huella de sentencia, con su conteo, rutas que las emitieron, forma de los
+    parámetros y plan de ejecución estimado.
+
+    - **admin_token**: Token de administración (variable de entorno ADMIN_TOKEN).
+
+    **Respuestas**:
+    - **200**: Consultas lentas ordenadas por tiempo acumulado.
+    - **403**: Token de administración inválido.
+    """
+    if not verify_admin_token(admin_token):
+        logger.warning("Intento de acceso a /slow-queries con token de administración inválido")
+        return create_response("error", "Token de administración inválido", status_code=403)
+
+    return create_response("success", "Consultas lentas obtenidas correctamente", {
+        "threshold_ms": SLOW_QUERY_THRESHOLD_MS,
+        "queries": get_slow_queries()
+    })
+
+
+@router.post("/slow-queries/reset", summary="Vaciar el registro de consultas lentas")
+def reset_slow_query_log(admin_token: str):
+    """
+    Vacía el buffer de consultas lentas.
+
+    - **admin_token**: Token de administración (variable de entorno ADMIN_TOKEN).
+    """
+    if not verify_admin_token(admin_token):
+        logger.warning("Intento de reinicio de /slow-queries con token de administración inválido")
+        return create_response("error", "Token de administración inválido", status_code=403)
+
+    reset_slow_queries()
+    return create_response("success", "Registro de consultas lentas vaciado correctamente")
@@ -1,14 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel, EmailStr
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, BackgroundTasks
+from pydantic import BaseModel, EmailStr, TypeAdapter, ValidationError
+from typing import Optional, List
 from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
 from models.models import Users
-from utils.security import hash_password, generate_verification_token , verify_password
-from utils.email import send_email
+from utils.security import hash_password, generate_verification_token , verify_password, verify_and_update_password
+from utils.security import verify_session_token as verify_any_session_token
+from utils.security import hash_passwords, verify_admin_token
+from utils.session_tokens import SessionUser, signed_tokens_enabled, sign_session_token, revoke_user_sessions, publish_token_version_change
+from utils.user_sessions import login_verified_user, list_sessions, revoke_session, revoke_session_token, revoke_other_sessions
+from utils.email import send_email, send_bulk_emails
+from utils.rate_limit import enforce_rate_limit
 from utils.response import create_response, session_token_invalid_response
 from dataBase import get_db_session
+import os
 import datetime
 import logging
-from utils.state import get_state
+from utils.state import get_state, get_state_id
+from utils.token_store import reset_token_store
 import pytz
 
 bogota_tz = pytz.timezone("America/Bogota")
@@ -38,6 +48,7 @@ class LoginRequest(BaseModel):
     email: EmailStr
     password: str
     fcm_token: str  # Campo agregado para recibir el token FCM
+    device_info: Optional[str] = None  # Descripción del dispositivo; si falta se usa el User-Agent
 
 class PasswordChange(BaseModel):
     current_password: str
@@ -48,9 +59,22 @@ class LogoutRequest(BaseModel):
 
 class UpdateProfile(BaseModel):
     new_name: str
-   
 
-reset_tokens = {}
+class BulkUserItem(BaseModel):
+    name: str
+    email: str  # Se valida por fila para devolver el error en el resultado de esa fila
+    password: str
+
+class BulkRegisterRequest(BaseModel):
+    users: List[BulkUserItem]
+    send_verification: bool = True
+
+# Máximo de usuarios por solicitud de aprovisionamiento masivo
+BULK_REGISTER_MAX_USERS = int(os.getenv("BULK_REGISTER_MAX_USERS", 1000))
+BULK_INSERT_CHUNK_SIZE = 500
+
+email_adapter = TypeAdapter(EmailStr)
+   
 
 
 # Función auxiliar para verificar tokens
@@ -61,11 +85,12 @@ def verify_user_token(token: str, db: Session) -> Users:
     return user
 
 
-# Función auxiliar para verificar tokens de sesión
+# Función auxiliar para verificar tokens de sesión; los endpoints de cuenta modifican o
+# eliminan la fila, así que siempre devuelve el objeto Users (también con tokens firmados)
 def verify_session_token(session_token: str, db: Session) -> Users:
-    user = db.query(Users).filter(Users.session_token == session_token).first()
-    if not user:
-        return None
+    user = verify_any_session_token(session_token, db)
+    if isinstance(user, SessionUser):
+        return user.instance
     return user
 
 import re
@@ -88,7 +113,7 @@ def validate_password_strength(password: str) -> bool:
 
 # Modificación del endpoint de registro
 @router.post("/register")
-def register_user(user: UserCreate, db: Session = Depends(get_db_session)):
+def register_user(user: UserCreate, http_request: Request, db: Session = Depends(get_db_session)):
     """
     Registra un nuevo usuario.
 
@@ -97,6 +122,9 @@ def register_user(user: UserCreate, db: Session = Depends(get_db_session)):
     - **password**: La contraseña del usuario.
     - **passwordConfirmation**: Confirmación de la contraseña.
     """
+    # Limitar intentos por IP antes de hashear la contraseña o enviar correos
+    enforce_rate_limit("register", http_request)
+
     # Validación del nombre (no puede estar vacío)
     if not user.name.strip():
         return create_response("error", "El nombre no puede estar vacío")
@@ -114,8 +142,10 @@ def register_user(user: UserCreate, db: Session = Depends(get_db_session)):
     if db_user:
         return create_response("error", "El correo ya está registrado")
 
+    # Fuera del try: si el pool de hashing está saturado se responde 503, no 500
+    password_hash = hash_password(user.password)
+
     try:
-        password_hash = hash_password(user.password)
         verification_token = generate_verification_token(4)
 
          # Usar get_state para obtener el estado "No Verificado" del tipo "Users"
@@ -177,16 +207,15 @@ def verify_email(request: VerifyTokenRequest, db: Session = Depends(get_db_sessi
         raise HTTPException(status_code=500, detail=f"Error al verificar el correo: {str(e)}")
 
 
-# Declaración global del diccionario
-reset_tokens = {}
 @router.post("/forgot-password")
-def forgot_password(request: PasswordResetRequest, db: Session = Depends(get_db_session)):
+def forgot_password(request: PasswordResetRequest, http_request: Request, db: Session = Depends(get_db_session)):
     """
     Inicia el proceso de restablecimiento de contraseña.
 
     - **email**: El correo electrónico del usuario que solicita el restablecimiento.
     """
-    global reset_tokens  # Aseguramos que estamos usando la variable global
+    # Limitar intentos por IP y por correo antes de enviar el correo
+    enforce_rate_limit("forgot_password", http_request, request.email)
 
     logger.info("Iniciando el proceso de restablecimiento de contraseña para el correo: %s", request.email)
     
@@ -209,18 +238,14 @@ def forgot_password(request: PasswordResetRequest, db: Session = Depends(get_db_
         user.verification_token = reset_token
         logger.info("Token de restablecimiento guardado en la base de datos para el usuario: %s", user.email)
 
-        # Guardar el token y el tiempo de expiración en el diccionario global, sobrescribiendo el token existente si lo hay
-        reset_tokens[reset_token] = {
-            "expires_at": expiration_time,
-            "email": request.email  # Asociamos el token con el correo
-        }
-        logger.info("Token de restablecimiento almacenado globalmente para el correo: %s", request.email)
-
-        print (reset_token)
         # Guardar cambios en la base de datos
         db.commit()
         logger.info("Cambios guardados en la base de datos para el usuario: %s", user.email)
 
+        # Guardar el token y su expiración en el almacén compartido, reemplazando los tokens anteriores del usuario
+        reset_token_store.put(reset_token, user.user_id, request.email, expiration_time)
+        logger.info("Token de restablecimiento almacenado para el correo: %s", request.email)
+
         # Envía un correo electrónico con el token de restablecimiento
         send_email(request.email, reset_token, 'reset')
         logger.info("Correo electrónico de restablecimiento enviado a: %s", request.email)
@@ -247,24 +272,13 @@ Este endpoint permite verificar si un token de restablecimiento de contraseña e
 
 - **Logs**: El endpoint genera logs para el inicio y la finalización del proceso de verificación del token, así como cualquier token expirado o inválido.
 """
-    global reset_tokens
-
     logger.info("Iniciando la verificación del token: %s", request.token)
-    logger.debug("Estado actual de reset_tokens: %s", reset_tokens)
 
-    token_info = reset_tokens.get(request.token)
+    # El almacén no devuelve tokens expirados
+    token_info = reset_token_store.get(request.token)
 
     if token_info:
-        logger.info("Token encontrado: %s", request.token)
-
-        current_time = datetime.datetime.now(bogota_tz)
-        expires_at = token_info['expires_at']
-        logger.debug("Hora actual: %s, Expira a: %s", current_time, expires_at)
-
-        if current_time > expires_at:
-            logger.info("El token ha expirado: %s", request.token)
-            return create_response("error", "Token ha expirado")
-
+        logger.info("Token encontrado: %s, expira a: %s", request.token, token_info["expires_at"])
         logger.info("Token válido, puede proceder a restablecer la contraseña.")
         return create_response("success", "Token válido. Puede proceder a restablecer la contraseña.")
 
@@ -287,8 +301,6 @@ Este endpoint permite restablecer la contraseña de un usuario, siempre que el t
 
 - **Logs**: Se generan logs detallados para cada paso, incluidos errores al actualizar la contraseña o si el token ha expirado.
 """
-    global reset_tokens  # Aseguramos que estamos usando la variable global
-
     logger.info("Iniciando el proceso de restablecimiento de contraseña para el token: %s", reset.token)
 
     # Verificar que las contraseñas coincidan
@@ -300,21 +312,11 @@ Este endpoint permite restablecer la contraseña de un usuario, siempre que el t
     if not validate_password_strength(reset.new_password):
         return create_response("error", "La nueva contraseña debe tener al menos 8 caracteres, incluir una letra mayúscula, una letra minúscula, un número y un carácter especial")
 
-    # Verificar el token en el diccionario en memoria
-    token_info = reset_tokens.get(reset.token)
+    # Verificar el token en el almacén compartido (no devuelve tokens expirados)
+    token_info = reset_token_store.get(reset.token)
 
     if token_info:
-        logger.info("Token encontrado en memoria: %s", reset.token)
-
-        # Verificar si el token ha expirado
-        current_time = datetime.datetime.now(bogota_tz)
-        expires_at = token_info['expires_at']
-        logger.debug("Hora actual: %s, Expira a: %s", current_time, expires_at)
-
-        if current_time > expires_at:
-            logger.info("El token ha expirado: %s", reset.token)
-            del reset_tokens[reset.token]  # Eliminar token expirado
-            return create_response("error", "El token ha expirado")
+        logger.info("Token encontrado: %s", reset.token)
 
         # Obtener el usuario de la base de datos usando el token
         user = db.query(Users).filter(Users.verification_token == reset.token).first()
@@ -322,9 +324,18 @@ Este endpoint permite restablecer la contraseña de un usuario, siempre que el t
             logger.warning("Usuario no encontrado para el token: %s", reset.token)
             return create_response("error", "Usuario no encontrado")
 
+        new_password_hash = hash_password(reset.new_password)
+
         try:
+            # Consumir el token de forma atómica en la misma transacción que el cambio de
+            # contraseña: si otra solicitud lo usó primero se rechaza, y si el commit falla el
+            # token sigue siendo válido
+            if not reset_token_store.consume(reset.token, db):
+                db.rollback()
+                logger.warning("Token ya utilizado o expirado: %s", reset.token)
+                return create_response("error", "Token inválido o expirado")
+
             # Actualizar la contraseña del usuario
-            new_password_hash = hash_password(reset.new_password)
             logger.debug("Hash de la nueva contraseña generado: %s", new_password_hash)
 
             user.password_hash = new_password_hash
@@ -337,10 +348,6 @@ Este endpoint permite restablecer la contraseña de un usuario, siempre que el t
             db.commit()
             logger.info("Cambios confirmados en la base de datos para el usuario: %s", user.email)
 
-            # Eliminar el token del diccionario después de usarlo
-            del reset_tokens[reset.token]
-            logger.info("Token eliminado del diccionario global: %s", reset.token)
-
             return create_response("success", "Contraseña restablecida exitosamente")
         except Exception as e:
             logger.error("Error al restablecer la contraseña: %s", str(e))
@@ -351,7 +358,7 @@ Este endpoint permite restablecer la contraseña de un usuario, siempre que el t
         return create_response("error", "Token inválido o expirado")
 
 @router.post("/login")
-def login(request: LoginRequest, db: Session = Depends(get_db_session)):
+def login(request: LoginRequest, http_request: Request, db: Session = Depends(get_db_session), user_agent: Optional[str] = Header(None)):
     """
 Inicio de Sesión
 
@@ -366,37 +373,72 @@ Este endpoint permite a los usuarios autenticarse mediante correo electrónico y
 
 - **Logs**: Se registran logs para errores de autenticación, generación de tokens de sesión y cualquier error durante el inicio de sesión.
 """
-    user = db.query(Users).filter(Users.email == request.email).first()
+    # Limitar intentos por IP y por correo antes de verificar la contraseña con Argon2
+    enforce_rate_limit("login", http_request, request.email)
+
+    # Lectura: solo las columnas que usa el login
+    user = (
+        db.query(Users.user_id, Users.name, Users.password_hash, Users.user_state_id, Users.token_version)
+        .filter(Users.email == request.email)
+        .first()
+    )
+
+    if not user:
+        return create_response("error", "Credenciales incorrectas")
 
-    if not user or not verify_password(request.password, user.password_hash):
+    password_valid, new_password_hash = verify_and_update_password(request.password, user.password_hash)
+    if not password_valid:
         return create_response("error", "Credenciales incorrectas")
 
-    verified_state = get_state(db, "Verificado", "Users")
-    if not verified_state or user.user_state_id != verified_state.user_state_id:
+    user_values = {"fcm_token": request.fcm_token}
+    # El hash usa parámetros de Argon2 anteriores: se reemplaza en la misma escritura
+    if new_password_hash:
+        user_values["password_hash"] = new_password_hash
+        logger.info("Hash de contraseña actualizado a los parámetros actuales para %s", request.email)
+
+    # Escritura: un único UPDATE condicionado al estado "Verificado" (ID en caché)
+    verified_state_id = get_state_id(db, "Verificado", "Users")
+    try:
+        session_token = None
+        if verified_state_id is not None and user.user_state_id == verified_state_id:
+            if signed_tokens_enabled():
+                # Token firmado: se verifica sin consultar la tabla users, no se guarda
+                updated = db.execute(
+                    update(Users)
+                    .where(Users.user_id == user.user_id, Users.user_state_id == verified_state_id)
+                    .values(**user_values)
+                    .returning(Users.user_id)
+                ).first()
+                if updated:
+                    session_token = sign_session_token(user.user_id, user.token_version)
+            else:
+                # Una sesión por dispositivo: no cierra las sesiones abiertas en otros dispositivos
+                session_token = login_verified_user(
+                    db, user.user_id, verified_state_id, user_values, request.device_info or user_agent
+                )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error durante el inicio de sesión: {str(e)}")
+
+    if session_token is None:
         new_verification_token = generate_verification_token(4)
-        user.verification_token = new_verification_token
 
         try:
+            db.query(Users).filter(Users.user_id == user.user_id).update(
+                {Users.verification_token: new_verification_token, **({Users.password_hash: new_password_hash} if new_password_hash else {})},
+                synchronize_session=False,
+            )
             db.commit()
-            send_email(user.email, new_verification_token, 'verification')
+            send_email(request.email, new_verification_token, 'verification')
             return create_response("error", "Debes verificar tu correo antes de iniciar sesión")
         except Exception as e:
             db.rollback()
             raise HTTPException(status_code=500, detail=f"Error al enviar el nuevo correo de verificación: {str(e)}")
 
-    try:
-        session_token = generate_verification_token(32)
-        user.session_token = session_token
-        user.fcm_token = request.fcm_token
-        db.commit()
+    logger.info("Sesión iniciada para %s", request.email)
 
-        # Agrega un log para asegurarte de que el token fue generado
-        logger.info(f"Session token generado para {user.email}: {session_token}")
-
-        return create_response("success", "Inicio de sesión exitoso", {"session_token": session_token, "name": user.name})
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Error durante el inicio de sesión: {str(e)}")
+    return create_response("success", "Inicio de sesión exitoso", {"session_token": session_token, "name": user.name})
 
 
 # Cambiar contraseña
@@ -424,9 +466,19 @@ Este endpoint permite a los usuarios cambiar su contraseña siempre que proporci
     if not validate_password_strength(change.new_password):
         return create_response("error", "La nueva contraseña debe tener al menos 8 caracteres, incluir una letra mayúscula, una letra minúscula, un número y un carácter especial")
 
+    new_password_hash = hash_password(change.new_password)
+
     try:
-        new_password_hash = hash_password(change.new_password)
         user.password_hash = new_password_hash
+        # Cerrar las sesiones de los demás dispositivos; la actual sigue abierta
+        revoke_other_sessions(db, user.user_id, keep_session_token=session_token)
+        if signed_tokens_enabled():
+            # Revocar los tokens firmados existentes y entregar uno nuevo a este cliente
+            new_version = revoke_user_sessions(db, user.user_id)
+            db.commit()
+            return create_response("success", "Cambio de contraseña exitoso", {
+                "session_token": sign_session_token(user.user_id, new_version)
+            })
         db.commit()
         return create_response("success", "Cambio de contraseña exitoso")
     except Exception as e:
@@ -453,8 +505,10 @@ def logout(request: LogoutRequest, db: Session = Depends(get_db_session)):
     if not user:
         return session_token_invalid_response()
     try:
-        user.session_token = None  # Borrar el session_token
+        if not revoke_session_token(db, request.session_token):
+            user.session_token = None  # Borrar el session_token de las sesiones anteriores a user_sessions
         user.fcm_token = None  # Borrar el fcm_token también
+        revoke_user_sessions(db, user.user_id)  # Invalidar los tokens firmados
         db.commit()
         return create_response("success", "Cierre de sesión exitoso")
     except Exception as e:
@@ -480,6 +534,7 @@ def delete_account(session_token: str, db: Session = Depends(get_db_session)):
         return session_token_invalid_response()
 
     try:
+        publish_token_version_change(db, user.user_id)
         db.delete(user)
         db.commit()
         return create_response("success", "Cuenta eliminada exitosa")
@@ -516,3 +571,174 @@ def update_profile(profile: UpdateProfile, session_token: str, db: Session = Dep
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al actualizar el perfil: {str(e)}")
+
+
+@router.get("/sessions")
+def get_sessions(session_token: str, db: Session = Depends(get_db_session)):
+    """
+    Lista las sesiones abiertas del usuario (una por dispositivo).
+
+    - **session_token**: El token de sesión del usuario.
+
+    **Retornos**:
+    - Lista de sesiones con su ID, dispositivo, fecha de creación, último uso y si es la sesión actual.
+    - Respuesta de error si el token de sesión es inválido.
+    """
+    user = verify_any_session_token(session_token, db)
+    if not user:
+        return session_token_invalid_response()
+
+    current_session_id = getattr(user, "user_session_id", None)
+    sessions = [
+        {
+            "session_id": user_session.user_session_id,
+            "device_info": user_session.device_info,
+            "created_at": user_session.created_at,
+            "last_seen_at": user_session.last_seen_at,
+            "current": user_session.user_session_id == current_session_id,
+        }
+        for user_session in list_sessions(db, user.user_id)
+    ]
+    return create_response("success", "Sesiones obtenidas exitosamente", {"sessions": sessions})
+
+
+@router.delete("/sessions/{session_id}")
+def delete_session(session_id: int, session_token: str, db: Session = Depends(get_db_session)):
+    """
+    Cierra una sesión del usuario (por ejemplo, la de un dispositivo perdido).
+
+    - **session_id**: ID de la sesión a cerrar.
+    - **session_token**: El token de sesión del usuario.
+
+    **Retornos**:
+    - Respuesta de éxito si la sesión se cerró.
+    - Respuesta de error si el token de sesión es inválido o la sesión no pertenece al usuario.
+    """
+    user = verify_any_session_token(session_token, db)
+    if not user:
+        return session_token_invalid_response()
+
+    try:
+        if not revoke_session(db, user.user_id, session_id):
+            return create_response("error", "Sesión no encontrada", status_code=404)
+        db.commit()
+        return create_response("success", "Sesión cerrada exitosamente")
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error al cerrar la sesión: {str(e)}")
+
+
+@router.post("/bulk-register")
+def bulk_register(bulk: BulkRegisterRequest, admin_token: str, background_tasks: BackgroundTasks,
+                  db: Session = Depends(get_db_session)):
+    """
+    Aprovisiona varias cuentas en una sola solicitud (p. ej. los miembros de una cooperativa).
+
+    Los correos duplicados se detectan con una sola consulta, las contraseñas se hashean en
+    paralelo en el pool de hashing, los usuarios se insertan con INSERT de varias filas y los
+    correos de verificación se envían en segundo plano por una sola conexión SMTP.
+
+    - **admin_token**: Token de administración (variable de entorno ADMIN_TOKEN).
+    - **users**: Lista de usuarios con `name`, `email` y `password`.
+    - **send_verification**: Enviar el correo de verificación a los usuarios creados.
+
+    **Retornos**:
+    - Resultado por fila (`created` o `error` con su mensaje) y totales.
+    - **403** si el token de administración es inválido.
+    - **503** si la cola de hash de contraseñas se llena durante el lote (no se crea ningún usuario).
+    """
+    if not verify_admin_token(admin_token):
+        logger.warning("Intento de aprovisionamiento masivo con token de administración inválido")
+        return create_response("error", "Token de administración inválido", status_code=403)
+
+    if not bulk.users:
+        return create_response("error", "La lista de usuarios está vacía")
+    if len(bulk.users) > BULK_REGISTER_MAX_USERS:
+        return create_response("error", f"Se permiten como máximo {BULK_REGISTER_MAX_USERS} usuarios por solicitud", status_code=400)
+
+    results = [{"index": index, "email": item.email, "status": "error", "message": None} for index, item in enumerate(bulk.users)]
+
+    # Validación por fila y duplicados dentro de la misma solicitud
+    candidates = {}
+    for index, item in enumerate(bulk.users):
+        if not item.name.strip():
+            results[index]["message"] = "El nombre no puede estar vacío"
+            continue
+        try:
+            email_adapter.validate_python(item.email)
+        except ValidationError:
+            results[index]["message"] = "El correo no es válido"
+            continue
+        if not validate_password_strength(item.password):
+            results[index]["message"] = "La contraseña debe tener al menos 8 caracteres, incluir una letra mayúscula, una letra minúscula, un número y un carácter especial"
+            continue
+        if item.email in candidates:
+            results[index]["message"] = "El correo está repetido en la solicitud"
+            continue
+        candidates[item.email] = index
+
+    # Correos ya registrados, en una sola consulta
+    if candidates:
+        for (email,) in db.query(Users.email).filter(Users.email.in_(list(candidates))).all():
+            results[candidates.pop(email)]["message"] = "El correo ya está registrado"
+
+    if candidates:
+        user_state_record = get_state(db, "No Verificado", "Users")
+        if not user_state_record:
+            return create_response("error", "No se encontró el estado 'No Verificado' para el tipo 'Users'", status_code=400)
+
+        indexes = list(candidates.values())
+        password_hashes = hash_passwords([bulk.users[index].password for index in indexes])
+
+        tokens = set()
+        rows = []
+        for index, password_hash in zip(indexes, password_hashes):
+            verification_token = generate_verification_token(4)
+            while verification_token in tokens:
+                verification_token = generate_verification_token(4)
+            tokens.add(verification_token)
+            rows.append({
+                "name": bulk.users[index].name,
+                "email": bulk.users[index].email,
+                "password_hash": password_hash,
+                "verification_token": verification_token,
+                "user_state_id": user_state_record.user_state_id,
+            })
+
+        try:
+            created = {}
+            for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+                # Las filas que chocan con un registro concurrente no se insertan y no se devuelven
+                statement = (
+                    insert(Users)
+                    .values(rows[start:start + BULK_INSERT_CHUNK_SIZE])
+                    .on_conflict_do_nothing()
+                    .returning(Users.user_id, Users.email)
+                )
+                created.update({email: user_id for user_id, email in db.execute(statement)})
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error("Error en el aprovisionamiento masivo de usuarios: %s", str(e))
+            raise HTTPException(status_code=500, detail=f"Error al crear los usuarios: {str(e)}")
+
+        for row in rows:
+            result = results[candidates[row["email"]]]
+            if row["email"] in created:
+                result.update(status="created", user_id=created[row["email"]], message="Usuario creado")
+            else:
+                result["message"] = "El correo ya está registrado o hubo un conflicto; intenta de nuevo"
+
+        if bulk.send_verification:
+            recipients = [(row["email"], row["verification_token"]) for row in rows if row["email"] in created]
+            if recipients:
+                background_tasks.add_task(send_bulk_emails, recipients, "verification")
+
+    created_count = sum(1 for result in results if result["status"] == "created")
+    failed_count = len(results) - created_count
+    logger.info("Aprovisionamiento masivo: %s usuarios creados, %s con errores", created_count, failed_count)
+    return create_response("success", f"{created_count} usuarios creados, {failed_count} con errores", {
+        "created": created_count,
+        "failed": failed_count,
+        "results": results,
+    })
@@ -15,6 +15,7 @@ from dataBase import get_db_session
 from utils.response import create_response, session_token_invalid_response
 from sqlalchemy import func
 from utils.state import get_state
+from utils.membership import get_active_membership, invalidate_user_memberships
 import logging
 
 logger = logging.getLogger(__name__)
@@ -275,11 +276,7 @@ def edit_collaborator_role(
 
     logger.info(f"Estado 'Activo' encontrado: {urf_active_state.name} (ID: {urf_active_state.user_role_farm_state_id})") # Use correct ID field
 
-    user_role_farm = db.query(UserRoleFarm).filter(
-        UserRoleFarm.user_id == user.user_id,
-        UserRoleFarm.farm_id == farm_id,
-        UserRoleFarm.user_role_farm_state_id == urf_active_state.user_role_farm_state_id
-    ).first()
+    user_role_farm = get_active_membership(db, user.user_id, farm_id)
 
     if not user_role_farm:
         logger.warning(f"Usuario {user.name} no está asociado a la finca ID {farm_id}")
@@ -447,6 +444,7 @@ def edit_collaborator_role(
     # 12. Actualizar el rol del colaborador
     try:
         collaborator_role_farm.role_id = target_role.role_id
+        invalidate_user_memberships(db, collaborator.user_id)
         db.commit()
         logger.info(f"Rol del colaborador {collaborator.name} actualizado a '{target_role.name}'")
     except Exception as e:
@@ -538,11 +536,7 @@ def delete_collaborator(
     logger.info(f"Estado 'Activo' encontrado: {urf_active_state.name} (ID: {urf_active_state.user_role_farm_state_id})") # Use correct ID field
 
     # 5. Obtener la asociación UserRoleFarm del usuario con la finca
-    user_role_farm = db.query(UserRoleFarm).filter(
-        UserRoleFarm.user_id == user.user_id,
-        UserRoleFarm.farm_id == farm_id,
-        UserRoleFarm.user_role_farm_state_id == urf_active_state.user_role_farm_state_id
-    ).first()
+    user_role_farm = get_active_membership(db, user.user_id, farm_id)
 
     if not user_role_farm:
         logger.warning(f"Usuario {user.name} no está asociado a la finca ID {farm_id}")
@@ -669,6 +663,7 @@ def delete_collaborator(
             )
 
         collaborator_role_farm.user_role_farm_state_id = urf_inactive_state.user_role_farm_state_id
+        invalidate_user_memberships(db, collaborator.user_id)
         db.commit()
         logger.info(f"Colaborador {collaborator.name} eliminado de la finca ID {farm_id} exitosamente")
     except Exception as e:
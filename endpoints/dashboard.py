@@ -0,0 +1,182 @@
+from fastapi import APIRouter, Depends, Header
+from sqlalchemy import select, exists, func, case, and_
+from sqlalchemy.orm import Session, aliased
+from models.models import (
+    Farms, UserRoleFarm, AreaUnits, Roles, RolePermission, Permissions, Plots, CoffeeVarieties,
+    Transactions, TransactionCategories, TransactionTypes
+)
+from utils.security import verify_session_token
+from dataBase import get_db_session
+from utils.response import create_response, session_token_invalid_response, create_etag_response
+from utils.state import get_state_id
+from typing import Optional
+from datetime import datetime, date, timedelta
+import logging
+import pytz
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+bogota_tz = pytz.timezone("America/Bogota")
+
+INCOME_TYPE_NAMES = ["ingreso", "income", "revenue"]
+EXPENSE_TYPE_NAMES = ["gasto", "expense", "cost"]
+
+
+def _current_month(today: date):
+    """Devuelve el primer día del mes de `today` y el primer día del mes siguiente."""
+    start = today.replace(day=1)
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+
+@router.get("/dashboard")
+def dashboard(
+    session_token: str,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db_session)
+):
+    """
+    Devuelve en una sola respuesta los datos de la pantalla de inicio: las fincas activas del
+    usuario, los lotes activos de cada finca y el balance de ingresos y gastos del mes en curso
+    por lote.
+
+    **Parámetros**:
+    - **session_token**: Token de sesión del usuario.
+    - **If-None-Match** (cabecera): ETag de una respuesta anterior; si los datos no cambiaron se
+      responde 304 sin cuerpo.
+
+    **Descripción**:
+    El árbol completo se calcula con un número fijo de consultas, sin importar cuántas fincas o
+    lotes tenga el usuario:
+    1. Fincas activas del usuario con su rol y si ese rol tiene el permiso `read_financial_report`.
+    2. Lotes activos de esas fincas.
+    3. Ingresos y gastos del mes agrupados por lote, solo para las fincas con permiso de reportes.
+
+    Los lotes de fincas sin permiso de reportes se devuelven con `ingresos`, `gastos` y `balance`
+    en null.
+
+    **Respuestas**:
+    - **200**: Datos del tablero, con cabecera ETag.
+    - **304**: El cliente ya tiene la versión actual.
+    - **401**: Token de sesión inválido.
+    - **500**: Error interno del servidor.
+    """
+    user = verify_session_token(session_token, db)
+    if not user:
+        logger.warning("Token de sesión inválido o usuario no encontrado")
+        return session_token_invalid_response()
+
+    active_farm_state_id = get_state_id(db, "Activo", "Farms")
+    active_urf_state_id = get_state_id(db, "Activo", "user_role_farm")
+    active_plot_state_id = get_state_id(db, "Activo", "Plots")
+    active_transaction_state_id = get_state_id(db, "Activo", "Transactions")
+    if None in (active_farm_state_id, active_urf_state_id, active_plot_state_id, active_transaction_state_id):
+        logger.error("No se encontró alguno de los estados 'Activo' requeridos para el tablero")
+        return create_response("error", "Estados 'Activo' no encontrados", status_code=400)
+
+    period_start, period_end = _current_month(datetime.now(bogota_tz).date())
+
+    try:
+        # 1. Fincas activas del usuario, con su rol y el permiso de reportes financieros
+        can_read_reports = exists().where(
+            RolePermission.role_id == UserRoleFarm.role_id,
+            RolePermission.permission_id == Permissions.permission_id,
+            Permissions.name == "read_financial_report"
+        )
+        farm_rows = db.execute(
+            select(
+                Farms.farm_id, Farms.name, Farms.area, AreaUnits.abbreviation.label("area_unit"),
+                Roles.name.label("role"), can_read_reports.label("can_read_reports")
+            )
+            .select_from(UserRoleFarm)
+            .join(Farms, UserRoleFarm.farm_id == Farms.farm_id)
+            .join(AreaUnits, Farms.area_unit_id == AreaUnits.area_unit_id)
+            .join(Roles, UserRoleFarm.role_id == Roles.role_id)
+            .where(
+                UserRoleFarm.user_id == user.user_id,
+                UserRoleFarm.user_role_farm_state_id == active_urf_state_id,
+                Farms.farm_state_id == active_farm_state_id
+            )
+            .order_by(Farms.name, Farms.farm_id)
+        ).all()
+
+        farms = {}
+        report_farm_ids = []
+        for row in farm_rows:
+            farms[row.farm_id] = {
+                "farm_id": row.farm_id,
+                "name": row.name,
+                "area": row.area,
+                "area_unit": row.area_unit,
+                "role": row.role,
+                "plots": [],
+            }
+            if row.can_read_reports:
+                report_farm_ids.append(row.farm_id)
+
+        # 2. Lotes activos de las fincas
+        plot_rows = []
+        if farms:
+            plot_unit = aliased(AreaUnits)
+            plot_rows = db.execute(
+                select(
+                    Plots.plot_id, Plots.farm_id, Plots.name, Plots.area,
+                    plot_unit.abbreviation.label("area_unit"), CoffeeVarieties.name.label("coffee_variety")
+                )
+                .join(plot_unit, Plots.area_unit_id == plot_unit.area_unit_id)
+                .join(CoffeeVarieties, Plots.coffee_variety_id == CoffeeVarieties.coffee_variety_id)
+                .where(Plots.farm_id.in_(list(farms)), Plots.plot_state_id == active_plot_state_id)
+                .order_by(Plots.name, Plots.plot_id)
+            ).all()
+
+        # 3. Ingresos y gastos del mes por lote (solo fincas con permiso de reportes)
+        balances = {}
+        if report_farm_ids and plot_rows:
+            type_name = func.lower(TransactionTypes.name)
+            balance_rows = db.execute(
+                select(
+                    Transactions.plot_id,
+                    func.coalesce(func.sum(case((type_name.in_(INCOME_TYPE_NAMES), Transactions.value), else_=0)), 0).label("ingresos"),
+                    func.coalesce(func.sum(case((type_name.in_(EXPENSE_TYPE_NAMES), Transactions.value), else_=0)), 0).label("gastos"),
+                )
+                .join(Plots, Transactions.plot_id == Plots.plot_id)
+                .join(TransactionCategories, Transactions.transaction_category_id == TransactionCategories.transaction_category_id)
+                .join(TransactionTypes, TransactionCategories.transaction_type_id == TransactionTypes.transaction_type_id)
+                .where(
+                    Plots.farm_id.in_(report_farm_ids),
+                    Plots.plot_state_id == active_plot_state_id,
+                    Transactions.transaction_state_id == active_transaction_state_id,
+                    and_(Transactions.transaction_date >= period_start, Transactions.transaction_date < period_end)
+                )
+                .group_by(Transactions.plot_id)
+            ).all()
+            balances = {row.plot_id: (float(row.ingresos), float(row.gastos)) for row in balance_rows}
+
+        report_farms = set(report_farm_ids)
+        for row in plot_rows:
+            plot = {
+                "plot_id": row.plot_id,
+                "name": row.name,
+                "area": row.area,
+                "area_unit": row.area_unit,
+                "coffee_variety": row.coffee_variety,
+                "ingresos": None,
+                "gastos": None,
+                "balance": None,
+            }
+            if row.farm_id in report_farms:
+                ingresos, gastos = balances.get(row.plot_id, (0.0, 0.0))
+                plot.update(ingresos=ingresos, gastos=gastos, balance=ingresos - gastos)
+            farms[row.farm_id]["plots"].append(plot)
+
+        data = {
+            "periodo": {"inicio": period_start, "fin": period_end - timedelta(days=1)},
+            "farms": list(farms.values()),
+        }
+    except Exception as e:
+        logger.error("Error al obtener el tablero del usuario %s: %s", user.user_id, str(e))
+        return create_response("error", f"Error al obtener el tablero: {str(e)}", status_code=500)
+
+    return create_etag_response("Tablero obtenido exitosamente", data, if_none_match)
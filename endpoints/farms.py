@@ -1,13 +1,19 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from models.models import Farms, UserRoleFarm, AreaUnits, Roles, FarmStates, RolePermission, Permissions, UserRoleFarmStates
+from typing import Optional
+from datetime import date
+from sqlalchemy import func, select, case
+from sqlalchemy.orm import Session, aliased
+from models.models import Farms, UserRoleFarm, AreaUnits, Roles, FarmStates, RolePermission, Permissions, UserRoleFarmStates, Plots, Transactions
 from utils.security import verify_session_token
 from dataBase import get_db_session
 import logging
 from utils.response import session_token_invalid_response
 from utils.response import create_response
-from utils.state import get_state
+from utils.state import get_state, get_state_id
+from utils.membership import invalidate_user_memberships, invalidate_farm_memberships
+from utils.units import square_meters_factor_sql
+from utils.farm_deactivation import deactivate_farm, MissingStateError
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +43,10 @@ class ListFarmResponse(BaseModel):
     - **area_unit**: Unidad de medida del área (cadena de texto).
     - **farm_state**: Estado actual de la finca (cadena de texto), por ejemplo, 'Activo' o 'Inactivo'.
     - **role**: Rol del usuario en relación a la finca (cadena de texto), como 'Propietario' o 'Administrador'.
+    - **plot_count**: Número de lotes activos (solo con `include_aggregates`).
+    - **plot_area**: Suma del área de los lotes activos en la unidad de la finca (solo con `include_aggregates`).
+    - **collaborator_count**: Número de usuarios activos en la finca (solo con `include_aggregates`).
+    - **last_transaction_date**: Fecha de la última transacción activa (solo con `include_aggregates`).
     """
     farm_id: int
     name: str
@@ -44,6 +54,10 @@ class ListFarmResponse(BaseModel):
     area_unit: str
     farm_state: str
     role: str
+    plot_count: Optional[int] = None
+    plot_area: Optional[float] = None
+    collaborator_count: Optional[int] = None
+    last_transaction_date: Optional[date] = None
     
 class UpdateFarmRequest(BaseModel):
     """
@@ -113,8 +127,8 @@ def create_farm(request: CreateFarmRequest, session_token: str, db: Session = De
         return create_response("error", "No se encontró el estado 'Activo' para el tipo 'Farms'", status_code=400)
 
     # Comprobar si el usuario ya tiene una finca activa con el mismo nombre
-    active_urf_state = get_state(db, "Activo", "user_role_farm")
-    if not active_urf_state:
+    active_urf_state_id = get_state_id(db, "Activo", "user_role_farm")
+    if active_urf_state_id is None:
         logger.error("No se encontró el estado 'Activo' para el tipo 'user_role_farm'")
         return create_response("error", "No se encontró el estado 'Activo' para el tipo 'user_role_farm'", status_code=400)
 
@@ -122,7 +136,7 @@ def create_farm(request: CreateFarmRequest, session_token: str, db: Session = De
         Farms.name == request.name,
         UserRoleFarm.user_id == user.user_id,
         Farms.farm_state_id == active_farm_state.farm_state_id,  # Filtrar solo por fincas activas
-        UserRoleFarm.user_role_farm_state_id == active_urf_state.user_role_farm_state_id  # Check if association is active
+        UserRoleFarm.user_role_farm_state_id == active_urf_state_id  # Check if association is active
     ).first()
 
     if existing_farm:
@@ -160,20 +174,15 @@ def create_farm(request: CreateFarmRequest, session_token: str, db: Session = De
             logger.error("Rol 'Propietario' no encontrado")
             raise HTTPException(status_code=400, detail="Rol 'Propietario' no encontrado")
 
-        # Get active state for UserRoleFarm
-        active_urf_state = get_state(db, "Activo", "user_role_farm")
-        if not active_urf_state:
-             logger.error("No se encontró el estado 'Activo' para el tipo 'user_role_farm'")
-             raise HTTPException(status_code=400, detail="No se encontró el estado 'Activo' para el tipo 'user_role_farm'")
-
         # Crear la relación UserRoleFarm
         user_role_farm = UserRoleFarm(
             user_id=user.user_id,
             farm_id=new_farm.farm_id,
             role_id=role.role_id,
-            user_role_farm_state_id=active_urf_state.user_role_farm_state_id  # Use looked-up state ID
+            user_role_farm_state_id=active_urf_state_id  # Use looked-up state ID
         )
         db.add(user_role_farm)
+        invalidate_user_memberships(db, user.user_id)
         db.commit()
         logger.info("Usuario asignado como 'Propietario' de la finca con ID: %s", new_farm.farm_id)
 
@@ -190,12 +199,15 @@ def create_farm(request: CreateFarmRequest, session_token: str, db: Session = De
 
 
 @router.post("/list-farm")
-def list_farm(session_token: str, db: Session = Depends(get_db_session)):
+def list_farm(session_token: str, include_aggregates: bool = False, db: Session = Depends(get_db_session)):
     """
     Endpoint para listar las fincas activas asociadas a un usuario autenticado mediante un token de sesión.
 
     **Parámetros**:
     - **session_token**: Token de sesión proporcionado por el usuario para autenticarse.
+    - **include_aggregates**: Si es verdadero, cada finca incluye el número de lotes activos, su área total
+      en la unidad de la finca, el número de colaboradores activos y la fecha de la última transacción,
+      calculados en la misma consulta con subconsultas agrupadas.
     - **db**: Sesión de base de datos proporcionada por FastAPI a través de la dependencia.
 
     **Descripción**:
@@ -229,12 +241,26 @@ def list_farm(session_token: str, db: Session = Depends(get_db_session)):
         return create_response("error", "Estado 'Activo' no encontrado para Farms", status_code=400)
 
     # Obtener el state "Activo" para el tipo "user_role_farm"
-    active_urf_state = get_state(db, "Activo", "user_role_farm")
-    if not active_urf_state:
+    active_urf_state_id = get_state_id(db, "Activo", "user_role_farm")
+    if active_urf_state_id is None:
         logger.error("No se encontró el estado 'Activo' para el tipo 'user_role_farm'")
         return create_response("error", "Estado 'Activo' no encontrado para user_role_farm", status_code=400)
 
+    if include_aggregates:
+        active_plot_state = get_state(db, "Activo", "Plots")
+        active_transaction_state = get_state(db, "Activo", "Transactions")
+        if not active_plot_state or not active_transaction_state:
+            logger.error("No se encontró el estado 'Activo' para 'Plots' o 'Transactions'")
+            return create_response("error", "Estado 'Activo' no encontrado para Plots o Transactions", status_code=400)
+
     try:
+        if include_aggregates:
+            farm_list = _list_farms_with_aggregates(
+                db, user.user_id, active_farm_state.farm_state_id, active_urf_state_id,
+                active_plot_state.plot_state_id, active_transaction_state.transaction_state_id
+            )
+            return create_response("success", "Lista de fincas obtenida exitosamente", {"farms": farm_list})
+
         # Realizar la consulta con los filtros adicionales de estado activo
         farms = db.query(Farms, AreaUnits, FarmStates, Roles).select_from(UserRoleFarm).join(
             Farms, UserRoleFarm.farm_id == Farms.farm_id
@@ -246,7 +272,7 @@ def list_farm(session_token: str, db: Session = Depends(get_db_session)):
             Roles, UserRoleFarm.role_id == Roles.role_id
         ).filter(
             UserRoleFarm.user_id == user.user_id,
-            UserRoleFarm.user_role_farm_state_id == active_urf_state.user_role_farm_state_id,
+            UserRoleFarm.user_role_farm_state_id == active_urf_state_id,
             Farms.farm_state_id == active_farm_state.farm_state_id
         ).all()
 
@@ -259,7 +285,8 @@ def list_farm(session_token: str, db: Session = Depends(get_db_session)):
                 area_unit=area_unit.name,
                 farm_state=farm_state.name,
                 role=role.name
-            ))
+            # Sin include_aggregates la respuesta conserva su forma original, sin los campos de agregados
+            ).model_dump(exclude_unset=True))
 
         return create_response("success", "Lista de fincas obtenida exitosamente", {"farms": farm_list})
 
@@ -267,6 +294,99 @@ def list_farm(session_token: str, db: Session = Depends(get_db_session)):
         logger.error("Error al obtener la lista de fincas: %s", str(e))
         raise HTTPException(status_code=500, detail=f"Error al obtener la lista de fincas: {str(e)}")
 
+
+def _list_farms_with_aggregates(db: Session, user_id: int, active_farm_state_id: int, active_urf_state_id: int,
+                                active_plot_state_id: int, active_transaction_state_id: int) -> list:
+    """
+    Lista las fincas activas del usuario con sus agregados en una sola sentencia. Cada
+    agregado es una subconsulta agrupada por finca, limitada a las fincas del usuario y
+    unida con LEFT JOIN.
+
+    Returns:
+        list: Fincas como `ListFarmResponse`, con los campos de agregados.
+    """
+    user_farm_ids = select(UserRoleFarm.farm_id).where(
+        UserRoleFarm.user_id == user_id,
+        UserRoleFarm.user_role_farm_state_id == active_urf_state_id
+    )
+
+    plot_unit = aliased(AreaUnits)
+    plot_factor = square_meters_factor_sql(plot_unit.name, plot_unit.abbreviation)
+    plot_stats = (
+        select(
+            Plots.farm_id,
+            func.count(Plots.plot_id).label("plot_count"),
+            # Si algún lote tiene una unidad desconocida el total es NULL, no una suma parcial
+            case(
+                (func.bool_and(plot_factor.is_not(None)), func.sum(Plots.area * plot_factor)),
+                else_=None
+            ).label("plot_area_m2"),
+        )
+        .join(plot_unit, Plots.area_unit_id == plot_unit.area_unit_id)
+        .where(Plots.farm_id.in_(user_farm_ids), Plots.plot_state_id == active_plot_state_id)
+        .group_by(Plots.farm_id)
+        .subquery("plot_stats")
+    )
+    collaborator_stats = (
+        select(UserRoleFarm.farm_id, func.count(func.distinct(UserRoleFarm.user_id)).label("collaborator_count"))
+        .where(UserRoleFarm.farm_id.in_(user_farm_ids), UserRoleFarm.user_role_farm_state_id == active_urf_state_id)
+        .group_by(UserRoleFarm.farm_id)
+        .subquery("collaborator_stats")
+    )
+    transaction_stats = (
+        select(Plots.farm_id, func.max(Transactions.transaction_date).label("last_transaction_date"))
+        .join(Transactions, Transactions.plot_id == Plots.plot_id)
+        .where(
+            Plots.farm_id.in_(user_farm_ids),
+            Plots.plot_state_id == active_plot_state_id,
+            Transactions.transaction_state_id == active_transaction_state_id
+        )
+        .group_by(Plots.farm_id)
+        .subquery("transaction_stats")
+    )
+
+    farm_factor = square_meters_factor_sql(AreaUnits.name, AreaUnits.abbreviation)
+    rows = db.execute(
+        select(
+            Farms.farm_id, Farms.name, Farms.area,
+            AreaUnits.name.label("area_unit"), FarmStates.name.label("farm_state"), Roles.name.label("role"),
+            func.coalesce(plot_stats.c.plot_count, 0).label("plot_count"),
+            # Sin lotes el área es 0; con alguna unidad desconocida (de la finca o de un lote), NULL
+            (case((plot_stats.c.farm_id.is_(None), 0), else_=plot_stats.c.plot_area_m2) / farm_factor).label("plot_area"),
+            func.coalesce(collaborator_stats.c.collaborator_count, 0).label("collaborator_count"),
+            transaction_stats.c.last_transaction_date,
+        )
+        .select_from(UserRoleFarm)
+        .join(Farms, UserRoleFarm.farm_id == Farms.farm_id)
+        .join(AreaUnits, Farms.area_unit_id == AreaUnits.area_unit_id)
+        .join(FarmStates, Farms.farm_state_id == FarmStates.farm_state_id)
+        .join(Roles, UserRoleFarm.role_id == Roles.role_id)
+        .outerjoin(plot_stats, plot_stats.c.farm_id == Farms.farm_id)
+        .outerjoin(collaborator_stats, collaborator_stats.c.farm_id == Farms.farm_id)
+        .outerjoin(transaction_stats, transaction_stats.c.farm_id == Farms.farm_id)
+        .where(
+            UserRoleFarm.user_id == user_id,
+            UserRoleFarm.user_role_farm_state_id == active_urf_state_id,
+            Farms.farm_state_id == active_farm_state_id
+        )
+    ).all()
+
+    return [
+        ListFarmResponse(
+            farm_id=row.farm_id,
+            name=row.name,
+            area=row.area,
+            area_unit=row.area_unit,
+            farm_state=row.farm_state,
+            role=row.role,
+            plot_count=row.plot_count,
+            plot_area=round(float(row.plot_area), 2) if row.plot_area is not None else None,
+            collaborator_count=row.collaborator_count,
+            last_transaction_date=row.last_transaction_date,
+        )
+        for row in rows
+    ]
+
     
     
 @router.post("/update-farm")
@@ -311,13 +431,13 @@ def update_farm(request: UpdateFarmRequest, session_token: str, db: Session = De
 
     # Obtener el state "Activo" para la finca y la relación user_role_farm
     active_farm_state = get_state(db, "Activo", "Farms")
-    active_urf_state = get_state(db, "Activo", "user_role_farm")
+    active_urf_state_id = get_state_id(db, "Activo", "user_role_farm")
 
     # Verificar si el usuario está asociado con la finca y si tanto la finca como la relación están activas
     user_role_farm = db.query(UserRoleFarm).join(Farms).filter(
         UserRoleFarm.farm_id == request.farm_id,
         UserRoleFarm.user_id == user.user_id,
-        UserRoleFarm.user_role_farm_state_id == active_urf_state.user_role_farm_state_id,
+        UserRoleFarm.user_role_farm_state_id == active_urf_state_id,
         Farms.farm_state_id == active_farm_state.farm_state_id
     ).first()
 
@@ -369,7 +489,7 @@ def update_farm(request: UpdateFarmRequest, session_token: str, db: Session = De
                 UserRoleFarm.user_id == user.user_id,
                 Roles.name == "Propietario",  # Verificar que el usuario sea propietario
                 Farms.farm_state_id == active_farm_state.farm_state_id,
-                UserRoleFarm.user_role_farm_state_id == active_urf_state.user_role_farm_state_id
+                UserRoleFarm.user_role_farm_state_id == active_urf_state_id
             ).first()
 
             if existing_farm:
@@ -429,8 +549,8 @@ def get_farm(farm_id: int, session_token: str, db: Session = Depends(get_db_sess
         logger.error("No se encontró el estado 'Activo' para el tipo 'Farms'")
         return create_response("error", "Estado 'Activo' no encontrado para Farms", status_code=400)
 
-    active_urf_state = get_state(db, "Activo", "user_role_farm")
-    if not active_urf_state:
+    active_urf_state_id = get_state_id(db, "Activo", "user_role_farm")
+    if active_urf_state_id is None:
         logger.error("No se encontró el estado 'Activo' para el tipo 'user_role_farm'")
         return create_response("error", "Estado 'Activo' no encontrado para user_role_farm", status_code=400)
 
@@ -446,7 +566,7 @@ def get_farm(farm_id: int, session_token: str, db: Session = Depends(get_db_sess
             Roles, UserRoleFarm.role_id == Roles.role_id
         ).filter(
             UserRoleFarm.user_id == user.user_id,
-            UserRoleFarm.user_role_farm_state_id == active_urf_state.user_role_farm_state_id,
+            UserRoleFarm.user_role_farm_state_id == active_urf_state_id,
             Farms.farm_state_id == active_farm_state.farm_state_id,
             Farms.farm_id == farm_id
         ).first()
@@ -477,16 +597,19 @@ def get_farm(farm_id: int, session_token: str, db: Session = Depends(get_db_sess
 
 
 @router.post("/delete-farm/{farm_id}")
-def delete_farm(farm_id: int, session_token: str, db: Session = Depends(get_db_session)):
+def delete_farm(farm_id: int, session_token: str, include_transactions: bool = False, db: Session = Depends(get_db_session)):
     """
     Elimina (inactiva) una finca específica.
 
     **Parámetros:**
     - `farm_id` (int): ID de la finca a eliminar.
     - `session_token` (str): Token de sesión del usuario que está haciendo la solicitud.
+    - `include_transactions` (bool): Si es verdadero también se inactivan las transacciones de los lotes.
 
     **Respuesta exitosa (200):**
-    - **Descripción**: Indica que la finca ha sido desactivada correctamente.
+    - **Descripción**: Indica que la finca ha sido desactivada correctamente. Las membresías, los lotes y
+      las invitaciones pendientes se inactivan con ella, con una sentencia UPDATE por tabla.
+    - **Datos**: `affected`, filas afectadas por tabla.
 
     **Errores:**
     - **401 Unauthorized**: Si el token de sesión es inválido o el usuario no se encuentra.
@@ -508,8 +631,8 @@ def delete_farm(farm_id: int, session_token: str, db: Session = Depends(get_db_s
         logger.error("No se encontró el estado 'Activo' para el tipo 'Farms'")
         return create_response("error", "Estado 'Activo' no encontrado para Farms", status_code=400)
 
-    active_urf_state = get_state(db, "Activo", "user_role_farm")
-    if not active_urf_state:
+    active_urf_state_id = get_state_id(db, "Activo", "user_role_farm")
+    if active_urf_state_id is None:
         logger.error("No se encontró el estado 'Activo' para el tipo 'user_role_farm'")
         return create_response("error", "Estado 'Activo' no encontrado para user_role_farm", status_code=400)
 
@@ -517,7 +640,7 @@ def delete_farm(farm_id: int, session_token: str, db: Session = Depends(get_db_s
     user_role_farm = db.query(UserRoleFarm).join(Farms).filter(
         UserRoleFarm.user_id == user.user_id,
         UserRoleFarm.farm_id == farm_id,
-        UserRoleFarm.user_role_farm_state_id == active_urf_state.user_role_farm_state_id,
+        UserRoleFarm.user_role_farm_state_id == active_urf_state_id,
         Farms.farm_state_id == active_farm_state.farm_state_id
     ).first()
 
@@ -542,29 +665,16 @@ def delete_farm(farm_id: int, session_token: str, db: Session = Depends(get_db_s
             logger.warning("Finca no encontrada")
             return create_response("error", "Finca no encontrada")
 
-        # Cambiar el estado de la finca a "Inactiva"
-        inactive_farm_state = get_state(db, "Inactiva", "Farms")
-
-        if not inactive_farm_state:
-            logger.error("No se encontró el estado 'Inactiva' para el tipo 'Farms'")
-            raise HTTPException(status_code=400, detail="No se encontró el estado 'Inactiva' para el tipo 'Farms'.")
-
-        farm.farm_state_id = inactive_farm_state.farm_state_id
-
-        # Cambiar el estado de todas las relaciones en user_role_farm a "Inactiva"
-        inactive_urf_state = get_state(db, "Inactiva", "user_role_farm")
-
-        if not inactive_urf_state:
-            logger.error("No se encontró el estado 'Inactiva' para el tipo 'user_role_farm'")
-            raise HTTPException(status_code=400, detail="No se encontró el estado 'Inactiva' para el tipo 'user_role_farm'.")
-
-        user_role_farms = db.query(UserRoleFarm).filter(UserRoleFarm.farm_id == farm_id).all()
-        for urf in user_role_farms:
-            urf.user_role_farm_state_id = inactive_urf_state.user_role_farm_state_id
-
+        affected = deactivate_farm(db, farm_id, include_transactions=include_transactions)
+        invalidate_farm_memberships(db, farm_id)
         db.commit()
-        logger.info("Finca y relaciones en user_role_farm puestas en estado 'Inactiva' para la finca con ID %s", farm_id)
-        return create_response("success", "Finca puesta en estado 'Inactiva' correctamente")
+        logger.info("Finca con ID %s puesta en estado 'Inactiva' con sus dependencias: %s", farm_id, affected)
+        return create_response("success", "Finca puesta en estado 'Inactiva' correctamente", {"affected": affected})
+
+    except MissingStateError as e:
+        db.rollback()
+        logger.error(str(e))
+        raise HTTPException(status_code=400, detail=str(e))
 
     except Exception as e:
         db.rollback()
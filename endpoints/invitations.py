@@ -8,6 +8,7 @@ from utils.FCM import send_fcm_notification
 from models.models import Farms, UserRoleFarm, Users, Roles, Permissions, RolePermission, Invitations, Notifications, UserRoleFarmStates, NotificationTypes
 from utils.response import create_response, session_token_invalid_response
 from utils.state import get_state
+from utils.membership import get_active_membership, invalidate_user_memberships
 import pytz
 from datetime import datetime
 
@@ -58,11 +59,7 @@ def create_invitation(invitation_data: InvitationCreate, session_token: str, db:
     if not urf_active_state:
         return create_response("error", "El estado 'Activo' no fue encontrado para 'user_role_farm'", status_code=400)
 
-    user_role_farm = db.query(UserRoleFarm).filter(
-        UserRoleFarm.user_id == user.user_id,
-        UserRoleFarm.farm_id == invitation_data.farm_id,
-        UserRoleFarm.user_role_farm_state_id == urf_active_state.user_role_farm_state_id
-    ).first()
+    user_role_farm = get_active_membership(db, user.user_id, invitation_data.farm_id)
 
     if not user_role_farm:
         return create_response("error", "No tienes acceso a esta finca", status_code=403)
@@ -250,6 +247,7 @@ def respond_invitation(invitation_id: int, action: str, session_token: str, db:
             user_role_farm_state_id=urf_active_state.user_role_farm_state_id  # Estado "Activo" del tipo "user_role_farm"
         )
         db.add(new_user_role_farm)
+        invalidate_user_memberships(db, user.user_id)
         db.commit()
 
         # Crear la notificación para el usuario que hizo la invitación (inviter_user_id)
@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from utils.metrics import generate_metrics, sample_threadpool
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Expone las métricas de la aplicación en formato de texto de Prometheus.
+
+    Returns:
+        Response: Métricas de conteo, latencia y errores por prefijo de router,
+        solicitudes en curso y ocupación del threadpool.
+    """
+    sample_threadpool()
+    content, content_type = generate_metrics()
+    return Response(content=content, media_type=content_type)
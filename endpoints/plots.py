@@ -1,18 +1,39 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, HTTPException, Depends, Header, Response, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Optional
+from sqlalchemy import select, func, literal_column
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
-from models.models import Farms, UserRoleFarm, Permissions, RolePermission, Plots, CoffeeVarieties
+from models.models import Farms, UserRoleFarm, Permissions, RolePermission, Plots, CoffeeVarieties, AreaUnits
 from utils.security import verify_session_token
 from dataBase import get_db_session
 import logging
 from utils.response import session_token_invalid_response
-from utils.response import create_response
-from utils.state import get_state
+from utils.response import create_response, etag_matches
+from utils.state import get_state, get_state_id
+from utils.membership import get_active_membership
+from utils.plot_version import bump_plot_version, plot_list_etag
+from utils.geometry import (
+    InvalidBoundary, validate_boundary, boundary_areas_m2, boundary_bounding_boxes, boundary_centroids
+)
+from utils.units import square_meters_to_unit
+import os
+import io
+import csv
+import json
+import math
 
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
+# Columna generada `point(longitude, latitude)` con índice GiST (ver utils.schema)
+PLOT_LOCATION = literal_column("plots.location")
+
+SPATIAL_QUERY_MAX_RESULTS = 500
+EARTH_RADIUS_M = 6371008.8
+
 # Modelos Pydantic para las solicitudes y respuestas
 class CreatePlotRequest(BaseModel):
     """Modelo para la solicitud de creación de un lote (plot)."""
@@ -36,6 +57,32 @@ class UpdatePlotLocationRequest(BaseModel):
     longitude: str = Field(..., description="Nueva longitud del lote.")
     altitude: str = Field(..., description="Nueva altitud del lote.")
 
+class UpdatePlotBoundaryRequest(BaseModel):
+    """Modelo para la solicitud de actualización del lindero de un lote."""
+    plot_id: int = Field(..., description="ID del lote a actualizar.")
+    boundary: Optional[List[List[float]]] = Field(
+        None, description="Vértices del lindero como pares [longitud, latitud]; null elimina el lindero."
+    )
+
+class PlotImportRow(BaseModel):
+    """Fila de la importación masiva de lotes."""
+    name: str = Field(..., max_length=100)
+    coffee_variety_name: str
+    area: Optional[float] = Field(None, gt=0)
+    area_unit: Optional[str] = Field(None, description="Nombre o abreviatura; por defecto, la unidad de la finca.")
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    altitude: Optional[float] = Field(None, ge=0, le=3000)
+    boundary: Optional[List[List[float]]] = None
+
+# Área máxima que cabe en la columna `area` (Numeric(10, 2))
+MAX_PLOT_AREA = 99999999.99
+
+PLOT_IMPORT_MAX_ROWS = int(os.getenv("PLOT_IMPORT_MAX_ROWS", 5000))
+# Tamaño máximo del cuerpo de la importación de lotes (JSON o CSV)
+PLOT_IMPORT_MAX_BYTES = int(os.getenv("PLOT_IMPORT_MAX_BYTES", 10 * 1024 * 1024))
+PLOT_IMPORT_CHUNK_SIZE = 500
+
 # Endpoint para crear un lote
 @router.post("/create-plot")
 def create_plot(request: CreatePlotRequest, session_token: str, db: Session = Depends(get_db_session)):
@@ -63,11 +110,6 @@ def create_plot(request: CreatePlotRequest, session_token: str, db: Session = De
         logger.error("No se encontró el estado 'Activo' para el tipo 'Farms'")
         return create_response("error", "No se encontró el estado 'Activo' para el tipo 'Farms'", status_code=400)
 
-    active_urf_state = get_state(db, "Activo", "user_role_farm")
-    if not active_urf_state:
-        logger.error("No se encontró el estado 'Activo' para el tipo 'user_role_farm'")
-        return create_response("error", "No se encontró el estado 'Activo' para el tipo 'user_role_farm'", status_code=400)
-
     # Obtener el estado "Activo" para Plots
     active_plot_state = get_state(db, "Activo", "Plots")
     if not active_plot_state:
@@ -81,11 +123,7 @@ def create_plot(request: CreatePlotRequest, session_token: str, db: Session = De
         return create_response("error", "La finca no existe o no está activa")
 
     # Verificar si el usuario tiene un rol en la finca
-    user_role_farm = db.query(UserRoleFarm).filter(
-        UserRoleFarm.user_id == user.user_id,
-        UserRoleFarm.farm_id == request.farm_id,
-        UserRoleFarm.user_role_farm_state_id == active_urf_state.user_role_farm_state_id
-    ).first()
+    user_role_farm = get_active_membership(db, user.user_id, request.farm_id)
     
     if not user_role_farm:
         logger.warning("El usuario no está asociado con la finca con ID %s", request.farm_id)
@@ -136,6 +174,7 @@ def create_plot(request: CreatePlotRequest, session_token: str, db: Session = De
             plot_state_id=active_plot_state.plot_state_id
         )
         db.add(new_plot)
+        bump_plot_version(db, request.farm_id)
         db.commit()
         db.refresh(new_plot)
         logger.info("Lote creado exitosamente con ID: %s", new_plot.plot_id)
@@ -192,18 +231,8 @@ def update_plot_general_info(request: UpdatePlotGeneralInfoRequest, session_toke
         logger.warning("La finca asociada al lote no existe")
         return create_response("error", "La finca asociada al lote no existe")
 
-    # Obtener el estado "Activo" para UserRoleFarm
-    active_urf_state = get_state(db, "Activo", "user_role_farm")
-    if not active_urf_state:
-        logger.error("No se encontró el estado 'Activo' para el tipo 'user_role_farm'")
-        return create_response("error", "No se encontró el estado 'Activo' para el tipo 'user_role_farm'", status_code=400)
-
     # Verificar si el usuario tiene un rol en la finca
-    user_role_farm = db.query(UserRoleFarm).filter(
-        UserRoleFarm.user_id == user.user_id,
-        UserRoleFarm.farm_id == farm.farm_id,
-        UserRoleFarm.user_role_farm_state_id == active_urf_state.user_role_farm_state_id
-    ).first()
+    user_role_farm = get_active_membership(db, user.user_id, farm.farm_id)
     if not user_role_farm:
         logger.warning("El usuario no está asociado con la finca con ID %s", farm.farm_id)
         return create_response("error", "No tienes permiso para editar un lote en esta finca")
@@ -246,6 +275,7 @@ def update_plot_general_info(request: UpdatePlotGeneralInfoRequest, session_toke
     try:
         plot.name = request.name
         plot.coffee_variety_id = coffee_variety.coffee_variety_id
+        bump_plot_version(db, plot.farm_id)
         db.commit()
         db.refresh(plot)
         logger.info("Lote actualizado exitosamente con ID: %s", plot.plot_id)
@@ -297,18 +327,8 @@ def update_plot_location(request: UpdatePlotLocationRequest, session_token: str,
         logger.warning("La finca asociada al lote no existe")
         return create_response("error", "La finca asociada al lote no existe")
 
-    # Obtener el estado "Activo" para UserRoleFarm
-    active_urf_state = get_state(db, "Activo", "user_role_farm")
-    if not active_urf_state:
-        logger.error("No se encontró el estado 'Activo' para el tipo 'user_role_farm'")
-        return create_response("error", "No se encontró el estado 'Activo' para el tipo 'user_role_farm'", status_code=400)
-
     # Verificar si el usuario tiene un rol en la finca
-    user_role_farm = db.query(UserRoleFarm).filter(
-        UserRoleFarm.user_id == user.user_id,
-        UserRoleFarm.farm_id == farm.farm_id,
-        UserRoleFarm.user_role_farm_state_id == active_urf_state.user_role_farm_state_id
-    ).first()
+    user_role_farm = get_active_membership(db, user.user_id, farm.farm_id)
     if not user_role_farm:
         logger.warning("El usuario no está asociado con la finca con ID %s", farm.farm_id)
         return create_response("error", "No tienes permiso para editar un lote en esta finca")
@@ -327,6 +347,7 @@ def update_plot_location(request: UpdatePlotLocationRequest, session_token: str,
         plot.latitude = request.latitude
         plot.longitude = request.longitude
         plot.altitude = request.altitude
+        bump_plot_version(db, plot.farm_id)
         db.commit()
         db.refresh(plot)
         logger.info("Ubicación del lote actualizada exitosamente con ID: %s", plot.plot_id)
@@ -341,17 +362,378 @@ def update_plot_location(request: UpdatePlotLocationRequest, session_token: str,
         logger.error("Error al actualizar la ubicación del lote: %s", str(e))
         raise HTTPException(status_code=500, detail=f"Error al actualizar la ubicación del lote: {str(e)}")
 
+# Endpoint para actualizar el lindero del lote
+@router.post("/update-plot-boundary", summary="Actualizar lindero del lote", description="Guarda el polígono del lindero de un lote y recalcula su área y su rectángulo envolvente.")
+def update_plot_boundary(request: UpdatePlotBoundaryRequest, session_token: str, db: Session = Depends(get_db_session)):
+    """
+    Guarda o elimina el lindero de un lote. Con un lindero, el área del lote se calcula en el
+    servidor (sobre la esfera, en la unidad de área del lote) y se guarda su rectángulo
+    envolvente; si el lote no tenía ubicación se usa el centro del lindero.
+
+    Args:
+        request (UpdatePlotBoundaryRequest): ID del lote y vértices del lindero.
+        session_token (str): Token de sesión del usuario para autenticar la solicitud.
+        db (Session): Sesión de base de datos proporcionada por la dependencia.
+
+    Returns:
+        dict: Área calculada, unidad y rectángulo envolvente del lote.
+    """
+    user = verify_session_token(session_token, db)
+    if not user:
+        logger.warning("Token de sesión inválido o usuario no encontrado")
+        return session_token_invalid_response()
+
+    active_plot_state_id = get_state_id(db, "Activo", "Plots")
+    plot = db.query(Plots).filter(Plots.plot_id == request.plot_id, Plots.plot_state_id == active_plot_state_id).first()
+    if not plot:
+        logger.warning("El lote con ID %s no existe o no está activo", request.plot_id)
+        return create_response("error", "El lote no existe o no está activo")
+
+    user_role_farm = get_active_membership(db, user.user_id, plot.farm_id)
+    if not user_role_farm:
+        logger.warning("El usuario no está asociado con la finca con ID %s", plot.farm_id)
+        return create_response("error", "No tienes permiso para editar un lote en esta finca")
+
+    role_permission = db.query(RolePermission).join(Permissions).filter(
+        RolePermission.role_id == user_role_farm.role_id,
+        Permissions.name == "edit_plot"
+    ).first()
+    if not role_permission:
+        logger.warning("El rol del usuario no tiene permiso para editar el lote en la finca")
+        return create_response("error", "No tienes permiso para editar un lote en esta finca")
+
+    if request.boundary is None:
+        bounding_box = None
+    else:
+        try:
+            ring = validate_boundary(request.boundary)
+        except InvalidBoundary as e:
+            return create_response("error", str(e), status_code=400)
+
+        area_unit = db.query(AreaUnits).filter(AreaUnits.area_unit_id == plot.area_unit_id).first()
+        area = square_meters_to_unit(boundary_areas_m2([ring])[0], area_unit.name, area_unit.abbreviation)
+        if area is None:
+            return create_response("error", f"No se puede calcular el área en la unidad '{area_unit.name}'", status_code=400)
+        if not 0 < area <= MAX_PLOT_AREA:
+            return create_response("error", "El área del lindero está fuera del rango permitido", status_code=400)
+        bounding_box = boundary_bounding_boxes([ring])[0]
+        centroid = boundary_centroids([ring])[0]
+
+    try:
+        if bounding_box is None:
+            plot.boundary = None
+            plot.min_longitude = plot.min_latitude = plot.max_longitude = plot.max_latitude = None
+        else:
+            plot.boundary = ring.tolist()
+            plot.area = round(area, 2)
+            plot.min_longitude, plot.min_latitude, plot.max_longitude, plot.max_latitude = (float(v) for v in bounding_box)
+            if plot.longitude is None or plot.latitude is None:
+                plot.longitude, plot.latitude = float(centroid[0]), float(centroid[1])
+        bump_plot_version(db, plot.farm_id)
+        db.commit()
+        db.refresh(plot)
+        logger.info("Lindero del lote actualizado exitosamente con ID: %s", plot.plot_id)
+        return create_response("success", "Lindero del lote actualizado correctamente", {
+            "plot_id": plot.plot_id,
+            "area": plot.area,
+            "area_unit_id": plot.area_unit_id,
+            "bounding_box": None if bounding_box is None else {
+                "min_longitude": plot.min_longitude,
+                "min_latitude": plot.min_latitude,
+                "max_longitude": plot.max_longitude,
+                "max_latitude": plot.max_latitude
+            }
+        })
+    except Exception as e:
+        db.rollback()
+        logger.error("Error al actualizar el lindero del lote: %s", str(e))
+        raise HTTPException(status_code=500, detail=f"Error al actualizar el lindero del lote: {str(e)}")
+
+def _parse_import_body(body: bytes, content_type: str) -> list:
+    """
+    Lee las filas de una importación: un arreglo JSON (o un objeto con la clave `plots`) o un
+    CSV con encabezados. En el CSV las celdas vacías son nulas y `boundary` es un arreglo JSON.
+
+    Raises:
+        ValueError: Si el cuerpo no se puede leer.
+    """
+    if "csv" in content_type:
+        reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+        rows = []
+        for record in reader:
+            row = {key.strip(): (value.strip() or None) if isinstance(value, str) else value
+                   for key, value in record.items() if key}
+            if row.get("boundary"):
+                try:
+                    row["boundary"] = json.loads(row["boundary"])
+                except ValueError:
+                    pass  # Se informa como error de la fila al validarla
+            rows.append(row)
+        return rows
+    data = json.loads(body)
+    if isinstance(data, dict):
+        data = data.get("plots")
+    if not isinstance(data, list):
+        raise ValueError("Se esperaba un arreglo de lotes")
+    return data
+
+
+def _plot_import_too_large():
+    return create_response("error", f"El archivo de lotes no puede superar {PLOT_IMPORT_MAX_BYTES} bytes", status_code=413)
+
+
+# Endpoint para importar varios lotes de una finca
+@router.post("/bulk-import/{farm_id}", summary="Importar lotes en bloque")
+async def bulk_import_plots(
+    farm_id: int,
+    session_token: str,
+    request: Request,
+    all_or_nothing: bool = False,
+    db: Session = Depends(get_db_session)
+):
+    """
+    Crea varios lotes de una finca en una sola transacción, a partir de un arreglo JSON
+    (`application/json`) o de un CSV con encabezados (`text/csv`).
+
+    Columnas: `name`, `coffee_variety_name`, `area`, `area_unit` (nombre o abreviatura; por
+    defecto la de la finca), `latitude`, `longitude`, `altitude` y `boundary` (pares
+    [longitud, latitud]). Con `boundary` el área se calcula en el servidor y reemplaza a `area`.
+
+    Los nombres se comparan con los lotes existentes en una sola consulta, las variedades y
+    unidades se resuelven con mapas en memoria y los lotes se insertan con INSERT de varias
+    filas.
+
+    - **farm_id**: ID de la finca.
+    - **session_token**: Token de sesión del usuario autenticado (requiere permiso 'add_plot').
+    - **all_or_nothing**: Si es verdadero y alguna fila tiene errores, no se crea ningún lote.
+
+    **Retornos**:
+    - Resultado por fila (`created` o `error` con su mensaje) y totales.
+    - **413** si el cuerpo supera PLOT_IMPORT_MAX_BYTES.
+    """
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > PLOT_IMPORT_MAX_BYTES:
+        return _plot_import_too_large()
+    chunks = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > PLOT_IMPORT_MAX_BYTES:
+            return _plot_import_too_large()
+        chunks.append(chunk)
+    body = b"".join(chunks)
+    content_type = request.headers.get("content-type", "")
+    return await run_in_threadpool(_bulk_import_plots, farm_id, session_token, body, content_type, all_or_nothing, db)
+
+
+def _bulk_import_plots(farm_id: int, session_token: str, body: bytes, content_type: str, all_or_nothing: bool,
+                       db: Session):
+    user = verify_session_token(session_token, db)
+    if not user:
+        logger.warning("Token de sesión inválido o usuario no encontrado")
+        return session_token_invalid_response()
+
+    farm = db.query(Farms).filter(Farms.farm_id == farm_id, Farms.farm_state_id == get_state_id(db, "Activo", "Farms")).first()
+    if not farm:
+        logger.warning("La finca con ID %s no existe o no está activa", farm_id)
+        return create_response("error", "La finca no existe o no está activa")
+
+    user_role_farm = get_active_membership(db, user.user_id, farm_id)
+    if not user_role_farm:
+        logger.warning("El usuario no está asociado con la finca con ID %s", farm_id)
+        return create_response("error", "No tienes permiso para agregar lotes en esta finca")
+
+    role_permission = db.query(RolePermission).join(Permissions).filter(
+        RolePermission.role_id == user_role_farm.role_id,
+        Permissions.name == "add_plot"
+    ).first()
+    if not role_permission:
+        logger.warning("El rol del usuario no tiene permiso para agregar lotes en la finca")
+        return create_response("error", "No tienes permiso para agregar lotes en esta finca")
+
+    try:
+        raw_rows = _parse_import_body(body, content_type)
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return create_response("error", f"No se pudo leer el archivo de lotes: {str(e)}", status_code=400)
+    if not raw_rows:
+        return create_response("error", "La lista de lotes está vacía")
+    if len(raw_rows) > PLOT_IMPORT_MAX_ROWS:
+        return create_response("error", f"Se permiten como máximo {PLOT_IMPORT_MAX_ROWS} lotes por solicitud", status_code=400)
+
+    active_plot_state_id = get_state_id(db, "Activo", "Plots")
+    if active_plot_state_id is None:
+        return create_response("error", "No se encontró el estado 'Activo' para el tipo 'Plots'", status_code=400)
+
+    # Mapas en memoria de variedades y unidades (tablas de referencia pequeñas)
+    varieties = {name.lower(): variety_id for variety_id, name in db.query(CoffeeVarieties.coffee_variety_id, CoffeeVarieties.name)}
+    units = {}
+    for unit in db.query(AreaUnits).all():
+        units[unit.name.lower()] = unit
+        units[unit.abbreviation.lower()] = unit
+    farm_unit = next(unit for unit in units.values() if unit.area_unit_id == farm.area_unit_id)
+
+    results = [{"index": index, "name": None, "status": "error", "message": None} for index in range(len(raw_rows))]
+
+    # Validación por fila y nombres repetidos dentro de la misma solicitud
+    candidates = {}
+    for index, raw in enumerate(raw_rows):
+        try:
+            row = PlotImportRow.model_validate(raw)
+        except ValidationError as e:
+            error = e.errors()[0]
+            results[index]["message"] = f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+            continue
+        name = row.name.strip()
+        results[index]["name"] = name
+        if not name:
+            results[index]["message"] = "El nombre del lote no puede estar vacío"
+            continue
+        if name in candidates:
+            results[index]["message"] = "El nombre está repetido en la solicitud"
+            continue
+        if row.coffee_variety_name.strip().lower() not in varieties:
+            results[index]["message"] = f"La variedad de café '{row.coffee_variety_name}' no existe"
+            continue
+        unit = units.get(row.area_unit.strip().lower()) if row.area_unit else farm_unit
+        if unit is None:
+            results[index]["message"] = f"La unidad de área '{row.area_unit}' no existe"
+            continue
+        if (row.latitude is None) != (row.longitude is None):
+            results[index]["message"] = "La latitud y la longitud deben enviarse juntas"
+            continue
+        if row.boundary is None and row.area is None:
+            results[index]["message"] = "Se requiere el área o el lindero del lote"
+            continue
+        candidates[name] = (index, row, unit)
+
+    # Nombres ya usados en la finca (la restricción única incluye lotes inactivos), en una sola consulta
+    if candidates:
+        for (name,) in db.query(Plots.name).filter(Plots.farm_id == farm_id, Plots.name.in_(list(candidates))):
+            results[candidates.pop(name)[0]]["message"] = "Ya existe un lote con este nombre en la finca"
+
+    # Linderos: validación por fila y área, rectángulo y centro calculados para todos a la vez
+    with_boundary = []
+    for name, (index, row, unit) in list(candidates.items()):
+        if row.boundary is None:
+            continue
+        try:
+            with_boundary.append((name, validate_boundary(row.boundary)))
+        except InvalidBoundary as e:
+            results[index]["message"] = str(e)
+            del candidates[name]
+    rings = [ring for _, ring in with_boundary]
+    geometry = dict(zip(
+        [name for name, _ in with_boundary],
+        zip(rings, boundary_areas_m2(rings), boundary_bounding_boxes(rings), boundary_centroids(rings))
+    ))
+
+    rows = []
+    for name, (index, row, unit) in list(candidates.items()):
+        values = {
+            "name": name,
+            "farm_id": farm_id,
+            "coffee_variety_id": varieties[row.coffee_variety_name.strip().lower()],
+            "area": row.area,
+            "area_unit_id": unit.area_unit_id,
+            "latitude": row.latitude,
+            "longitude": row.longitude,
+            "altitude": row.altitude,
+            "plot_state_id": active_plot_state_id,
+            "boundary": None,
+            "min_longitude": None,
+            "min_latitude": None,
+            "max_longitude": None,
+            "max_latitude": None,
+        }
+        if name in geometry:
+            ring, area_m2, bounding_box, centroid = geometry[name]
+            area = square_meters_to_unit(area_m2, unit.name, unit.abbreviation)
+            if area is None:
+                results[index]["message"] = f"No se puede calcular el área en la unidad '{unit.name}'"
+                del candidates[name]
+                continue
+            values.update(
+                area=round(area, 2),
+                boundary=ring.tolist(),
+                min_longitude=float(bounding_box[0]),
+                min_latitude=float(bounding_box[1]),
+                max_longitude=float(bounding_box[2]),
+                max_latitude=float(bounding_box[3]),
+            )
+            if values["latitude"] is None:
+                values["longitude"], values["latitude"] = float(centroid[0]), float(centroid[1])
+        if not 0 < values["area"] <= MAX_PLOT_AREA:
+            results[index]["message"] = "El área del lote está fuera del rango permitido"
+            del candidates[name]
+            continue
+        rows.append(values)
+
+    failed_count = sum(1 for result in results if result["message"] is not None)
+    if all_or_nothing and failed_count:
+        return create_response("error", f"{failed_count} filas con errores; no se creó ningún lote", {
+            "created": 0,
+            "failed": failed_count,
+            "results": results,
+        }, status_code=400)
+
+    created = {}
+    if rows:
+        try:
+            for start in range(0, len(rows), PLOT_IMPORT_CHUNK_SIZE):
+                # Las filas que chocan con un lote creado en paralelo no se insertan y no se devuelven
+                statement = (
+                    insert(Plots)
+                    .values(rows[start:start + PLOT_IMPORT_CHUNK_SIZE])
+                    .on_conflict_do_nothing()
+                    .returning(Plots.plot_id, Plots.name)
+                )
+                created.update({name: plot_id for plot_id, name in db.execute(statement)})
+            if all_or_nothing and len(created) < len(rows):
+                db.rollback()
+                return create_response("error", "Otro usuario creó lotes con los mismos nombres; no se creó ningún lote", status_code=409)
+            if created:
+                bump_plot_version(db, farm_id)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error("Error en la importación masiva de lotes: %s", str(e))
+            raise HTTPException(status_code=500, detail=f"Error al importar los lotes: {str(e)}")
+
+    for row in rows:
+        result = results[candidates[row["name"]][0]]
+        if row["name"] in created:
+            result.update(status="created", plot_id=created[row["name"]], message="Lote creado")
+        else:
+            result["message"] = "Ya existe un lote con este nombre en la finca"
+
+    created_count = len(created)
+    failed_count = len(results) - created_count
+    logger.info("Importación de lotes en la finca %s: %s creados, %s con errores", farm_id, created_count, failed_count)
+    return create_response("success", f"{created_count} lotes creados, {failed_count} con errores", {
+        "created": created_count,
+        "failed": failed_count,
+        "results": results,
+    })
+
 # Endpoint para listar todos los lotes de una finca
 @router.get("/list-plots/{farm_id}", summary="Listar los lotes de una finca", tags=["Plots"])
-def list_plots(farm_id: int, session_token: str, db: Session = Depends(get_db_session)):
+def list_plots(
+    farm_id: int,
+    session_token: str,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db_session)
+):
     """
     Obtiene una lista de todos los lotes activos de una finca específica.
 
     - **farm_id**: ID de la finca.
     - **session_token**: Token de sesión del usuario autenticado.
+    - **If-None-Match** (cabecera): ETag de un listado anterior. La respuesta lleva un ETag débil
+      derivado de la versión de los lotes de la finca; si no cambió se responde 304 sin cuerpo.
 
     **Respuestas**:
     - **200**: Lista de lotes obtenida exitosamente.
+    - **304**: Los lotes no cambiaron desde el ETag enviado.
     - **400**: Token inválido o falta de permisos para ver los lotes.
     - **404**: Finca no encontrada o inactiva.
     - **500**: Error al obtener la lista de lotes.
@@ -364,7 +746,6 @@ def list_plots(farm_id: int, session_token: str, db: Session = Depends(get_db_se
 
     # Obtener los estados "Activo"
     active_farm_state = get_state(db, "Activo", "Farms")
-    active_urf_state = get_state(db, "Activo", "user_role_farm")
     active_plot_state = get_state(db, "Activo", "Plots")
 
     # Verificar que la finca existe y está activa
@@ -374,11 +755,7 @@ def list_plots(farm_id: int, session_token: str, db: Session = Depends(get_db_se
         return create_response("error", "La finca no existe o no está activa")
 
     # Verificar si el usuario tiene un rol en la finca
-    user_role_farm = db.query(UserRoleFarm).filter(
-        UserRoleFarm.user_id == user.user_id,
-        UserRoleFarm.farm_id == farm_id,
-        UserRoleFarm.user_role_farm_state_id == active_urf_state.user_role_farm_state_id
-    ).first()
+    user_role_farm = get_active_membership(db, user.user_id, farm_id)
     if not user_role_farm:
         logger.warning("El usuario no está asociado con la finca con ID %s", farm_id)
         return create_response("error", "No tienes permiso para ver los lotes de esta finca")
@@ -392,33 +769,184 @@ def list_plots(farm_id: int, session_token: str, db: Session = Depends(get_db_se
         logger.warning("El rol del usuario no tiene permiso para ver los lotes en la finca")
         return create_response("error", "No tienes permiso para ver los lotes de esta finca")
 
-    # Obtener todos los lotes activos de la finca
+    # Si el cliente ya tiene la versión actual de los lotes no se consultan ni se serializan
+    etag = plot_list_etag(farm_id, farm.plot_version)
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=cache_headers)
+
+    # Obtener todos los lotes activos de la finca con su variedad en una sola consulta
     try:
-        plots = db.query(Plots).filter(
+        plots = db.query(
+            Plots.plot_id,
+            Plots.name,
+            CoffeeVarieties.name.label("coffee_variety_name"),
+            Plots.latitude,
+            Plots.longitude,
+            Plots.altitude
+        ).outerjoin(
+            CoffeeVarieties, CoffeeVarieties.coffee_variety_id == Plots.coffee_variety_id
+        ).filter(
             Plots.farm_id == farm_id,
             Plots.plot_state_id == active_plot_state.plot_state_id
         ).all()
 
-        plot_list = []
-        for plot in plots:
-            coffee_variety = db.query(CoffeeVarieties).filter(
-                CoffeeVarieties.coffee_variety_id == plot.coffee_variety_id
-            ).first()
-            plot_list.append({
-                "plot_id": plot.plot_id,
-                "name": plot.name,
-                "coffee_variety_name": coffee_variety.name if coffee_variety else None,
-                "latitude": plot.latitude,
-                "longitude": plot.longitude,
-                "altitude": plot.altitude
-            })
-
-        return create_response("success", "Lista de lotes obtenida exitosamente", {"plots": plot_list})
+        plot_list = [plot._asdict() for plot in plots]
+
+        response = create_response("success", "Lista de lotes obtenida exitosamente", {"plots": plot_list})
+        response.headers.update(cache_headers)
+        return response
 
     except Exception as e:
         logger.error("Error al obtener la lista de lotes: %s", str(e))
         raise HTTPException(status_code=500, detail=f"Error al obtener la lista de lotes: {str(e)}")
 
+def _readable_farm_ids(db: Session, user_id: int):
+    """
+    Subconsulta con las fincas activas en las que el usuario es miembro activo y su rol
+    tiene el permiso 'read_plots'.
+    """
+    return (
+        select(UserRoleFarm.farm_id)
+        .join(Farms, Farms.farm_id == UserRoleFarm.farm_id)
+        .join(RolePermission, RolePermission.role_id == UserRoleFarm.role_id)
+        .join(Permissions, Permissions.permission_id == RolePermission.permission_id)
+        .where(
+            UserRoleFarm.user_id == user_id,
+            UserRoleFarm.user_role_farm_state_id == get_state_id(db, "Activo", "user_role_farm"),
+            Farms.farm_state_id == get_state_id(db, "Activo", "Farms"),
+            Permissions.name == "read_plots"
+        )
+    )
+
+
+def _located_plots_query(db: Session, user_id: int):
+    """Consulta base de los lotes activos con ubicación de las fincas que el usuario puede ver."""
+    return (
+        select(
+            Plots.plot_id,
+            Plots.farm_id,
+            Plots.name,
+            CoffeeVarieties.name.label("coffee_variety_name"),
+            Plots.latitude,
+            Plots.longitude,
+            Plots.altitude
+        )
+        .outerjoin(CoffeeVarieties, CoffeeVarieties.coffee_variety_id == Plots.coffee_variety_id)
+        .where(
+            Plots.farm_id.in_(_readable_farm_ids(db, user_id)),
+            Plots.plot_state_id == get_state_id(db, "Activo", "Plots"),
+            PLOT_LOCATION.isnot(None)
+        )
+    )
+
+
+def _in_viewport(viewport):
+    """Condición de lotes visibles en el rectángulo: por su ubicación o por su lindero."""
+    return PLOT_LOCATION.op("<@")(viewport) | literal_column("plots.bounds").op("&&")(viewport)
+
+
+def _distance_m(latitude: float, longitude: float, other_latitude, other_longitude) -> float:
+    """Distancia en metros entre dos coordenadas (fórmula del haversine)."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (latitude, longitude, float(other_latitude), float(other_longitude)))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+# Endpoint para buscar los lotes dentro de un área del mapa
+@router.get("/in-bbox", summary="Lotes dentro de un rectángulo del mapa")
+def plots_in_bbox(
+    session_token: str,
+    min_latitude: float = Query(..., ge=-90, le=90),
+    min_longitude: float = Query(..., ge=-180, le=180),
+    max_latitude: float = Query(..., ge=-90, le=90),
+    max_longitude: float = Query(..., ge=-180, le=180),
+    limit: int = Query(SPATIAL_QUERY_MAX_RESULTS, ge=1, le=SPATIAL_QUERY_MAX_RESULTS),
+    db: Session = Depends(get_db_session)
+):
+    """
+    Obtiene los lotes activos cuya ubicación está dentro del rectángulo indicado o cuyo lindero
+    lo toca, de todas las fincas en las que el usuario tiene permiso 'read_plots'. Usa los
+    índices GiST sobre la ubicación y sobre el rectángulo envolvente del lindero. Cada lote
+    incluye su lindero (o null).
+
+    - **session_token**: Token de sesión del usuario autenticado.
+    - **min_latitude**, **min_longitude**, **max_latitude**, **max_longitude**: Esquinas del rectángulo.
+    - **limit**: Máximo de lotes a devolver.
+
+    **Respuestas**:
+    - **200**: Lotes dentro del rectángulo.
+    - **400**: Rectángulo inválido.
+    - **500**: Error al consultar los lotes.
+    """
+    user = verify_session_token(session_token, db)
+    if not user:
+        logger.warning("Token de sesión inválido o usuario no encontrado")
+        return session_token_invalid_response()
+
+    if min_latitude > max_latitude or min_longitude > max_longitude:
+        return create_response("error", "El rectángulo es inválido: los mínimos deben ser menores que los máximos", status_code=400)
+
+    try:
+        viewport = func.box(func.point(min_longitude, min_latitude), func.point(max_longitude, max_latitude))
+        plots = db.execute(
+            _located_plots_query(db, user.user_id)
+            .add_columns(Plots.boundary)
+            .where(_in_viewport(viewport))
+            .order_by(Plots.plot_id)
+            .limit(limit)
+        ).all()
+        plot_list = [plot._asdict() for plot in plots]
+        return create_response("success", "Lotes obtenidos exitosamente", {"plots": plot_list})
+    except Exception as e:
+        logger.error("Error al buscar lotes por rectángulo: %s", str(e))
+        raise HTTPException(status_code=500, detail=f"Error al buscar lotes por rectángulo: {str(e)}")
+
+
+# Endpoint para buscar los lotes más cercanos a una ubicación
+@router.get("/nearby", summary="Lotes más cercanos a una ubicación")
+def nearby_plots(
+    session_token: str,
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db_session)
+):
+    """
+    Obtiene los `limit` lotes activos más cercanos a una ubicación, de todas las fincas en las
+    que el usuario tiene permiso 'read_plots'. La búsqueda usa el operador `<->` sobre el índice
+    GiST (distancia en grados, adecuada a las distancias entre lotes) y cada lote incluye su
+    distancia en metros.
+
+    - **session_token**: Token de sesión del usuario autenticado.
+    - **latitude**, **longitude**: Ubicación de referencia.
+    - **limit**: Número de lotes a devolver.
+
+    **Respuestas**:
+    - **200**: Lotes ordenados del más cercano al más lejano.
+    - **500**: Error al consultar los lotes.
+    """
+    user = verify_session_token(session_token, db)
+    if not user:
+        logger.warning("Token de sesión inválido o usuario no encontrado")
+        return session_token_invalid_response()
+
+    try:
+        plots = db.execute(
+            _located_plots_query(db, user.user_id)
+            .order_by(PLOT_LOCATION.op("<->")(func.point(longitude, latitude)))
+            .limit(limit)
+        ).all()
+        plot_list = []
+        for plot in plots:
+            item = plot._asdict()
+            item["distance_m"] = round(_distance_m(latitude, longitude, plot.latitude, plot.longitude), 1)
+            plot_list.append(item)
+        return create_response("success", "Lotes cercanos obtenidos exitosamente", {"plots": plot_list})
+    except Exception as e:
+        logger.error("Error al buscar lotes cercanos: %s", str(e))
+        raise HTTPException(status_code=500, detail=f"Error al buscar lotes cercanos: {str(e)}")
+
 # Endpoint para obtener la información de un lote específico
 @router.get("/get-plot/{plot_id}", summary="Obtener información de un lote", tags=["Plots"])
 def get_plot(plot_id: int, session_token: str, db: Session = Depends(get_db_session)):
@@ -444,7 +972,6 @@ def get_plot(plot_id: int, session_token: str, db: Session = Depends(get_db_sess
     # Obtener los estados "Activo"
     active_plot_state = get_state(db, "Activo", "Plots")
     active_farm_state = get_state(db, "Activo", "Farms")
-    active_urf_state = get_state(db, "Activo", "user_role_farm")
 
     # Obtener el lote
     plot = db.query(Plots).filter(Plots.plot_id == plot_id, Plots.plot_state_id == active_plot_state.plot_state_id).first()
@@ -459,11 +986,7 @@ def get_plot(plot_id: int, session_token: str, db: Session = Depends(get_db_sess
         return create_response("error", "La finca asociada al lote no existe o no está activa")
 
     # Verificar si el usuario tiene un rol en la finca
-    user_role_farm = db.query(UserRoleFarm).filter(
-        UserRoleFarm.user_id == user.user_id,
-        UserRoleFarm.farm_id == farm.farm_id,
-        UserRoleFarm.user_role_farm_state_id == active_urf_state.user_role_farm_state_id
-    ).first()
+    user_role_farm = get_active_membership(db, user.user_id, farm.farm_id)
     if not user_role_farm:
         logger.warning("El usuario no está asociado con la finca con ID %s", farm.farm_id)
         return create_response("error", "No tienes permiso para ver este lote")
@@ -533,15 +1056,8 @@ def delete_plot(plot_id: int, session_token: str, db: Session = Depends(get_db_s
         logger.warning("La finca asociada al lote no existe")
         return create_response("error", "La finca asociada al lote no existe")
 
-    # Obtener el estado "Activo" para UserRoleFarm
-    active_urf_state = get_state(db, "Activo", "user_role_farm")
-
     # Verificar si el usuario tiene un rol en la finca
-    user_role_farm = db.query(UserRoleFarm).filter(
-        UserRoleFarm.user_id == user.user_id,
-        UserRoleFarm.farm_id == farm.farm_id,
-        UserRoleFarm.user_role_farm_state_id == active_urf_state.user_role_farm_state_id
-    ).first()
+    user_role_farm = get_active_membership(db, user.user_id, farm.farm_id)
     if not user_role_farm:
         logger.warning("El usuario no está asociado con la finca con ID %s", farm.farm_id)
         return create_response("error", "No tienes permiso para eliminar este lote")
@@ -558,6 +1074,7 @@ def delete_plot(plot_id: int, session_token: str, db: Session = Depends(get_db_s
     # Cambiar el estado del lote a 'Inactivo'
     try:
         plot.plot_state_id = inactive_plot_state.plot_state_id
+        bump_plot_version(db, plot.farm_id)
         db.commit()
         logger.info("Lote con ID %s puesto en estado 'Inactivo'", plot.plot_id)
         return create_response("success", "Lote eliminado correctamente")
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from models.models import (
-    Transactions, Plots, Users, Farms, UserRoleFarm, RolePermission, Permissions
+    Transactions, Plots, Users, Farms, RolePermission, Permissions
 )
 from utils.security import verify_session_token
 from dataBase import get_db_session
@@ -9,6 +9,7 @@ import logging
 from typing import List, Optional
 from utils.response import create_response, session_token_invalid_response
 from utils.state import get_state
+from utils.membership import get_active_membership
 from pydantic import BaseModel, Field, conlist
 from datetime import date
 from fastapi.encoders import jsonable_encoder
@@ -122,16 +123,7 @@ def financial_report(
             return create_response("error", "La finca asociada a los lotes no existe", status_code=404)
         
         # 4. Verificar que el usuario esté asociado con esta finca y tenga permisos
-        active_urf_state = get_state(db, "Activo", "user_role_farm")
-        if not active_urf_state:
-            logger.error("Estado 'Activo' para user_role_farm no encontrado")
-            return create_response("error", "Estado 'Activo' para user_role_farm no encontrado", status_code=500)
-        
-        user_role_farm = db.query(UserRoleFarm).filter(
-            UserRoleFarm.user_id == user.user_id,
-            UserRoleFarm.farm_id == farm_id,
-            UserRoleFarm.user_role_farm_state_id == active_urf_state.user_role_farm_state_id
-        ).first()
+        user_role_farm = get_active_membership(db, user.user_id, farm_id)
         
         if not user_role_farm:
             logger.warning(f"El usuario {user.user_id} no está asociado con la finca {farm_id}")
@@ -1,16 +1,36 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Query
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field, constr
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from models.models import (
-    TransactionCategories, Transactions, TransactionTypes, Plots, Farms, TransactionStates, RolePermission, Permissions, UserRoleFarm
+    TransactionCategories, Transactions, TransactionTypes, Plots, Farms, TransactionStates, RolePermission, Permissions, UserRoleFarm,
+    Users
 )
 from utils.security import verify_session_token
-from dataBase import get_db_session
+from dataBase import get_db_session, SessionLocal
 import logging
-from typing import Optional
+from typing import Optional, List
 from utils.response import session_token_invalid_response, create_response
-from utils.state import get_state
+from utils.state import get_state, get_state_id
+from utils.membership import get_active_membership
+from utils.transaction_import import (
+    TransactionImportBatchValidator, check_columns, create_staging_table, spool_rows, stage_spooled_rows,
+    insert_staged_transactions
+)
+from utils.export import (
+    EXPORT_MEDIA_TYPES, available_formats, arrow_schema, iter_csv, iter_parquet, iter_arrow_stream
+)
 from datetime import date
+from decimal import Decimal
+import os
+import re
+import io
+import csv
+import time
+import codecs
+import tempfile
 import pytz
 from fastapi.encoders import jsonable_encoder
 
@@ -21,6 +41,28 @@ logger = logging.getLogger(__name__)
 
 bogota_tz = pytz.timezone("America/Bogota")
 
+TRANSACTION_IMPORT_MAX_ROWS = int(os.getenv("TRANSACTION_IMPORT_MAX_ROWS", 200000))
+TRANSACTION_IMPORT_BATCH_ROWS = int(os.getenv("TRANSACTION_IMPORT_BATCH_ROWS", 5000))
+TRANSACTION_IMPORT_MAX_ERRORS = 1000
+# Bytes de filas validadas que se guardan en memoria antes de pasar a un archivo temporal en disco
+TRANSACTION_IMPORT_SPOOL_MEMORY = int(os.getenv("TRANSACTION_IMPORT_SPOOL_MEMORY", 4 * 1024 * 1024))
+# Caracteres que se guardan en memoria esperando el fin de una fila (p. ej. una comilla sin cerrar)
+TRANSACTION_IMPORT_MAX_PENDING_CHARS = int(os.getenv("TRANSACTION_IMPORT_MAX_PENDING_CHARS", 1024 * 1024))
+TRANSACTION_EXPORT_BATCH_ROWS = int(os.getenv("TRANSACTION_EXPORT_BATCH_ROWS", 5000))
+
+# Columnas de la exportación y su tipo de Python (para el esquema de Parquet/Arrow)
+TRANSACTION_EXPORT_COLUMNS = [
+    ("transaction_id", int),
+    ("plot_id", int),
+    ("plot_name", str),
+    ("transaction_type_name", str),
+    ("transaction_category_name", str),
+    ("description", str),
+    ("value", Decimal),
+    ("transaction_date", date),
+    ("creator_name", str),
+]
+
 # Pydantic Models for Transactions Endpoints
 
 class CreateTransactionRequest(BaseModel):
@@ -83,14 +125,14 @@ def create_transaction(
         return session_token_invalid_response()
     
     # 3. Verificar que el usuario tenga permiso 'add_transaction'
-    active_urf_state = get_state(db, "Activo", "user_role_farm")
-    if not active_urf_state:
+    active_urf_state_id = get_state_id(db, "Activo", "user_role_farm")
+    if active_urf_state_id is None:
         logger.error("Estado 'Activo' para user_role_farm no encontrado")
         return create_response("error", "Estado 'Activo' para user_role_farm no encontrado", status_code=400)
     
     user_role_farm = db.query(UserRoleFarm).filter(
         UserRoleFarm.user_id == user.user_id,
-        UserRoleFarm.user_role_farm_state_id == active_urf_state.user_role_farm_state_id
+        UserRoleFarm.user_role_farm_state_id == active_urf_state_id
     ).first()
     
     if not user_role_farm:
@@ -234,16 +276,7 @@ def edit_transaction(
         return create_response("error", "La transacción está inactiva y no puede ser modificada", status_code=403)
  
     # 5. Verificar que el usuario esté asociado con la finca del lote de la transacción
-    active_urf_state = get_state(db, "Activo", "user_role_farm")
-    if not active_urf_state:
-        logger.error("Estado 'Activo' para user_role_farm no encontrado")
-        return create_response("error", "Estado 'Activo' para user_role_farm no encontrado", status_code=400)
-    
-    user_role_farm = db.query(UserRoleFarm).filter(
-        UserRoleFarm.user_id == user.user_id,
-        UserRoleFarm.farm_id == transaction.plot.farm_id,
-        UserRoleFarm.user_role_farm_state_id == active_urf_state.user_role_farm_state_id
-    ).first()
+    user_role_farm = get_active_membership(db, user.user_id, transaction.plot.farm_id)
     
     if not user_role_farm:
         logger.warning(f"El usuario {user.user_id} no está asociado con la finca {transaction.plot.farm_id}")
@@ -378,16 +411,7 @@ def delete_transaction(
         return create_response("error", "La transacción ya está eliminada", status_code=400)
     
     # 5. Verificar que el usuario esté asociado con la finca del lote de la transacción
-    active_urf_state = get_state(db, "Activo", "user_role_farm")
-    if not active_urf_state:
-        logger.error("Estado 'Activo' para user_role_farm no encontrado")
-        return create_response("error", "Estado 'Activo' para user_role_farm no encontrado", status_code=400)
-    
-    user_role_farm = db.query(UserRoleFarm).filter(
-        UserRoleFarm.user_id == user.user_id,
-        UserRoleFarm.farm_id == transaction.plot.farm_id,
-        UserRoleFarm.user_role_farm_state_id == active_urf_state.user_role_farm_state_id
-    ).first()
+    user_role_farm = get_active_membership(db, user.user_id, transaction.plot.farm_id)
     
     if not user_role_farm:
         logger.warning(f"El usuario {user.user_id} no está asociado con la finca {transaction.plot.farm_id}")
@@ -459,16 +483,7 @@ def read_transactions(
         logger.warning("La finca asociada al lote no existe")
         return create_response("error", "La finca asociada al lote no existe", status_code=404)
     
-    active_urf_state = get_state(db, "Activo", "user_role_farm")
-    if not active_urf_state:
-        logger.error("Estado 'Activo' para user_role_farm no encontrado")
-        return create_response("error", "Estado 'Activo' para user_role_farm no encontrado", status_code=400)
-    
-    user_role_farm = db.query(UserRoleFarm).filter(
-        UserRoleFarm.user_id == user.user_id,
-        UserRoleFarm.farm_id == farm.farm_id,
-        UserRoleFarm.user_role_farm_state_id == active_urf_state.user_role_farm_state_id
-    ).first()
+    user_role_farm = get_active_membership(db, user.user_id, farm.farm_id)
     
     if not user_role_farm:
         logger.warning(f"El usuario no está asociado con la finca con ID {farm.farm_id}")
@@ -525,3 +540,385 @@ def read_transactions(
         return create_response("success", "El lote no tiene transacciones registradas", {"transactions": []})
     
     return create_response("success", "Transacciones obtenidas exitosamente", {"transactions": transaction_list})
+
+
+class CSVRecordTooLarge(ValueError):
+    """Una fila del CSV (o una comilla sin cerrar) supera TRANSACTION_IMPORT_MAX_PENDING_CHARS."""
+
+
+_CSV_BOUNDARIES = re.compile('["\\n]')
+
+
+async def _iter_csv_rows(stream):
+    """
+    Lee un CSV desde el cuerpo de la solicitud a medida que llega y devuelve sus filas por
+    bloques, sin cargar el archivo completo en memoria. Un bloque solo se corta en un salto de
+    línea fuera de comillas; la paridad de las comillas se lleva solo sobre el texto nuevo de
+    cada fragmento.
+
+    Cada fila se devuelve como (línea, fila), donde línea es el número de la línea física del
+    archivo en que empieza; cuenta las filas vacías y los campos entre comillas de varias líneas.
+
+    Raises:
+        CSVRecordTooLarge: Si quedan más de TRANSACTION_IMPORT_MAX_PENDING_CHARS caracteres sin
+            poder cortar.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    in_quotes = False
+    lines_read = 0
+
+    def parse(text):
+        nonlocal lines_read
+        reader = csv.reader(io.StringIO(text))
+        rows = []
+        start = 1
+        for row in reader:
+            rows.append((lines_read + start, row))
+            start = reader.line_num + 1
+        lines_read += reader.line_num
+        return rows
+
+    async for chunk in stream:
+        text = decoder.decode(chunk)
+        offset = len(pending)
+        pending += text
+        cut = 0
+        for boundary in _CSV_BOUNDARIES.finditer(text):
+            if boundary.group() == '"':
+                in_quotes = not in_quotes
+            elif not in_quotes:
+                cut = offset + boundary.end()
+        if cut:
+            complete, pending = pending[:cut], pending[cut:]
+            yield parse(complete)
+        if len(pending) > TRANSACTION_IMPORT_MAX_PENDING_CHARS:
+            raise CSVRecordTooLarge(
+                f"Una fila del CSV supera {TRANSACTION_IMPORT_MAX_PENDING_CHARS} caracteres o tiene una comilla sin cerrar"
+            )
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield parse(pending)
+
+
+def _prepare_transaction_import(db: Session, session_token: str, farm_id: int):
+    """
+    Verifica la sesión y el permiso 'add_transaction' en la finca y carga los lotes activos y
+    las categorías para validar la importación.
+
+    Returns:
+        dict: Contexto de la importación, o una respuesta de error.
+    """
+    user = verify_session_token(session_token, db)
+    if not user:
+        logger.warning("Token de sesión inválido o usuario no encontrado")
+        return session_token_invalid_response()
+
+    active_farm_state = get_state(db, "Activo", "Farms")
+    active_plot_state = get_state(db, "Activo", "Plots")
+    active_transaction_state = get_state(db, "Activo", "Transactions")
+    if not active_farm_state or not active_plot_state or not active_transaction_state:
+        logger.error("Estados 'Activo' para Farms, Plots o Transactions no encontrados")
+        return create_response("error", "Estados 'Activo' para Farms, Plots o Transactions no encontrados", status_code=500)
+
+    farm = db.query(Farms).filter(Farms.farm_id == farm_id, Farms.farm_state_id == active_farm_state.farm_state_id).first()
+    if not farm:
+        logger.warning(f"La finca con ID {farm_id} no existe o no está activa")
+        return create_response("error", "La finca no existe o no está activa", status_code=404)
+
+    user_role_farm = get_active_membership(db, user.user_id, farm_id)
+    if not user_role_farm:
+        logger.warning(f"El usuario no está asociado con la finca con ID {farm_id}")
+        return create_response("error", "No tienes permiso para agregar transacciones en esta finca", status_code=403)
+
+    role_permission = db.query(RolePermission).join(Permissions).filter(
+        RolePermission.role_id == user_role_farm.role_id,
+        Permissions.name == "add_transaction"
+    ).first()
+    if not role_permission:
+        logger.warning(f"El rol {user_role_farm.role_id} del usuario no tiene permiso para agregar transacciones")
+        return create_response("error", "No tienes permiso para agregar transacciones", status_code=403)
+
+    plots = db.query(Plots.plot_id, Plots.name).filter(
+        Plots.farm_id == farm_id,
+        Plots.plot_state_id == active_plot_state.plot_state_id
+    ).all()
+    categories = db.query(
+        TransactionTypes.name, TransactionCategories.name, TransactionCategories.transaction_category_id
+    ).join(TransactionCategories, TransactionCategories.transaction_type_id == TransactionTypes.transaction_type_id).all()
+
+    context = {
+        "user_id": user.user_id,
+        "plots_by_id": {plot.plot_id: plot.plot_id for plot in plots},
+        "plots_by_name": {plot.name.strip().lower(): plot.plot_id for plot in plots},
+        "categories": {f"{type_name.lower()}\x1f{category_name.lower()}": category_id
+                       for type_name, category_name, category_id in categories},
+        "active_plot_state_id": active_plot_state.plot_state_id,
+        "active_transaction_state_id": active_transaction_state.transaction_state_id,
+    }
+    # Devolver la conexión al pool mientras llega el archivo
+    db.commit()
+    return context
+
+
+def _validate_transaction_batch(validator: TransactionImportBatchValidator, spool, rows: list, lines: list):
+    """Valida un bloque de filas y agrega las válidas al archivo temporal de la importación."""
+    valid_rows, errors = validator.validate(rows, lines)
+    return spool_rows(spool, valid_rows), errors
+
+
+def _insert_spooled_transactions(db: Session, spool, context: dict, farm_id: int) -> int:
+    """Carga las filas del archivo temporal con COPY y las pasa a `transactions`."""
+    cursor = db.connection().connection.cursor()
+    try:
+        create_staging_table(cursor)
+        stage_spooled_rows(cursor, spool)
+    finally:
+        cursor.close()
+    return insert_staged_transactions(
+        db, farm_id, context["active_plot_state_id"], context["active_transaction_state_id"], context["user_id"]
+    )
+
+
+# Endpoint to Import Transactions from CSV
+@router.post("/import-transactions/{farm_id}")
+async def import_transactions(
+    farm_id: int,
+    session_token: str,
+    request: Request,
+    all_or_nothing: bool = False,
+    db: Session = Depends(get_db_session)
+):
+    """
+    Importa transacciones de una finca desde un CSV enviado como cuerpo de la solicitud
+    (`text/csv`).
+
+    El archivo se procesa a medida que llega, en bloques de TRANSACTION_IMPORT_BATCH_ROWS
+    filas: cada bloque se valida de forma vectorizada (lote de la finca, tipo y categoría,
+    valor, fecha y descripción) y sus filas válidas se acumulan en un archivo temporal. Mientras
+    llega el archivo no se retiene ninguna conexión; al terminar, las filas se cargan con COPY
+    en una tabla temporal y pasan a `transactions` con un solo INSERT ... SELECT.
+
+    - **farm_id**: ID de la finca.
+    - **session_token**: Token de sesión del usuario (requiere permiso 'add_transaction').
+    - **all_or_nothing**: Si es verdadero y alguna fila tiene errores, no se importa ninguna.
+
+    Columnas: `plot_id` o `plot_name`, `transaction_type_name`, `transaction_category_name`,
+    `value`, `transaction_date` (AAAA-MM-DD) y `description` (opcional).
+
+    **Retornos**:
+    - Filas importadas y con errores, reporte de errores por línea (hasta
+      TRANSACTION_IMPORT_MAX_ERRORS) y filas por segundo.
+    """
+    started = time.perf_counter()
+    context = await run_in_threadpool(_prepare_transaction_import, db, session_token, farm_id)
+    if not isinstance(context, dict):
+        return context
+
+    validator = None
+    batch = []
+    batch_lines = []
+    total_rows = staged_rows = failed_rows = 0
+    error_report = []
+    spool = tempfile.SpooledTemporaryFile(
+        max_size=TRANSACTION_IMPORT_SPOOL_MEMORY, mode="w+", encoding="utf-8", newline=""
+    )
+
+    async def flush():
+        nonlocal batch, batch_lines, staged_rows, failed_rows
+        staged, errors = await run_in_threadpool(_validate_transaction_batch, validator, spool, batch, batch_lines)
+        staged_rows += staged
+        failed_rows += len(errors)
+        error_report.extend(errors[:TRANSACTION_IMPORT_MAX_ERRORS - len(error_report)])
+        batch = []
+        batch_lines = []
+
+    try:
+        try:
+            async for rows in _iter_csv_rows(request.stream()):
+                for line, row in rows:
+                    if validator is None:
+                        header_error = check_columns(row)
+                        if header_error:
+                            return create_response("error", header_error, status_code=400)
+                        validator = TransactionImportBatchValidator(
+                            row, context["plots_by_id"], context["plots_by_name"], context["categories"]
+                        )
+                        continue
+                    if not any(value.strip() for value in row):
+                        continue
+                    total_rows += 1
+                    if total_rows > TRANSACTION_IMPORT_MAX_ROWS:
+                        return create_response(
+                            "error", f"Se permiten como máximo {TRANSACTION_IMPORT_MAX_ROWS} filas por importación", status_code=400
+                        )
+                    batch.append(row)
+                    batch_lines.append(line)
+                    if len(batch) >= TRANSACTION_IMPORT_BATCH_ROWS:
+                        await flush()
+            if validator is None or total_rows == 0:
+                return create_response("error", "El archivo no tiene filas de transacciones", status_code=400)
+            if batch:
+                await flush()
+        except CSVRecordTooLarge as e:
+            logger.warning(f"Importación de transacciones rechazada en la finca {farm_id}: {str(e)}")
+            return create_response("error", str(e), status_code=400)
+
+        if all_or_nothing and failed_rows:
+            return create_response("error", f"{failed_rows} filas con errores; no se importó ninguna transacción", {
+                "imported": 0,
+                "failed": failed_rows,
+                "errors": error_report,
+            }, status_code=400)
+
+        # La transacción empieza aquí, con el archivo completo y ya validado
+        imported = 0
+        if staged_rows:
+            try:
+                imported = await run_in_threadpool(_insert_spooled_transactions, db, spool, context, farm_id)
+                await run_in_threadpool(db.commit)
+            except Exception as e:
+                await run_in_threadpool(db.rollback)
+                logger.error(f"Error al importar transacciones en la finca {farm_id}: {str(e)}")
+                return create_response("error", f"Error al importar las transacciones: {str(e)}", status_code=500)
+    finally:
+        await run_in_threadpool(spool.close)
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Importación de transacciones en la finca {farm_id}: {imported} importadas, {failed_rows} con errores en {elapsed:.2f} s")
+    return create_response("success", f"{imported} transacciones importadas, {failed_rows} con errores", {
+        "imported": imported,
+        "failed": failed_rows,
+        # Filas válidas cuyo lote dejó de estar activo durante la importación
+        "skipped": staged_rows - imported,
+        "errors": error_report,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(total_rows / elapsed, 1) if elapsed > 0 else None,
+    })
+
+
+def _stream_transaction_export(query, file_format: str):
+    """
+    Ejecuta la consulta de exportación con un cursor del lado del servidor y escribe sus filas
+    en bloques de TRANSACTION_EXPORT_BATCH_ROWS. Usa su propia sesión porque la del endpoint se
+    cierra antes de que empiece a enviarse el cuerpo de la respuesta.
+    """
+    columns = [name for name, _ in TRANSACTION_EXPORT_COLUMNS]
+    db = SessionLocal()
+    try:
+        result = db.execute(query.execution_options(stream_results=True, yield_per=TRANSACTION_EXPORT_BATCH_ROWS))
+        partitions = result.partitions()
+        if file_format == "csv":
+            yield from iter_csv(columns, partitions)
+        else:
+            schema = arrow_schema(columns, [python_type for _, python_type in TRANSACTION_EXPORT_COLUMNS])
+            writer = iter_parquet if file_format == "parquet" else iter_arrow_stream
+            yield from writer(schema, partitions)
+    except Exception as e:
+        # La respuesta ya empezó a enviarse: solo queda registrar el error y cortar el stream
+        logger.error(f"Error al exportar transacciones: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+
+# Endpoint to Export Transactions
+@router.get("/export-transactions/{farm_id}")
+def export_transactions(
+    farm_id: int,
+    session_token: str,
+    plot_ids: Optional[List[int]] = Query(None),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    file_format: str = Query("csv", alias="format"),
+    db: Session = Depends(get_db_session)
+):
+    """
+    Exporta las transacciones de una finca como archivo descargable.
+
+    Las filas se leen con un cursor del lado del servidor y se envían por bloques a medida que
+    se escriben, así que la memoria usada no depende del número de transacciones exportadas.
+
+    - **farm_id**: ID de la finca.
+    - **session_token**: Token de sesión del usuario (requiere permiso 'read_transaction').
+    - **plot_ids**: Lotes a exportar (se puede repetir); por defecto, todos los lotes activos.
+    - **start_date** / **end_date**: Rango de fechas de las transacciones (ambos incluidos).
+    - **format**: `csv` (por defecto), `parquet` o `arrow` (Arrow IPC en streaming). Los
+      formatos columnares solo están disponibles si `pyarrow` está instalado.
+
+    **Retornos**:
+    - Archivo con las columnas transaction_id, plot_id, plot_name, transaction_type_name,
+      transaction_category_name, description, value, transaction_date y creator_name,
+      ordenado por fecha.
+    """
+    user = verify_session_token(session_token, db)
+    if not user:
+        logger.warning("Token de sesión inválido o usuario no encontrado")
+        return session_token_invalid_response()
+
+    file_format = file_format.lower()
+    if file_format not in EXPORT_MEDIA_TYPES:
+        return create_response("error", "Formato no válido; usa csv, parquet o arrow", status_code=400)
+    if file_format not in available_formats():
+        logger.warning(f"Formato de exportación '{file_format}' no disponible: pyarrow no está instalado")
+        return create_response("error", f"El formato {file_format} no está disponible en este servidor", status_code=400)
+    if start_date and end_date and start_date > end_date:
+        return create_response("error", "La fecha inicial no puede ser posterior a la fecha final", status_code=400)
+
+    active_farm_state = get_state(db, "Activo", "Farms")
+    active_plot_state = get_state(db, "Activo", "Plots")
+    inactive_transaction_state = get_state(db, "Inactivo", "Transactions")
+    if not active_farm_state or not active_plot_state or not inactive_transaction_state:
+        logger.error("Estados de Farms, Plots o Transactions no encontrados")
+        return create_response("error", "Estados de Farms, Plots o Transactions no encontrados", status_code=500)
+
+    farm = db.query(Farms).filter(Farms.farm_id == farm_id, Farms.farm_state_id == active_farm_state.farm_state_id).first()
+    if not farm:
+        logger.warning(f"La finca con ID {farm_id} no existe o no está activa")
+        return create_response("error", "La finca no existe o no está activa", status_code=404)
+
+    user_role_farm = get_active_membership(db, user.user_id, farm_id)
+    if not user_role_farm:
+        logger.warning(f"El usuario no está asociado con la finca con ID {farm_id}")
+        return create_response("error", "No tienes permiso para ver las transacciones en esta finca", status_code=403)
+
+    role_permission = db.query(RolePermission).join(Permissions).filter(
+        RolePermission.role_id == user_role_farm.role_id,
+        Permissions.name == "read_transaction"
+    ).first()
+    if not role_permission:
+        logger.warning("El rol del usuario no tiene permiso para leer transacciones")
+        return create_response("error", "No tienes permiso para ver las transacciones en esta finca", status_code=403)
+
+    query = (
+        select(
+            Transactions.transaction_id, Transactions.plot_id, Plots.name, TransactionTypes.name,
+            TransactionCategories.name, Transactions.description, Transactions.value,
+            Transactions.transaction_date, Users.name
+        )
+        .join(Plots, Transactions.plot_id == Plots.plot_id)
+        .join(TransactionCategories, Transactions.transaction_category_id == TransactionCategories.transaction_category_id)
+        .join(TransactionTypes, TransactionCategories.transaction_type_id == TransactionTypes.transaction_type_id)
+        .outerjoin(Users, Transactions.creator_id == Users.user_id)
+        .where(
+            Plots.farm_id == farm_id,
+            Plots.plot_state_id == active_plot_state.plot_state_id,
+            Transactions.transaction_state_id != inactive_transaction_state.transaction_state_id
+        )
+        .order_by(Transactions.transaction_date, Transactions.transaction_id)
+    )
+    if plot_ids:
+        query = query.where(Transactions.plot_id.in_(plot_ids))
+    if start_date:
+        query = query.where(Transactions.transaction_date >= start_date)
+    if end_date:
+        query = query.where(Transactions.transaction_date <= end_date)
+
+    extension = "arrows" if file_format == "arrow" else file_format
+    filename = f"transacciones_finca_{farm_id}.{extension}"
+    logger.info(f"Exportando transacciones de la finca {farm_id} en formato {file_format} para el usuario {user.user_id}")
+    return StreamingResponse(
+        _stream_transaction_export(query, file_format),
+        media_type=EXPORT_MEDIA_TYPES[file_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -1,7 +1,14 @@
 from fastapi import FastAPI
-from endpoints import auth, farms, invitations, notifications, transactions, utils, collaborators, plots, reports
+from endpoints import auth, farms, invitations, notifications, transactions, utils, collaborators, plots, reports, admin, metrics, dashboard
 from dataBase import engine
 from models.models import Base
+from utils.instrumentation import register_sql_instrumentation
+from utils.metrics import register_metrics
+from utils.slow_queries import register_slow_query_log
+from utils.security import shutdown_password_executor
+from utils.user_sessions import last_seen_tracker
+from utils.invalidation import start_invalidation_listener, stop_invalidation_listener
+from utils.reference import refresh_reference_snapshot
 import logging
 
 app = FastAPI()
@@ -9,6 +16,15 @@ app = FastAPI()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Contar consultas SQL y tiempo de base de datos por solicitud (cabecera Server-Timing)
+register_sql_instrumentation(app, engine)
+
+# Registrar las consultas lentas con su plan de ejecución (expuestas en /admin/slow-queries)
+register_slow_query_log()
+
+# Métricas de Prometheus por prefijo de router (expuestas en /metrics)
+register_metrics(app)
+
 # Incluir las rutas de auth con prefijo y etiqueta
 app.include_router(auth.router, prefix="/auth", tags=["Autenticación"])
 
@@ -35,6 +51,40 @@ app.include_router(transactions.router, prefix="/transaction", tags=["transactio
 
 app.include_router(reports.router, prefix="/reports", tags=["Reports"])
 
+# Incluir la ruta del tablero de la pantalla de inicio
+app.include_router(dashboard.router, tags=["Dashboard"])
+
+# Incluir las rutas de administración y diagnóstico
+app.include_router(admin.router, prefix="/admin", tags=["Administración"])
+
+# Incluir la ruta de métricas de Prometheus
+app.include_router(metrics.router)
+
+@app.on_event("startup")
+def warm_reference_data():
+    """Carga en memoria los datos de referencia que sirven los endpoints de /utils."""
+    refresh_reference_snapshot()
+
+@app.on_event("startup")
+def listen_cache_invalidations():
+    """Inicia el hilo que recibe las invalidaciones de caché de los demás workers."""
+    start_invalidation_listener(engine)
+
+@app.on_event("shutdown")
+def stop_cache_invalidations():
+    """Detiene el hilo de invalidaciones de caché."""
+    stop_invalidation_listener()
+
+@app.on_event("shutdown")
+def stop_password_executor():
+    """Detiene los procesos del pool de hash de contraseñas al apagar la aplicación."""
+    shutdown_password_executor()
+
+@app.on_event("shutdown")
+def flush_session_last_seen():
+    """Detiene el volcado del último uso de las sesiones y guarda lo pendiente."""
+    last_seen_tracker.stop()
+
 @app.get("/")
 def read_root():
     """
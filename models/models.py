@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, DateTime, Date, UniqueConstraint, CheckConstraint
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, DateTime, Date, UniqueConstraint, CheckConstraint, Float, Boolean
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -23,6 +24,7 @@ class Users(Base):
     verification_token = Column(String(255), nullable=True, unique=True)
     session_token = Column(String(255), nullable=True, unique=True)
     fcm_token = Column(String(255), nullable=True)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     user_state_id = Column(Integer, ForeignKey("user_states.user_state_id"), nullable=False)
 
     # Relaciones
@@ -31,6 +33,36 @@ class Users(Base):
     notifications = relationship("Notifications", back_populates="user")
     created_transactions = relationship("Transactions", back_populates="creator")
     created_invitations = relationship("Invitations", foreign_keys="[Invitations.inviter_user_id]", back_populates="inviter")
+
+
+class UserSessions(Base):
+    __tablename__ = 'user_sessions'
+
+    user_session_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True)
+    device_info = Column(String(255), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_seen_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class RateLimitBuckets(Base):
+    __tablename__ = 'rate_limit_buckets'
+
+    key = Column(String(100), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    allowed = Column(Boolean, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
+
+
+class PasswordResetTokens(Base):
+    __tablename__ = 'password_reset_tokens'
+
+    token = Column(String(255), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False, index=True)
+    email = Column(String(150), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     
 class Roles(Base):
     __tablename__ = 'roles'
@@ -79,6 +111,7 @@ class Farms(Base):
     area = Column(Numeric(10, 2), nullable=False)
     area_unit_id = Column(Integer, ForeignKey('area_units.area_unit_id'), nullable=False)
     farm_state_id = Column(Integer, ForeignKey('farm_states.farm_state_id'), nullable=False)
+    plot_version = Column(Integer, nullable=False, default=0, server_default="0")
     __table_args__ = (CheckConstraint('area > 0', name='check_area_positive'),)
 
     # Relaciones
@@ -115,6 +148,12 @@ class Plots(Base):
     area = Column(Numeric(10, 2), nullable=False)
     area_unit_id = Column(Integer, ForeignKey('area_units.area_unit_id'), nullable=False)
     plot_state_id = Column(Integer, ForeignKey('plot_states.plot_state_id'), nullable=False)
+    # Lindero opcional: lista de pares [longitud, latitud] y su rectángulo envolvente
+    boundary = Column(JSONB, nullable=True)
+    min_longitude = Column(Numeric(11, 8), nullable=True)
+    min_latitude = Column(Numeric(11, 8), nullable=True)
+    max_longitude = Column(Numeric(11, 8), nullable=True)
+    max_latitude = Column(Numeric(11, 8), nullable=True)
 
     # Relaciones
     farm = relationship("Farms", back_populates="plots")
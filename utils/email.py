@@ -9,27 +9,23 @@ logger = logging.getLogger(__name__)
 
 load_dotenv(override=True, encoding='utf-8')
 
-def send_email(email, token, email_type, farm_name=None, owner_name=None, suggested_role=None):
+SMTP_HOST = "smtp.zoho.com"
+SMTP_PORT = 465
+
+def build_email(email, token, email_type, farm_name=None, owner_name=None, suggested_role=None):
     """
-    Envía un correo electrónico basado en el tipo especificado.
+    Construye el mensaje de correo electrónico del tipo especificado, sin enviarlo.
 
     :param email: Dirección de correo electrónico del destinatario.
     :param token: Token a incluir en el cuerpo del correo electrónico.
-    :param email_type: Tipo de correo a enviar ('verification', 'reset' o 'invitation').
+    :param email_type: Tipo de correo a construir ('verification', 'reset' o 'invitation').
     :param farm_name: Nombre de la finca (opcional, solo para invitación).
     :param owner_name: Nombre del dueño (opcional, solo para invitación).
     :param suggested_role: Rol sugerido para el invitado (opcional, solo para invitación).
+    :return: El mensaje MIME, o None si el tipo de correo no se reconoce.
     """
     smtp_user = os.getenv("SMTP_USER")
-    smtp_pass = os.getenv("SMTP_PASS")
 
-    if not smtp_user or not smtp_pass:
-        logger.error("Las credenciales SMTP no están configuradas correctamente.")
-        return
-
-    smtp_host = "smtp.zoho.com"
-    smtp_port = 465
-    
     # Obtener la URL base y el puerto de la aplicación desde variables de entorno
     app_host = os.getenv("APP_BASE_URL", "http://localhost")
     app_port = os.getenv("PORT", "8000") # Default to 8000 if not set
@@ -272,7 +268,7 @@ def send_email(email, token, email_type, farm_name=None, owner_name=None, sugges
         """
     else:
         logger.error(f"Tipo de correo no reconocido: {email_type}")
-        return
+        return None
 
     # Crear el mensaje de correo electrónico
     msg = MIMEMultipart("alternative")
@@ -282,12 +278,63 @@ def send_email(email, token, email_type, farm_name=None, owner_name=None, sugges
 
     # Agregar cuerpo en formato HTML
     msg.attach(MIMEText(body_html, "html"))
+    return msg
+
+
+def send_messages(messages):
+    """
+    Envía varios mensajes por una sola conexión SMTP.
+
+    :param messages: Lista de mensajes MIME construidos con `build_email`.
+    :return: Número de mensajes enviados.
+    """
+    smtp_user = os.getenv("SMTP_USER")
+    smtp_pass = os.getenv("SMTP_PASS")
+
+    if not smtp_user or not smtp_pass:
+        logger.error("Las credenciales SMTP no están configuradas correctamente.")
+        return 0
 
+    sent = 0
     try:
         # Conectar al servidor SMTP de Zoho usando SSL
-        with smtplib.SMTP_SSL(smtp_host, smtp_port) as server:
+        with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT) as server:
             server.login(smtp_user, smtp_pass)
-            server.sendmail(smtp_user, email, msg.as_string())
-        logger.info(f"Correo de {email_type} enviado a {email}.")
+            for msg in messages:
+                try:
+                    server.sendmail(smtp_user, msg["To"], msg.as_string())
+                    sent += 1
+                    logger.info(f"Correo '{msg['Subject']}' enviado a {msg['To']}.")
+                except smtplib.SMTPRecipientsRefused as e:
+                    logger.error(f"Error al enviar correo a {msg['To']}: {e}")
     except Exception as e:
-        logger.error(f"Error al enviar correo a {email}: {e}")
+        logger.error(f"Error al enviar correos ({sent} de {len(messages)} enviados): {e}")
+    return sent
+
+
+def send_email(email, token, email_type, farm_name=None, owner_name=None, suggested_role=None):
+    """
+    Envía un correo electrónico basado en el tipo especificado.
+
+    :param email: Dirección de correo electrónico del destinatario.
+    :param token: Token a incluir en el cuerpo del correo electrónico.
+    :param email_type: Tipo de correo a enviar ('verification', 'reset' o 'invitation').
+    :param farm_name: Nombre de la finca (opcional, solo para invitación).
+    :param owner_name: Nombre del dueño (opcional, solo para invitación).
+    :param suggested_role: Rol sugerido para el invitado (opcional, solo para invitación).
+    """
+    msg = build_email(email, token, email_type, farm_name, owner_name, suggested_role)
+    if msg is not None:
+        send_messages([msg])
+
+
+def send_bulk_emails(recipients, email_type):
+    """
+    Envía el mismo tipo de correo a varios destinatarios por una sola conexión SMTP.
+
+    :param recipients: Lista de tuplas (correo, token).
+    :param email_type: Tipo de correo a enviar ('verification' o 'reset').
+    :return: Número de correos enviados.
+    """
+    messages = [build_email(email, token, email_type) for email, token in recipients]
+    return send_messages([msg for msg in messages if msg is not None])
@@ -0,0 +1,155 @@
+"""
+Escritura en streaming de resultados de consultas a CSV, Parquet o Arrow IPC.
+
+Los escritores reciben bloques de filas (p. ej. `result.partitions()` de una consulta con
+`yield_per`) y devuelven bytes bloque a bloque, de modo que la memoria usada depende del
+tamaño del bloque y no del número total de filas.
+
+Parquet y Arrow IPC requieren `pyarrow`, que es opcional: si no está instalado solo se
+ofrece CSV.
+"""
+import io
+import csv
+import datetime
+from decimal import Decimal
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - depende del entorno
+    pyarrow = None
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def available_formats() -> list:
+    """Formatos de exportación disponibles en este entorno."""
+    return ["csv", "parquet", "arrow"] if pyarrow is not None else ["csv"]
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(columns: list, partitions):
+    """
+    Escribe bloques de filas como CSV (UTF-8 con BOM para que Excel reconozca los acentos).
+
+    Args:
+        columns (list): Nombres de las columnas.
+        partitions (iterable): Bloques de filas (secuencias de valores).
+
+    Yields:
+        bytes: Encabezado y luego un fragmento por bloque.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+    for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Archivo de solo escritura que acumula lo escrito hasta que se retira con `drain`."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_type(python_type):
+    """
+    Tipo de Arrow para una columna, según el tipo de Python de sus valores. Los Decimal se
+    guardan como decimal128(15, 2), la misma precisión que las columnas Numeric(15, 2), para no
+    perder céntimos al pasar por float.
+    """
+    return {
+        int: pyarrow.int64(),
+        float: pyarrow.float64(),
+        Decimal: pyarrow.decimal128(15, 2),
+        datetime.date: pyarrow.date32(),
+        datetime.datetime: pyarrow.timestamp("us", tz="UTC"),
+    }.get(python_type, pyarrow.string())
+
+
+def arrow_schema(columns: list, python_types: list):
+    """
+    Crea el esquema de Arrow de una exportación.
+
+    Args:
+        columns (list): Nombres de las columnas.
+        python_types (list): Tipo de Python de cada columna (int, float, Decimal, date, str...).
+    """
+    return pyarrow.schema([(name, _arrow_type(python_type)) for name, python_type in zip(columns, python_types)])
+
+
+def _record_batch(schema, rows):
+    arrays = []
+    for index, field in enumerate(schema):
+        values = [row[index] for row in rows]
+        if pyarrow.types.is_floating(field.type):
+            values = [None if value is None else float(value) for value in values]
+        elif pyarrow.types.is_string(field.type):
+            values = [None if value is None else str(value) for value in values]
+        arrays.append(pyarrow.array(values, type=field.type))
+    return pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def iter_parquet(schema, partitions):
+    """
+    Escribe bloques de filas como Parquet, un row group por bloque.
+
+    Yields:
+        bytes: Fragmentos del archivo Parquet.
+    """
+    sink = _ChunkSink()
+    with pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for rows in partitions:
+            writer.write_batch(_record_batch(schema, rows))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def iter_arrow_stream(schema, partitions):
+    """
+    Escribe bloques de filas en el formato de streaming de Arrow IPC, un record batch por bloque.
+
+    Yields:
+        bytes: Fragmentos del stream.
+    """
+    sink = _ChunkSink()
+    with pyarrow.ipc.new_stream(sink, schema) as writer:
+        for rows in partitions:
+            writer.write_batch(_record_batch(schema, rows))
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,104 @@
+"""
+Inactivación de una finca y de todo lo que depende de ella.
+
+La cascada se hace con un UPDATE por tabla, filtrado por finca, en lugar de cargar cada fila
+en la sesión: el número de sentencias es fijo sin importar cuántos colaboradores, lotes,
+invitaciones o transacciones tenga la finca. Todas corren en la transacción del llamador,
+que confirma con `db.commit()`.
+"""
+from sqlalchemy import update, select
+from sqlalchemy.orm import Session
+from models.models import Farms, UserRoleFarm, Plots, Invitations, Notifications, Transactions
+from utils.state import get_state_id
+from utils.plot_version import bump_plot_version
+
+# Estados que se necesitan, como (entidad, nombre)
+DEACTIVATION_STATES = {
+    "inactive_farm": ("Farms", "Inactiva"),
+    "inactive_urf": ("user_role_farm", "Inactiva"),
+    "inactive_plot": ("Plots", "Inactivo"),
+    "pending_invitation": ("Invitations", "Pendiente"),
+    "rejected_invitation": ("Invitations", "Rechazada"),
+    "pending_notification": ("Notifications", "Pendiente"),
+    "answered_notification": ("Notifications", "Respondida"),
+    "inactive_transaction": ("Transactions", "Inactivo"),
+}
+
+
+class MissingStateError(LookupError):
+    """Falta en la base de datos alguno de los estados de DEACTIVATION_STATES."""
+
+
+def _bulk_update(db: Session, statement) -> int:
+    return db.execute(statement.execution_options(synchronize_session=False)).rowcount
+
+
+def deactivate_farm(db: Session, farm_id: int, include_transactions: bool = False) -> dict:
+    """
+    Inactiva una finca con sus membresías, lotes e invitaciones pendientes (y opcionalmente
+    sus transacciones) usando una sentencia UPDATE por tabla.
+
+    Las invitaciones pendientes pasan a 'Rechazada' y sus notificaciones pendientes a
+    'Respondida', para que no puedan aceptarse después. Las filas que ya estaban en el estado
+    final no se tocan.
+
+    Args:
+        db (Session): Sesión de base de datos.
+        farm_id (int): ID de la finca.
+        include_transactions (bool): Si es verdadero también se inactivan las transacciones de
+            los lotes de la finca.
+
+    Returns:
+        dict: Filas afectadas por tabla (`farms`, `user_role_farm`, `plots`, `invitations`,
+        `notifications` y, si se pidió, `transactions`).
+
+    Raises:
+        MissingStateError: Si falta alguno de los estados requeridos.
+    """
+    states = {}
+    for key, (entity_type, state_name) in DEACTIVATION_STATES.items():
+        if key == "inactive_transaction" and not include_transactions:
+            continue
+        states[key] = get_state_id(db, state_name, entity_type)
+        if states[key] is None:
+            raise MissingStateError(f"No se encontró el estado '{state_name}' para '{entity_type}'")
+
+    farm_plots = select(Plots.plot_id).where(Plots.farm_id == farm_id).scalar_subquery()
+    pending_invitations = select(Invitations.invitation_id).where(
+        Invitations.farm_id == farm_id,
+        Invitations.invitation_state_id == states["pending_invitation"]
+    ).scalar_subquery()
+
+    affected = {
+        "farms": _bulk_update(db, update(Farms).where(
+            Farms.farm_id == farm_id,
+            Farms.farm_state_id != states["inactive_farm"]
+        ).values(farm_state_id=states["inactive_farm"])),
+        "user_role_farm": _bulk_update(db, update(UserRoleFarm).where(
+            UserRoleFarm.farm_id == farm_id,
+            UserRoleFarm.user_role_farm_state_id != states["inactive_urf"]
+        ).values(user_role_farm_state_id=states["inactive_urf"])),
+    }
+    if include_transactions:
+        # Antes que los lotes, para no depender de su estado
+        affected["transactions"] = _bulk_update(db, update(Transactions).where(
+            Transactions.plot_id.in_(farm_plots),
+            Transactions.transaction_state_id != states["inactive_transaction"]
+        ).values(transaction_state_id=states["inactive_transaction"]))
+    affected["plots"] = _bulk_update(db, update(Plots).where(
+        Plots.farm_id == farm_id,
+        Plots.plot_state_id != states["inactive_plot"]
+    ).values(plot_state_id=states["inactive_plot"]))
+    # Las notificaciones primero: después de este paso las invitaciones ya no están pendientes
+    affected["notifications"] = _bulk_update(db, update(Notifications).where(
+        Notifications.invitation_id.in_(pending_invitations),
+        Notifications.notification_state_id == states["pending_notification"]
+    ).values(notification_state_id=states["answered_notification"]))
+    affected["invitations"] = _bulk_update(db, update(Invitations).where(
+        Invitations.farm_id == farm_id,
+        Invitations.invitation_state_id == states["pending_invitation"]
+    ).values(invitation_state_id=states["rejected_invitation"]))
+
+    if affected["plots"]:
+        bump_plot_version(db, farm_id)
+    return affected
@@ -0,0 +1,167 @@
+"""
+Geometría de los linderos de los lotes.
+
+Un lindero es un polígono simple con vértices `[longitud, latitud]` (orden GeoJSON). Las
+funciones trabajan sobre lotes de polígonos a la vez: los vértices de todos se concatenan en
+un solo arreglo de NumPy y las sumas por polígono se hacen con `np.add.reduceat`, así que
+validar y calcular el área de miles de polígonos no recorre vértices en Python.
+
+El área se calcula sobre la esfera (fórmula del shoelace esférico de Chamberlain y Duquette),
+en metros cuadrados.
+"""
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+# Máximo de vértices por lindero (la validación de autointersección es cuadrática)
+MAX_BOUNDARY_VERTICES = 1000
+
+
+class InvalidBoundary(ValueError):
+    """Lindero inválido; el mensaje describe el problema."""
+
+
+def normalize_boundary(boundary) -> np.ndarray:
+    """
+    Convierte un lindero a un arreglo `(n, 2)` de `[longitud, latitud]` sin el vértice de
+    cierre repetido, validando su forma y rangos.
+
+    Args:
+        boundary: Secuencia de pares `[longitud, latitud]`.
+
+    Returns:
+        np.ndarray: Vértices del anillo abierto.
+
+    Raises:
+        InvalidBoundary: Si el lindero no tiene la forma o los rangos esperados, o si cruza el
+            antimeridiano.
+    """
+    try:
+        ring = np.asarray(boundary, dtype=float)
+    except (TypeError, ValueError):
+        raise InvalidBoundary("El lindero debe ser una lista de pares [longitud, latitud]")
+    if ring.ndim != 2 or ring.shape[1] != 2:
+        raise InvalidBoundary("El lindero debe ser una lista de pares [longitud, latitud]")
+    if len(ring) > 1 and np.array_equal(ring[0], ring[-1]):
+        ring = ring[:-1]
+    if len(ring) < 3:
+        raise InvalidBoundary("El lindero debe tener al menos 3 vértices")
+    if len(ring) > MAX_BOUNDARY_VERTICES:
+        raise InvalidBoundary(f"El lindero no puede tener más de {MAX_BOUNDARY_VERTICES} vértices")
+    if not np.isfinite(ring).all():
+        raise InvalidBoundary("El lindero contiene coordenadas inválidas")
+    if (np.abs(ring[:, 0]) > 180).any() or (np.abs(ring[:, 1]) > 90).any():
+        raise InvalidBoundary("Las coordenadas del lindero están fuera de rango")
+    # Un lindero que cruza el antimeridiano tendría un rectángulo envolvente casi global
+    if np.ptp(ring[:, 0]) > 180:
+        raise InvalidBoundary("El lindero no puede cruzar el antimeridiano (longitud ±180°)")
+    if (np.diff(ring, axis=0, append=ring[:1]) == 0).all(axis=1).any():
+        raise InvalidBoundary("El lindero tiene vértices consecutivos repetidos")
+    return ring
+
+
+def _segments_intersect(ring: np.ndarray) -> bool:
+    """Indica si dos aristas no adyacentes del anillo se cruzan (comparación vectorizada)."""
+    n = len(ring)
+    if n < 4:
+        return False
+    start = ring
+    end = np.roll(ring, -1, axis=0)
+    i, j = np.triu_indices(n, k=2)
+    # La primera y la última arista comparten el vértice 0
+    keep = ~((i == 0) & (j == n - 1))
+    i, j = i[keep], j[keep]
+    p, r = start[i], end[i] - start[i]
+    q, s = start[j], end[j] - start[j]
+    denominator = r[:, 0] * s[:, 1] - r[:, 1] * s[:, 0]
+    qp = q - p
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (qp[:, 0] * s[:, 1] - qp[:, 1] * s[:, 0]) / denominator
+        u = (qp[:, 0] * r[:, 1] - qp[:, 1] * r[:, 0]) / denominator
+    crossing = (denominator != 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+    # Aristas paralelas superpuestas sobre la misma recta
+    collinear = (denominator == 0) & (qp[:, 0] * r[:, 1] - qp[:, 1] * r[:, 0] == 0)
+    if collinear.any():
+        length = (r * r).sum(axis=1)
+        t0 = (qp * r).sum(axis=1) / np.where(length == 0, 1, length)
+        t1 = t0 + (s * r).sum(axis=1) / np.where(length == 0, 1, length)
+        overlap = (np.maximum(t0, t1) > 0) & (np.minimum(t0, t1) < 1)
+        crossing |= collinear & overlap
+    return bool(crossing.any())
+
+
+def validate_boundary(boundary) -> np.ndarray:
+    """
+    Normaliza y valida un lindero: forma, rangos y que sea un polígono simple.
+
+    Returns:
+        np.ndarray: Vértices del anillo abierto.
+
+    Raises:
+        InvalidBoundary: Si el lindero no es válido.
+    """
+    ring = normalize_boundary(boundary)
+    if _segments_intersect(ring):
+        raise InvalidBoundary("El lindero se cruza consigo mismo")
+    return ring
+
+
+def _concatenate(rings):
+    lengths = np.fromiter((len(ring) for ring in rings), dtype=np.int64, count=len(rings))
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    return np.concatenate(rings), lengths, offsets
+
+
+def boundary_areas_m2(rings) -> np.ndarray:
+    """
+    Calcula el área sobre la esfera de varios linderos a la vez.
+
+    Args:
+        rings (list[np.ndarray]): Anillos abiertos `(n, 2)` de `[longitud, latitud]` en grados.
+
+    Returns:
+        np.ndarray: Área de cada lindero en metros cuadrados.
+    """
+    if not rings:
+        return np.zeros(0)
+    vertices, lengths, offsets = _concatenate(rings)
+    lon = np.radians(vertices[:, 0])
+    sin_lat = np.sin(np.radians(vertices[:, 1]))
+
+    # Siguiente vértice de cada anillo (el último se une con el primero)
+    next_index = np.arange(len(vertices)) + 1
+    next_index[offsets + lengths - 1] = offsets
+
+    delta_lon = lon[next_index] - lon
+    # Aristas que cruzan el antimeridiano
+    delta_lon = (delta_lon + np.pi) % (2 * np.pi) - np.pi
+    terms = delta_lon * (2 + sin_lat + sin_lat[next_index])
+    return np.abs(np.add.reduceat(terms, offsets)) * EARTH_RADIUS_M ** 2 / 2
+
+
+def boundary_bounding_boxes(rings) -> np.ndarray:
+    """
+    Calcula el rectángulo envolvente de varios linderos a la vez.
+
+    Returns:
+        np.ndarray: Arreglo `(k, 4)` con `min_longitud, min_latitud, max_longitud, max_latitud`.
+    """
+    if not rings:
+        return np.zeros((0, 4))
+    vertices, _, offsets = _concatenate(rings)
+    minimum = np.minimum.reduceat(vertices, offsets, axis=0)
+    maximum = np.maximum.reduceat(vertices, offsets, axis=0)
+    return np.hstack([minimum, maximum])
+
+
+def boundary_centroids(rings) -> np.ndarray:
+    """
+    Calcula el promedio de los vértices de varios linderos, usado como ubicación del lote.
+
+    Returns:
+        np.ndarray: Arreglo `(k, 2)` de `[longitud, latitud]`.
+    """
+    if not rings:
+        return np.zeros((0, 2))
+    vertices, lengths, offsets = _concatenate(rings)
+    return np.add.reduceat(vertices, offsets, axis=0) / lengths[:, None]
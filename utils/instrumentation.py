@@ -0,0 +1,228 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Número de consultas por solicitud a partir del cual se registra la lista de sentencias (0 = desactivado)
+SQL_QUERY_THRESHOLD = int(os.getenv("SQL_QUERY_THRESHOLD", "0"))
+
+# Estadísticas SQL de la solicitud en curso (compartidas con el threadpool por contextvars)
+_current_request_stats = contextvars.ContextVar("sql_request_stats", default=None)
+
+# Agregados por ruta: {ruta: {"requests", "queries", "db_time_ms", "max_queries"}}
+_route_stats = {}
+_route_stats_lock = threading.Lock()
+
+# Funciones llamadas tras cada sentencia con (conn, statement, parameters, executemany, elapsed)
+_statement_observers = []
+
+
+class RequestSQLStats:
+    """
+    Acumula el número de sentencias SQL y el tiempo de base de datos de una solicitud.
+
+    Attributes:
+        count (int): Número de sentencias ejecutadas.
+        duration (float): Tiempo total en base de datos, en segundos.
+        statements (list): Sentencias ejecutadas con su duración (solo si hay umbral configurado).
+        request (Request): Solicitud a la que pertenecen las sentencias.
+    """
+    __slots__ = ("count", "duration", "statements", "request", "_keep_statements", "_lock")
+
+    def __init__(self, keep_statements: bool = False, request=None):
+        self.request = request
+        self.count = 0
+        self.duration = 0.0
+        self.statements = []
+        self._keep_statements = keep_statements
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, elapsed: float):
+        """
+        Registra una sentencia ejecutada.
+
+        Args:
+            statement (str): Sentencia SQL ejecutada.
+            elapsed (float): Duración de la sentencia en segundos.
+        """
+        with self._lock:
+            self.count += 1
+            self.duration += elapsed
+            if self._keep_statements:
+                self.statements.append((statement, elapsed))
+
+
+def get_current_request_stats():
+    """
+    Obtiene las estadísticas SQL de la solicitud en curso.
+
+    Returns:
+        RequestSQLStats: Estadísticas de la solicitud actual, o None fuera de una solicitud.
+    """
+    return _current_request_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    elapsed = time.perf_counter() - start_times.pop()
+
+    stats = _current_request_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+    for observer in _statement_observers:
+        try:
+            observer(conn, statement, parameters, executemany, elapsed)
+        except Exception as e:
+            logger.error("Error en el observador de sentencias SQL %s: %s", observer.__name__, str(e))
+
+
+def _handle_error(exception_context):
+    # Si la sentencia falla no se llama a after_cursor_execute: descartar su tiempo de inicio
+    # para que no quede en la conexión del pool
+    conn = exception_context.connection
+    if conn is None:
+        return
+    start_times = conn.info.get("query_start_time")
+    if start_times:
+        start_times.pop()
+
+
+def add_statement_observer(observer):
+    """
+    Registra una función que se llama tras cada sentencia ejecutada por un engine instrumentado.
+
+    Args:
+        observer (callable): Función con firma (conn, statement, parameters, executemany, elapsed).
+    """
+    if observer not in _statement_observers:
+        _statement_observers.append(observer)
+
+
+def instrument_engine(engine):
+    """
+    Registra los eventos de SQLAlchemy que miden cada sentencia ejecutada por el engine.
+
+    Args:
+        engine (Engine): Engine de SQLAlchemy a instrumentar.
+    """
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def _record_route_stats(route: str, stats: RequestSQLStats):
+    with _route_stats_lock:
+        entry = _route_stats.setdefault(route, {"requests": 0, "queries": 0, "db_time_ms": 0.0, "max_queries": 0})
+        entry["requests"] += 1
+        entry["queries"] += stats.count
+        entry["db_time_ms"] += stats.duration * 1000
+        entry["max_queries"] = max(entry["max_queries"], stats.count)
+
+
+def get_route_sql_stats() -> dict:
+    """
+    Devuelve los agregados de consultas SQL por ruta.
+
+    Returns:
+        dict: Para cada ruta, solicitudes atendidas, consultas totales y promedio, tiempo de base de datos y máximo de consultas.
+    """
+    with _route_stats_lock:
+        return {
+            route: {
+                "requests": entry["requests"],
+                "queries": entry["queries"],
+                "avg_queries": round(entry["queries"] / entry["requests"], 2),
+                "max_queries": entry["max_queries"],
+                "db_time_ms": round(entry["db_time_ms"], 2),
+                "avg_db_time_ms": round(entry["db_time_ms"] / entry["requests"], 2),
+            }
+            for route, entry in _route_stats.items()
+        }
+
+
+def reset_route_sql_stats():
+    """Reinicia los agregados de consultas SQL por ruta."""
+    with _route_stats_lock:
+        _route_stats.clear()
+
+
+def get_route_path(request) -> str:
+    """
+    Obtiene la plantilla de la ruta que atendió la solicitud (p. ej. `/plots/list-plots/{farm_id}`).
+
+    Args:
+        request (Request): Solicitud atendida.
+
+    Returns:
+        str: Plantilla de la ruta, o la ruta literal si no hubo coincidencia.
+    """
+    route = request.scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return request.url.path
+    # Según la versión de FastAPI, la ruta de un router incluido puede no contener el prefijo;
+    # se reconstruye con los segmentos literales que preceden a la plantilla.
+    path_segments = request.scope["path"].rstrip("/").split("/")
+    template_segments = template.rstrip("/").split("/")
+    prefix = "/".join(path_segments[:len(path_segments) - len(template_segments) + 1])
+    if template.startswith(prefix + "/"):
+        return template
+    return prefix + template
+
+
+def register_sql_instrumentation(app, engine):
+    """
+    Instrumenta el engine y agrega un middleware que cuenta las sentencias SQL y el tiempo
+    de base de datos de cada solicitud. Los valores se exponen en la cabecera `Server-Timing`
+    y se acumulan por ruta.
+
+    Args:
+        app (FastAPI): Aplicación a la que se agrega el middleware.
+        engine (Engine): Engine de SQLAlchemy a instrumentar.
+    """
+    instrument_engine(engine)
+
+    @app.middleware("http")
+    async def sql_instrumentation_middleware(request, call_next):
+        stats = RequestSQLStats(keep_statements=SQL_QUERY_THRESHOLD > 0, request=request)
+        token = _current_request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            _current_request_stats.reset(token)
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = stats.duration * 1000
+
+        route = get_route_path(request)
+        _record_route_stats(route, stats)
+
+        response.headers.append(
+            "Server-Timing",
+            f'db;dur={db_ms:.1f};desc="{stats.count} queries", app;dur={total_ms:.1f}'
+        )
+
+        if SQL_QUERY_THRESHOLD and stats.count > SQL_QUERY_THRESHOLD:
+            statement_list = "\n".join(
+                f"  {i}. ({elapsed * 1000:.1f} ms) {statement}"
+                for i, (statement, elapsed) in enumerate(stats.statements, start=1)
+            )
+            logger.warning(
+                "%s %s ejecutó %s consultas (umbral %s, %.1f ms en base de datos):\n%s",
+                request.method, route, stats.count, SQL_QUERY_THRESHOLD, db_ms, statement_list
+            )
+
+        return response
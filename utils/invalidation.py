@@ -0,0 +1,181 @@
+"""
+Invalidación de cachés entre workers con LISTEN/NOTIFY de Postgres.
+
+Quien modifica datos publica `(namespace, key)` con `publish` dentro de su transacción;
+Postgres entrega la notificación a todos los workers solo cuando la transacción se
+confirma. Cada worker ejecuta un hilo que escucha el canal y llama al manejador
+registrado para el namespace.
+
+Las notificaciones enviadas mientras un worker no escucha se pierden, así que al conectar
+(y al reconectar tras un error, con espera exponencial) el listener vacía todas las cachés
+registradas.
+
+Para invalidar a mano en todos los workers (p. ej. después de editar tablas de estados):
+    python -m utils.invalidation <namespace> [clave]
+"""
+import os
+import sys
+import json
+import select
+import logging
+import threading
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from utils.metrics import CACHE_INVALIDATIONS, CACHE_INVALIDATION_RECONNECTS
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = os.getenv("INVALIDATION_CHANNEL", "cache_invalidation")
+
+# Segundos entre comprobaciones de parada del hilo
+LISTEN_POLL_SECONDS = 5.0
+
+# Espera entre reintentos de conexión: se duplica en cada fallo hasta el máximo
+LISTEN_RETRY_MIN_SECONDS = float(os.getenv("INVALIDATION_RETRY_MIN_SECONDS", 1))
+LISTEN_RETRY_MAX_SECONDS = float(os.getenv("INVALIDATION_RETRY_MAX_SECONDS", 60))
+
+_handlers = {}
+
+
+def register_handler(namespace: str, handler):
+    """
+    Registra el manejador de un namespace.
+
+    Args:
+        namespace (str): Nombre del namespace (p. ej. "membership").
+        handler (callable): Función que recibe la clave invalidada (str o None = todo).
+    """
+    _handlers[namespace] = handler
+
+
+def publish(db: Session, namespace: str, key=None):
+    """
+    Publica una invalidación en la transacción de `db`; se entrega a todos los workers
+    (incluido este) cuando la transacción se confirma.
+
+    Args:
+        db (Session): Sesión de base de datos con la transacción en curso.
+        namespace (str): Namespace de la caché.
+        key: Clave invalidada; None invalida todo el namespace.
+    """
+    payload = json.dumps({"ns": namespace, "key": None if key is None else str(key)})
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": INVALIDATION_CHANNEL, "payload": payload})
+
+
+def dispatch(payload: str):
+    """Entrega un mensaje recibido al manejador de su namespace."""
+    try:
+        message = json.loads(payload)
+        handler = _handlers.get(message["ns"])
+    except (ValueError, KeyError, TypeError):
+        logger.warning("Mensaje de invalidación inválido: %s", payload)
+        return
+    if handler is None:
+        return
+    CACHE_INVALIDATIONS.labels(message["ns"]).inc()
+    try:
+        handler(message.get("key"))
+    except Exception as e:
+        logger.error("Error al invalidar la caché '%s': %s", message["ns"], str(e))
+
+
+def flush_all():
+    """Vacía todas las cachés registradas de este worker."""
+    for namespace, handler in list(_handlers.items()):
+        try:
+            handler(None)
+        except Exception as e:
+            logger.error("Error al vaciar la caché '%s': %s", namespace, str(e))
+
+
+class InvalidationListener(threading.Thread):
+    """Hilo que escucha el canal de invalidación con una conexión dedicada."""
+
+    def __init__(self, engine):
+        super().__init__(name="cache-invalidation-listener", daemon=True)
+        self.engine = engine
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _connect(self):
+        # Conexión propia fuera del pool, en autocommit para recibir notificaciones
+        raw_connection = self.engine.raw_connection()
+        raw_connection.detach()
+        connection = raw_connection.driver_connection
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {INVALIDATION_CHANNEL}")
+        return connection
+
+    def run(self):
+        retry_seconds = LISTEN_RETRY_MIN_SECONDS
+        connected_before = False
+        while not self._stop_event.is_set():
+            connection = None
+            try:
+                connection = self._connect()
+                logger.info("Escuchando invalidaciones de caché en el canal '%s'", INVALIDATION_CHANNEL)
+                if connected_before:
+                    CACHE_INVALIDATION_RECONNECTS.inc()
+                connected_before = True
+                retry_seconds = LISTEN_RETRY_MIN_SECONDS
+                # Lo publicado mientras no se escuchaba se perdió: se vacía todo
+                flush_all()
+                while not self._stop_event.is_set():
+                    if select.select([connection], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        dispatch(connection.notifies.pop(0).payload)
+            except Exception as e:
+                logger.error("Error en el listener de invalidación de caché, reintento en %.0f s: %s",
+                             retry_seconds, str(e))
+                self._stop_event.wait(retry_seconds)
+                retry_seconds = min(retry_seconds * 2, LISTEN_RETRY_MAX_SECONDS)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+
+_listener = None
+
+
+def start_invalidation_listener(engine):
+    """Inicia el hilo de escucha de invalidaciones de este worker."""
+    global _listener
+    if _listener is None:
+        _listener = InvalidationListener(engine)
+        _listener.start()
+
+
+def stop_invalidation_listener():
+    """Detiene el hilo de escucha de invalidaciones."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def main(argv=None):
+    import argparse
+    from dataBase import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Publica una invalidación de caché para todos los workers")
+    parser.add_argument("namespace")
+    parser.add_argument("key", nargs="?")
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        publish(db, args.namespace, args.key)
+        db.commit()
+    print(f"Invalidación publicada: {args.namespace} {args.key or '(todo)'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Caché por usuario de sus asociaciones con fincas (`UserRoleFarm`).
+
+Para cada usuario se carga una sola vez el mapa `farm_id -> Membership(rol, estado)` y se
+guarda con expulsión LRU. Los endpoints que cambian asociaciones (crear o eliminar finca,
+aceptar invitación, editar o eliminar colaborador) invalidan la entrada explícitamente y
+publican la invalidación para los demás workers (ver utils.invalidation).
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from sqlalchemy.orm import Session
+from models.models import UserRoleFarm
+from utils.state import get_state_id
+from utils.invalidation import publish, register_handler
+
+logger = logging.getLogger(__name__)
+
+MEMBERSHIP_CACHE_SIZE = int(os.getenv("MEMBERSHIP_CACHE_SIZE", 10000))
+
+# Vigencia máxima de una entrada, como respaldo si se pierde una invalidación
+MEMBERSHIP_CACHE_TTL = float(os.getenv("MEMBERSHIP_CACHE_TTL", 300))
+
+MEMBERSHIP_NAMESPACE = "membership"
+
+Membership = namedtuple("Membership", ["user_role_farm_id", "farm_id", "role_id", "state_id"])
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_user_memberships(db: Session, user_id: int) -> dict:
+    """
+    Obtiene todas las asociaciones del usuario con fincas, en cualquier estado.
+
+    Un usuario puede tener varias filas en la misma finca (p. ej. una inactiva y otra activa
+    si se le volvió a invitar después de eliminarlo); en ese caso se guarda la activa.
+
+    Args:
+        db (Session): Sesión de base de datos.
+        user_id (int): ID del usuario.
+
+    Returns:
+        dict: `farm_id -> Membership`.
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(user_id)
+        if entry is not None and entry[1] > now:
+            _cache.move_to_end(user_id)
+            return entry[0]
+
+    rows = db.query(
+        UserRoleFarm.user_role_farm_id, UserRoleFarm.farm_id, UserRoleFarm.role_id, UserRoleFarm.user_role_farm_state_id
+    ).filter(UserRoleFarm.user_id == user_id).all()
+    active_state_id = get_state_id(db, "Activo", "user_role_farm")
+    memberships = {}
+    for row in rows:
+        current = memberships.get(row.farm_id)
+        if current is None or (current.state_id != active_state_id and row.user_role_farm_state_id == active_state_id):
+            memberships[row.farm_id] = Membership(*row)
+
+    with _cache_lock:
+        _cache[user_id] = (memberships, now + MEMBERSHIP_CACHE_TTL)
+        _cache.move_to_end(user_id)
+        while len(_cache) > MEMBERSHIP_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return memberships
+
+
+def get_active_membership(db: Session, user_id: int, farm_id: int):
+    """
+    Obtiene la asociación activa del usuario con la finca.
+
+    Args:
+        db (Session): Sesión de base de datos.
+        user_id (int): ID del usuario.
+        farm_id (int): ID de la finca.
+
+    Returns:
+        Membership: Asociación activa (con `role_id`), o None si el usuario no es miembro activo.
+    """
+    active_state_id = get_state_id(db, "Activo", "user_role_farm")
+    membership = get_user_memberships(db, user_id).get(farm_id)
+    if membership is None or membership.state_id != active_state_id:
+        return None
+    return membership
+
+
+def _forget_user(user_id: int):
+    with _cache_lock:
+        _cache.pop(user_id, None)
+
+
+def _forget_farm(farm_id: int):
+    with _cache_lock:
+        for user_id in [u for u, (memberships, _) in _cache.items() if farm_id in memberships]:
+            del _cache[user_id]
+
+
+def clear_membership_cache():
+    """Vacía la caché de asociaciones de este worker."""
+    with _cache_lock:
+        _cache.clear()
+
+
+def invalidate_user_memberships(db: Session, *user_ids: int):
+    """
+    Invalida las asociaciones en caché de los usuarios indicados, en este worker y (al
+    confirmar la transacción de `db`) en los demás. Debe llamarse antes de `db.commit()`.
+
+    Args:
+        db (Session): Sesión con la transacción que modifica las asociaciones.
+        user_ids (int): IDs de los usuarios afectados.
+    """
+    for user_id in user_ids:
+        _forget_user(user_id)
+        publish(db, MEMBERSHIP_NAMESPACE, f"user:{user_id}")
+
+
+def invalidate_farm_memberships(db: Session, farm_id: int):
+    """
+    Invalida las asociaciones en caché de todos los miembros de una finca. Debe llamarse
+    antes de `db.commit()`.
+
+    Args:
+        db (Session): Sesión con la transacción que modifica las asociaciones.
+        farm_id (int): ID de la finca.
+    """
+    _forget_farm(farm_id)
+    publish(db, MEMBERSHIP_NAMESPACE, f"farm:{farm_id}")
+
+
+def _handle_invalidation(key):
+    if key is None:
+        clear_membership_cache()
+        return
+    kind, _, value = key.partition(":")
+    if kind == "user":
+        _forget_user(int(value))
+    elif kind == "farm":
+        _forget_farm(int(value))
+
+
+register_handler(MEMBERSHIP_NAMESPACE, _handle_invalidation)
@@ -0,0 +1,162 @@
+import os
+import time
+import logging
+from anyio import to_thread
+from prometheus_client import (
+    Counter, Histogram, Gauge, CollectorRegistry, REGISTRY,
+    generate_latest, CONTENT_TYPE_LATEST, multiprocess
+)
+from utils.instrumentation import get_route_path
+
+logger = logging.getLogger(__name__)
+
+# Con PROMETHEUS_MULTIPROC_DIR definido, prometheus_client guarda los valores en archivos
+# compartidos para que todos los workers de uvicorn/gunicorn se agreguen en cada lectura.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_COUNT = Counter(
+    "http_requests_total",
+    "Solicitudes HTTP atendidas por prefijo de router, método y código de estado",
+    ["prefix", "method", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latencia de las solicitudes HTTP por prefijo de router",
+    ["prefix", "method"],
+    buckets=LATENCY_BUCKETS
+)
+REQUEST_ERRORS = Counter(
+    "http_request_errors_total",
+    "Solicitudes HTTP con respuesta 5xx o excepción no controlada por prefijo de router",
+    ["prefix"]
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Solicitudes HTTP en curso",
+    multiprocess_mode="livesum"
+)
+THREADPOOL_IN_USE = Gauge(
+    "threadpool_threads_in_use",
+    "Hilos del threadpool de endpoints síncronos ocupados",
+    multiprocess_mode="livesum"
+)
+THREADPOOL_SIZE = Gauge(
+    "threadpool_threads_total",
+    "Tamaño del threadpool de endpoints síncronos",
+    multiprocess_mode="livesum"
+)
+PASSWORD_HASH_LATENCY = Histogram(
+    "password_hash_duration_seconds",
+    "Duración de las operaciones de hash de contraseñas, incluida la espera en cola",
+    ["operation"],
+    buckets=LATENCY_BUCKETS
+)
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth",
+    "Operaciones de hash de contraseñas en cola o en ejecución",
+    multiprocess_mode="livesum"
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total",
+    "Operaciones de hash de contraseñas rechazadas por cola llena",
+    ["operation"]
+)
+
+RATE_LIMIT_CHECKS = Counter(
+    "rate_limit_checks_total",
+    "Decisiones del limitador de autenticación por límite, tipo de clave y resultado",
+    ["limit", "key_type", "result"]
+)
+
+CACHE_INVALIDATIONS = Counter(
+    "cache_invalidations_received_total",
+    "Invalidaciones de caché recibidas por LISTEN/NOTIFY por namespace",
+    ["namespace"]
+)
+CACHE_INVALIDATION_RECONNECTS = Counter(
+    "cache_invalidation_reconnects_total",
+    "Reconexiones del listener de invalidación de caché"
+)
+
+
+def get_route_prefix(request) -> str:
+    """
+    Obtiene el prefijo de router de la ruta atendida (p. ej. `/auth`, `/farm`, `/plots`).
+
+    Args:
+        request (Request): Solicitud atendida.
+
+    Returns:
+        str: Prefijo de la ruta, o "unmatched" si ninguna ruta coincidió.
+    """
+    if request.scope.get("route") is None:
+        return "unmatched"
+    segment = get_route_path(request).strip("/").split("/", 1)[0]
+    return f"/{segment}"
+
+
+def sample_threadpool():
+    """Actualiza los indicadores de ocupación del threadpool. Debe llamarse desde el event loop."""
+    try:
+        limiter = to_thread.current_default_thread_limiter()
+    except RuntimeError:
+        return
+    THREADPOOL_IN_USE.set(limiter.borrowed_tokens)
+    THREADPOOL_SIZE.set(limiter.total_tokens)
+
+
+def generate_metrics():
+    """
+    Genera el texto de exposición de Prometheus con las métricas de todos los workers.
+
+    Returns:
+        tuple: (contenido en bytes, content type).
+    """
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead(pid: int):
+    """
+    Limpia los archivos de métricas de un worker terminado. Para usar desde el hook
+    `child_exit` de gunicorn en modo multiproceso.
+
+    Args:
+        pid (int): PID del worker terminado.
+    """
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
+
+
+def register_metrics(app):
+    """
+    Agrega el middleware que registra conteo, latencia, errores y solicitudes en curso
+    por prefijo de router.
+
+    Args:
+        app (FastAPI): Aplicación a instrumentar.
+    """
+    @app.middleware("http")
+    async def metrics_middleware(request, call_next):
+        sample_threadpool()
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            prefix = get_route_prefix(request)
+            REQUEST_COUNT.labels(prefix, request.method, str(status)).inc()
+            REQUEST_LATENCY.labels(prefix, request.method).observe(elapsed)
+            if status >= 500:
+                REQUEST_ERRORS.labels(prefix).inc()
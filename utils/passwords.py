@@ -0,0 +1,191 @@
+"""
+Hash y verificación de contraseñas con Argon2.
+
+Este módulo solo depende de passlib para poder importarse en los procesos del pool de
+hashing (ver `utils.security`) sin cargar la aplicación ni la base de datos.
+
+Los parámetros de Argon2 se leen de las variables de entorno ARGON2_TIME_COST,
+ARGON2_MEMORY_COST (KiB) y ARGON2_PARALLELISM; sin ellas se usan los valores por defecto
+de passlib. Para elegirlos según el hardware de despliegue:
+
+    python -m utils.passwords --target-ms 250 --write-env .env
+
+Los hashes creados con otros parámetros se actualizan en el siguiente login.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+from passlib.context import CryptContext
+
+ARGON2_ENV_VARS = {
+    "time_cost": "ARGON2_TIME_COST",
+    "memory_cost": "ARGON2_MEMORY_COST",
+    "parallelism": "ARGON2_PARALLELISM",
+}
+
+# Memoria mínima aceptada por la calibración (recomendación OWASP para Argon2id: 19 MiB)
+MIN_MEMORY_COST_KIB = 19 * 1024
+
+
+def argon2_settings() -> dict:
+    """
+    Lee los parámetros de Argon2 configurados en el entorno.
+
+    Returns:
+        dict: Parámetros definidos (time_cost, memory_cost, parallelism); vacío si no hay ninguno.
+    """
+    return {
+        name: int(os.environ[env_var])
+        for name, env_var in ARGON2_ENV_VARS.items()
+        if os.getenv(env_var)
+    }
+
+
+def build_context(time_cost: int = None, memory_cost: int = None, parallelism: int = None) -> CryptContext:
+    """
+    Crea el CryptContext de Argon2 con los parámetros indicados.
+
+    El time_cost se fija también como mínimo y máximo deseado para que `needs_update`
+    marque los hashes creados con otro valor, igual que hace passlib con memory_cost.
+
+    Returns:
+        CryptContext: Contexto configurado.
+    """
+    options = {}
+    if time_cost:
+        options.update(argon2__rounds=time_cost, argon2__min_rounds=time_cost, argon2__max_rounds=time_cost)
+    if memory_cost:
+        options["argon2__memory_cost"] = memory_cost
+    if parallelism:
+        options["argon2__parallelism"] = parallelism
+    return CryptContext(schemes=["argon2"], deprecated="auto", **options)
+
+
+pwd_context = build_context(**argon2_settings())
+
+
+def hash_password_sync(password: str) -> str:
+    """
+    Hashea una contraseña en el proceso actual.
+
+    Args:
+        password (str): La contraseña en texto plano.
+
+    Returns:
+        str: La contraseña hasheada.
+    """
+    return pwd_context.hash(password)
+
+
+def verify_password_sync(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verifica una contraseña en el proceso actual.
+
+    Args:
+        plain_password (str): La contraseña en texto plano.
+        hashed_password (str): La contraseña hasheada a comparar.
+
+    Returns:
+        bool: Verdadero si las contraseñas coinciden.
+    """
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def verify_and_update_sync(plain_password: str, hashed_password: str) -> tuple:
+    """
+    Verifica una contraseña y, si el hash usa parámetros distintos a los configurados,
+    genera uno nuevo en la misma operación.
+
+    Args:
+        plain_password (str): La contraseña en texto plano.
+        hashed_password (str): La contraseña hasheada a comparar.
+
+    Returns:
+        tuple: (coincide, nuevo hash o None si no hace falta actualizarlo).
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def measure_hash_ms(context: CryptContext, samples: int = 5) -> float:
+    """
+    Mide la mediana en milisegundos de `samples` hashes con el contexto indicado.
+    """
+    durations = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.hash("calibración-Argon2#1")
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def calibrate(target_ms: float, max_memory_kib: int, parallelism: int, max_time_cost: int = 10,
+              samples: int = 5) -> dict:
+    """
+    Elige los parámetros de Argon2 que más se acercan a `target_ms` por hash en esta máquina
+    sin superarlo. Se prioriza la memoria (la defensa principal de Argon2 frente a GPU):
+    se parte de `max_memory_kib` con time_cost 1, se reduce la memoria a la mitad mientras
+    el hash sea demasiado lento y luego se sube time_cost mientras quepa en el objetivo.
+
+    Args:
+        target_ms (float): Latencia objetivo por hash en milisegundos.
+        max_memory_kib (int): Memoria máxima por hash en KiB.
+        parallelism (int): Número de carriles de Argon2.
+        max_time_cost (int): Límite superior de iteraciones.
+        samples (int): Hashes medidos por combinación.
+
+    Returns:
+        dict: time_cost, memory_cost, parallelism y la latencia medida (measured_ms).
+    """
+    memory_cost = max(max_memory_kib, MIN_MEMORY_COST_KIB)
+    time_cost = 1
+    measured = measure_hash_ms(build_context(time_cost, memory_cost, parallelism), samples)
+    while measured > target_ms and memory_cost // 2 >= MIN_MEMORY_COST_KIB:
+        memory_cost //= 2
+        measured = measure_hash_ms(build_context(time_cost, memory_cost, parallelism), samples)
+
+    while time_cost < max_time_cost:
+        candidate = measure_hash_ms(build_context(time_cost + 1, memory_cost, parallelism), samples)
+        if candidate > target_ms:
+            break
+        time_cost += 1
+        measured = candidate
+
+    return {
+        "time_cost": time_cost,
+        "memory_cost": memory_cost,
+        "parallelism": parallelism,
+        "measured_ms": round(measured, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibra los parámetros de Argon2 para esta máquina")
+    parser.add_argument("--target-ms", type=float, default=250, help="Latencia objetivo por hash")
+    parser.add_argument("--max-memory-mib", type=int, default=128, help="Memoria máxima por hash")
+    parser.add_argument("--parallelism", type=int, default=2)
+    parser.add_argument("--max-time-cost", type=int, default=10)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--write-env", metavar="ARCHIVO", help="Guardar los parámetros en este archivo .env")
+    args = parser.parse_args(argv)
+
+    result = calibrate(args.target_ms, args.max_memory_mib * 1024, args.parallelism,
+                       args.max_time_cost, args.samples)
+    print(f"time_cost={result['time_cost']} memory_cost={result['memory_cost']} KiB "
+          f"parallelism={result['parallelism']} -> {result['measured_ms']} ms por hash")
+
+    if args.write_env:
+        from dotenv import set_key
+
+        for name, env_var in ARGON2_ENV_VARS.items():
+            set_key(args.write_env, env_var, str(result[name]), quote_mode="never")
+        print(f"Parámetros guardados en {args.write_env}")
+    else:
+        for name, env_var in ARGON2_ENV_VARS.items():
+            print(f"{env_var}={result[name]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import io
+import csv
+import logging
+from itertools import islice
+
+logger = logging.getLogger(__name__)
+
+# Marcador de NULL en el CSV enviado a COPY (distingue NULL de la cadena vacía)
+COPY_NULL = "\\N"
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def _copy_statement(table: str, columns: list) -> str:
+    return (
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN "
+        f"WITH (FORMAT csv, NULL '{COPY_NULL}')"
+    )
+
+
+def write_copy_rows(file, rows) -> int:
+    """
+    Escribe filas en `file` en el formato que espera `copy_from_file`. Sirve para acumular
+    filas (p. ej. en un archivo temporal) antes de abrir la transacción que las carga.
+
+    Args:
+        file: Archivo de texto abierto con `newline=""`.
+        rows (list): Filas (tuplas o listas). None se escribe como NULL.
+
+    Returns:
+        int: Número de filas escritas.
+    """
+    writer = csv.writer(file, lineterminator="\n")
+    writer.writerows(
+        [COPY_NULL if value is None else value for value in row]
+        for row in rows
+    )
+    return len(rows)
+
+
+def copy_from_file(cursor, table: str, columns: list, file):
+    """
+    Carga en una tabla, con `COPY ... FROM STDIN`, las filas escritas en `file` por
+    `write_copy_rows`. El archivo se lee desde el principio y por bloques.
+
+    Args:
+        cursor: Cursor DBAPI de psycopg2.
+        table (str): Nombre de la tabla destino.
+        columns (list): Columnas destino, en el orden de los valores de cada fila.
+        file: Archivo de texto con las filas.
+    """
+    file.seek(0)
+    cursor.copy_expert(_copy_statement(table, columns), file)
+
+
+def copy_rows(cursor, table: str, columns: list, rows, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Carga filas en una tabla con `COPY ... FROM STDIN` de Postgres, en bloques de tamaño fijo,
+    de modo que la memoria usada no depende del número total de filas.
+
+    Args:
+        cursor: Cursor DBAPI de psycopg2.
+        table (str): Nombre de la tabla destino.
+        columns (list): Columnas destino, en el orden de los valores de cada fila.
+        rows (iterable): Filas (tuplas o listas); puede ser un generador. None se carga como NULL.
+        chunk_size (int): Filas por bloque enviado a COPY.
+
+    Returns:
+        int: Número de filas cargadas.
+    """
+    rows = iter(rows)
+    total = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        buffer = io.StringIO()
+        write_copy_rows(buffer, chunk)
+        copy_from_file(cursor, table, columns, buffer)
+        total += len(chunk)
+        logger.debug("COPY %s: %s filas cargadas", table, total)
+    return total
+
+
+def reserve_ids(cursor, table: str, pk_column: str, count: int) -> int:
+    """
+    Reserva un rango contiguo de `count` valores de la secuencia de la clave primaria, para
+    cargar filas con IDs explícitos (p. ej. con COPY) y poder referenciarlas sin consultarlas.
+
+    `setval(nextval() + count - 1)` no es atómico frente a otros inserts, así que la tabla se
+    bloquea en modo EXCLUSIVE (bloquea escrituras, no lecturas) hasta que el llamador confirme
+    la transacción; hay que confirmar enseguida. Pensado para cargas masivas y benchmarks, no
+    para las rutas de la aplicación.
+
+    Args:
+        cursor: Cursor DBAPI de psycopg2.
+        table (str): Nombre de la tabla.
+        pk_column (str): Columna de la clave primaria respaldada por una secuencia.
+        count (int): Número de IDs a reservar.
+
+    Returns:
+        int: Primer ID del rango reservado; el rango es [primero, primero + count).
+    """
+    cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", (table, pk_column))
+    sequence = cursor.fetchone()[0]
+    if sequence is None:
+        raise ValueError(f"La columna {table}.{pk_column} no tiene una secuencia asociada")
+    if count <= 0:
+        return 0
+    cursor.execute(f"LOCK TABLE {table} IN EXCLUSIVE MODE")
+    cursor.execute("SELECT setval(%s, nextval(%s) + %s - 1)", (sequence, sequence, count))
+    last_id = cursor.fetchone()[0]
+    return last_id - count + 1
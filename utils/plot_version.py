@@ -0,0 +1,41 @@
+"""
+Versión de los lotes de cada finca (`farms.plot_version`).
+
+Cada escritura sobre los lotes de una finca (crear, editar, cambiar ubicación, eliminar)
+incrementa la versión en la misma transacción. Los listados usan la versión como ETag
+débil: si el cliente ya tiene la versión actual se responde 304 sin consultar los lotes.
+"""
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from models.models import Farms
+
+
+def bump_plot_version(db: Session, farm_id: int):
+    """
+    Incrementa la versión de los lotes de una finca. Se confirma con el siguiente
+    `db.commit()` del llamador.
+
+    Args:
+        db (Session): Sesión de base de datos.
+        farm_id (int): ID de la finca cuyos lotes cambiaron.
+    """
+    db.execute(
+        update(Farms)
+        .where(Farms.farm_id == farm_id)
+        .values(plot_version=Farms.plot_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def plot_list_etag(farm_id: int, plot_version: int) -> str:
+    """
+    ETag débil del listado de lotes de una finca.
+
+    Args:
+        farm_id (int): ID de la finca.
+        plot_version (int): Versión actual de sus lotes.
+
+    Returns:
+        str: ETag débil, p. ej. `W/"plots-12-7"`.
+    """
+    return f'W/"plots-{farm_id}-{plot_version}"'
@@ -0,0 +1,186 @@
+"""
+Limitador de intentos para los endpoints de autenticación, con token buckets por IP y por
+correo electrónico.
+
+Cada límite se configura como "N/S" (N intentos de ráfaga, recargados a N por cada S
+segundos), p. ej. RATE_LIMIT_LOGIN_EMAIL="5/300". Con RATE_LIMIT_BACKEND=database los
+buckets se guardan en la tabla `rate_limit_buckets` y los comparten todos los workers; por
+defecto viven en la memoria del proceso.
+"""
+import os
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from fastapi import HTTPException
+from sqlalchemy import text
+from dataBase import SessionLocal
+from utils.metrics import RATE_LIMIT_CHECKS
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+
+# Tomar la IP del cliente de X-Forwarded-For (solo detrás de un proxy de confianza)
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+
+RATE_LIMIT_MEMORY_MAX_KEYS = int(os.getenv("RATE_LIMIT_MEMORY_MAX_KEYS", 100000))
+
+# Los buckets sin uso durante este tiempo están llenos y se eliminan de la tabla
+RATE_LIMIT_SWEEP_INTERVAL = float(os.getenv("RATE_LIMIT_SWEEP_INTERVAL", 600))
+RATE_LIMIT_IDLE_SECONDS = int(os.getenv("RATE_LIMIT_IDLE_SECONDS", 3600))
+
+RateLimit = namedtuple("RateLimit", ["name", "key_type", "capacity", "refill_per_second"])
+
+
+def parse_rate_limit(name: str, key_type: str, default: str) -> RateLimit:
+    """
+    Lee un límite "N/S" de la variable RATE_LIMIT_<NAME>_<KEY_TYPE>.
+
+    Returns:
+        RateLimit: Límite configurado.
+    """
+    value = os.getenv(f"RATE_LIMIT_{name.upper()}_{key_type.upper()}", default)
+    capacity, period = value.split("/")
+    return RateLimit(name, key_type, float(capacity), float(capacity) / float(period))
+
+
+AUTH_RATE_LIMITS = {
+    "login": [parse_rate_limit("login", "ip", "30/60"), parse_rate_limit("login", "email", "5/300")],
+    "register": [parse_rate_limit("register", "ip", "10/3600")],
+    "forgot_password": [parse_rate_limit("forgot_password", "ip", "10/3600"),
+                        parse_rate_limit("forgot_password", "email", "3/900")],
+}
+
+
+class MemoryBucketStore:
+    """Buckets en la memoria del proceso, con un máximo de claves (LRU)."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MEMORY_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, refill_per_second: float):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+
+class DatabaseBucketStore:
+    """
+    Buckets en la tabla `rate_limit_buckets`. Cada intento es un único INSERT ... ON CONFLICT
+    que recarga, descuenta y devuelve el bucket de forma atómica.
+    """
+
+    TAKE_STATEMENT = text(
+        "INSERT INTO rate_limit_buckets AS b (key, tokens, allowed, updated_at) "
+        "VALUES (:key, :capacity - 1, true, now()) "
+        "ON CONFLICT (key) DO UPDATE SET "
+        "tokens = LEAST(:capacity, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * :rate) "
+        "- CASE WHEN LEAST(:capacity, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * :rate) >= 1 "
+        "THEN 1 ELSE 0 END, "
+        "allowed = LEAST(:capacity, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * :rate) >= 1, "
+        "updated_at = now() "
+        "RETURNING allowed, tokens"
+    )
+    SWEEP_STATEMENT = text(
+        "DELETE FROM rate_limit_buckets WHERE updated_at < now() - make_interval(secs => :idle)"
+    )
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._last_sweep = time.monotonic()
+
+    def take(self, key: str, capacity: float, refill_per_second: float):
+        with self.session_factory() as db:
+            row = db.execute(self.TAKE_STATEMENT, {"key": key, "capacity": capacity, "rate": refill_per_second}).first()
+            if time.monotonic() - self._last_sweep >= RATE_LIMIT_SWEEP_INTERVAL:
+                self._last_sweep = time.monotonic()
+                db.execute(self.SWEEP_STATEMENT, {"idle": RATE_LIMIT_IDLE_SECONDS})
+            db.commit()
+        return row.allowed, row.tokens
+
+
+def _build_store():
+    if RATE_LIMIT_BACKEND == "memory":
+        return MemoryBucketStore()
+    if RATE_LIMIT_BACKEND == "database":
+        return DatabaseBucketStore()
+    raise ValueError(f"RATE_LIMIT_BACKEND desconocido: {RATE_LIMIT_BACKEND}")
+
+
+bucket_store = _build_store()
+
+
+def get_client_ip(request) -> str:
+    """
+    Obtiene la IP del cliente de la solicitud.
+
+    Args:
+        request (Request): Solicitud HTTP.
+
+    Returns:
+        str: IP del cliente, o "unknown" si no se conoce.
+    """
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _bucket_key(limit: RateLimit, value: str) -> str:
+    # Se guarda un hash para no almacenar correos ni IPs en claro
+    digest = hashlib.sha256(value.strip().lower().encode()).hexdigest()[:32]
+    return f"{limit.name}:{limit.key_type}:{digest}"
+
+
+def enforce_rate_limit(action: str, request, email: str = None):
+    """
+    Descuenta un intento de los buckets de la acción (por IP y, si aplica, por correo).
+
+    Args:
+        action (str): Acción limitada (clave de AUTH_RATE_LIMITS).
+        request (Request): Solicitud HTTP, para obtener la IP del cliente.
+        email (str): Correo electrónico del intento, si la acción lo limita.
+
+    Raises:
+        HTTPException: 429 con cabecera Retry-After si algún bucket está vacío.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+    values = {"ip": get_client_ip(request), "email": email}
+    for limit in AUTH_RATE_LIMITS[action]:
+        value = values.get(limit.key_type)
+        if not value:
+            continue
+        try:
+            allowed, tokens = bucket_store.take(_bucket_key(limit, value), limit.capacity, limit.refill_per_second)
+        except Exception as e:
+            # Si el backend compartido falla no se bloquea la autenticación
+            logger.error("Error en el limitador de intentos (%s): %s", limit.name, str(e))
+            RATE_LIMIT_CHECKS.labels(limit.name, limit.key_type, "error").inc()
+            continue
+        if not allowed:
+            RATE_LIMIT_CHECKS.labels(limit.name, limit.key_type, "limited").inc()
+            retry_after = max(math.ceil((1 - tokens) / limit.refill_per_second), 1)
+            logger.warning("Límite de intentos excedido para %s por %s", limit.name, limit.key_type)
+            raise HTTPException(
+                status_code=429,
+                detail="Demasiados intentos, intenta de nuevo más tarde",
+                headers={"Retry-After": str(retry_after)},
+            )
+        RATE_LIMIT_CHECKS.labels(limit.name, limit.key_type, "allowed").inc()
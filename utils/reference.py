@@ -0,0 +1,125 @@
+"""
+Instantánea en memoria de los datos de referencia (roles con sus permisos, unidades de área y
+variedades de café) que sirven los endpoints de `/utils`.
+
+La instantánea se carga al iniciar la aplicación con tres consultas y se recarga cuando llega
+una invalidación del namespace "reference" (o cuando el listener se reconecta). Cada lista
+lleva un ETag fuerte calculado de su contenido y la instantánea una versión que los combina.
+
+Después de modificar estas tablas a mano:
+    python -m utils.invalidation reference
+"""
+import os
+import hashlib
+import logging
+import threading
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from dataBase import SessionLocal
+from models.models import Roles, RolePermission, Permissions, AreaUnits, CoffeeVarieties
+from utils.invalidation import publish, register_handler
+from utils.response import compute_etag
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_NAMESPACE = "reference"
+
+# Segundos que los clientes pueden reutilizar las respuestas sin revalidar
+REFERENCE_CACHE_MAX_AGE = int(os.getenv("REFERENCE_CACHE_MAX_AGE", 86400))
+REFERENCE_CACHE_CONTROL = f"public, max-age={REFERENCE_CACHE_MAX_AGE}"
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def load_reference_snapshot(db: Session) -> dict:
+    """
+    Consulta los datos de referencia.
+
+    Returns:
+        dict: `version` y, por cada lista (`roles`, `area_units`, `coffee_varieties`), sus
+        datos en `data` y su ETag en `etag`.
+    """
+    roles = {}
+    role_rows = db.execute(
+        select(Roles.role_id, Roles.name, Permissions.permission_id, Permissions.name, Permissions.description)
+        .outerjoin(RolePermission, RolePermission.role_id == Roles.role_id)
+        .outerjoin(Permissions, Permissions.permission_id == RolePermission.permission_id)
+        .order_by(Roles.role_id, Permissions.permission_id)
+    ).all()
+    for role_id, role_name, permission_id, permission_name, description in role_rows:
+        role = roles.setdefault(role_id, {"role_id": role_id, "name": role_name, "permissions": []})
+        if permission_id is not None:
+            role["permissions"].append({
+                "permission_id": permission_id,
+                "name": permission_name,
+                "description": description
+            })
+
+    area_units = [
+        {"area_unit_id": area_unit_id, "name": name, "abbreviation": abbreviation}
+        for area_unit_id, name, abbreviation in db.execute(
+            select(AreaUnits.area_unit_id, AreaUnits.name, AreaUnits.abbreviation).order_by(AreaUnits.area_unit_id)
+        )
+    ]
+    coffee_varieties = [
+        {"coffee_variety_id": coffee_variety_id, "name": name}
+        for coffee_variety_id, name in db.execute(
+            select(CoffeeVarieties.coffee_variety_id, CoffeeVarieties.name).order_by(CoffeeVarieties.coffee_variety_id)
+        )
+    ]
+
+    snapshot = {}
+    for name, data in (("roles", list(roles.values())), ("area_units", area_units), ("coffee_varieties", coffee_varieties)):
+        snapshot[name] = {"data": data, "etag": compute_etag(data)}
+    combined = "".join(snapshot[name]["etag"] for name in sorted(snapshot))
+    snapshot["version"] = hashlib.sha256(combined.encode()).hexdigest()[:16]
+    return snapshot
+
+
+def get_reference_snapshot(db: Session) -> dict:
+    """
+    Devuelve la instantánea actual, cargándola con `db` si todavía no existe.
+
+    Args:
+        db (Session): Sesión de base de datos (solo se usa si hay que cargar).
+    """
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is not None:
+        return snapshot
+    snapshot = load_reference_snapshot(db)
+    with _snapshot_lock:
+        _snapshot = snapshot
+    logger.info("Datos de referencia cargados (versión %s)", snapshot["version"])
+    return snapshot
+
+
+def refresh_reference_snapshot():
+    """
+    Recarga la instantánea con una sesión propia. Si la recarga falla se descarta la actual,
+    de modo que la siguiente solicitud la vuelva a cargar.
+    """
+    global _snapshot
+    db = SessionLocal()
+    try:
+        snapshot = load_reference_snapshot(db)
+    except Exception as e:
+        logger.error("Error al recargar los datos de referencia: %s", str(e))
+        snapshot = None
+    finally:
+        db.close()
+    with _snapshot_lock:
+        _snapshot = snapshot
+    if snapshot is not None:
+        logger.info("Datos de referencia recargados (versión %s)", snapshot["version"])
+
+
+def publish_reference_change(db: Session):
+    """
+    Recarga la instantánea en todos los workers al confirmar la transacción de `db`. Debe
+    llamarse antes de `db.commit()`.
+    """
+    publish(db, REFERENCE_NAMESPACE)
+
+register_handler(REFERENCE_NAMESPACE, lambda key: refresh_reference_snapshot())
@@ -1,7 +1,10 @@
 
+import hashlib
+import orjson
 from typing import Any, Optional
 from pydantic import BaseModel
 from decimal import Decimal
+from fastapi import Response
 from fastapi.responses import ORJSONResponse
 from datetime import datetime, date, time
 from uuid import UUID
@@ -78,6 +81,77 @@ def create_response(
     )
 
 
+def compute_etag(data: Any, weak: bool = False) -> str:
+    """
+    Calcula un ETag a partir del contenido de una respuesta.
+
+    Args:
+        data (Any): Datos de la respuesta (se procesan igual que en `create_response`).
+        weak (bool): Si es verdadero, devuelve un ETag débil (`W/"..."`).
+
+    Returns:
+        str: ETag entre comillas.
+    """
+    body = orjson.dumps(process_data_for_json(data), option=orjson.OPT_SORT_KEYS)
+    tag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    return f"W/{tag}" if weak else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Indica si la cabecera If-None-Match del cliente incluye el ETag (comparación débil).
+
+    Args:
+        if_none_match (Optional[str]): Valor de la cabecera If-None-Match.
+        etag (str): ETag actual del recurso.
+
+    Returns:
+        bool: Verdadero si el cliente ya tiene la versión actual.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    current = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == current:
+            return True
+    return False
+
+
+def create_etag_response(
+    message: str,
+    data: Any,
+    if_none_match: Optional[str] = None,
+    etag: Optional[str] = None,
+    cache_control: str = "private, no-cache"
+) -> Response:
+    """
+    Crea una respuesta de éxito con cabecera ETag, o un 304 sin cuerpo si el cliente ya
+    tiene esa versión.
+
+    Args:
+        message (str): Mensaje descriptivo.
+        data (Any): Datos de la respuesta.
+        if_none_match (Optional[str]): Cabecera If-None-Match de la solicitud.
+        etag (Optional[str]): ETag ya calculado; por defecto se calcula del contenido.
+        cache_control (str): Valor de la cabecera Cache-Control.
+
+    Returns:
+        Response: 304 Not Modified o la respuesta JSON con ETag.
+    """
+    etag = etag or compute_etag(data)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response = create_response("success", message, data)
+    response.headers.update(headers)
+    return response
+
+
 def session_token_invalid_response() -> ORJSONResponse:
     """
     Crea una respuesta para cuando el token de sesión es inválido.
@@ -0,0 +1,117 @@
+"""
+Migración idempotente de las tablas, columnas e índices agregados después del esquema
+inicial. No se ejecuta al iniciar la aplicación (cada worker repetiría el DDL y competiría
+con los demás); se aplica una vez por despliegue, antes de arrancar los workers:
+
+    python -m utils.schema
+
+Cada paso puede repetirse sin efecto.
+"""
+import os
+import sys
+import logging
+import argparse
+from sqlalchemy import text
+from models.models import PasswordResetTokens, UserSessions, RateLimitBuckets
+
+logger = logging.getLogger(__name__)
+
+# Tablas nuevas que se crean si no existen
+SCHEMA_TABLES = [
+    PasswordResetTokens.__table__,
+    UserSessions.__table__,
+    RateLimitBuckets.__table__,
+]
+
+# Sentencias DDL idempotentes (ADD COLUMN IF NOT EXISTS, CREATE INDEX IF NOT EXISTS, ...)
+SCHEMA_STATEMENTS = [
+    # Versión de los tokens de sesión firmados (utils.session_tokens)
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0",
+    # Versión de los lotes de cada finca, usada como ETag del listado (utils.plot_version)
+    "ALTER TABLE farms ADD COLUMN IF NOT EXISTS plot_version INTEGER NOT NULL DEFAULT 0",
+    # Ubicación de los lotes como punto (x = longitud, y = latitud) para las búsquedas por
+    # rectángulo y por cercanía de endpoints.plots (requiere PostgreSQL 12+). Agregar una
+    # columna generada reescribe `plots` con un bloqueo exclusivo: la primera vez conviene
+    # aplicar la migración en una ventana de mantenimiento.
+    "ALTER TABLE plots ADD COLUMN IF NOT EXISTS location point "
+    "GENERATED ALWAYS AS (point(longitude::float8, latitude::float8)) STORED",
+    # Lindero de los lotes y su rectángulo envolvente (utils.geometry). Un solo ALTER TABLE
+    # para que la columna generada `bounds` reescriba la tabla una sola vez.
+    "ALTER TABLE plots ADD COLUMN IF NOT EXISTS boundary JSONB, "
+    "ADD COLUMN IF NOT EXISTS min_longitude NUMERIC(11, 8), "
+    "ADD COLUMN IF NOT EXISTS min_latitude NUMERIC(11, 8), "
+    "ADD COLUMN IF NOT EXISTS max_longitude NUMERIC(11, 8), "
+    "ADD COLUMN IF NOT EXISTS max_latitude NUMERIC(11, 8), "
+    "ADD COLUMN IF NOT EXISTS bounds box "
+    "GENERATED ALWAYS AS (box(point(min_longitude::float8, min_latitude::float8), "
+    "point(max_longitude::float8, max_latitude::float8))) STORED",
+]
+
+# Índices que se construyen con CREATE INDEX CONCURRENTLY para no bloquear las escrituras,
+# como nombre -> definición (lo que va después de "ON")
+SCHEMA_INDEXES = {
+    # Índice GiST sobre la ubicación de los lotes
+    "ix_plots_location": "plots USING gist (location)",
+    # Índice GiST sobre el rectángulo envolvente, para descartar lotes fuera del mapa
+    "ix_plots_bounds": "plots USING gist (bounds)",
+}
+
+# Espera máxima por el bloqueo de cada sentencia, para no encolar las consultas de la
+# aplicación detrás de una migración que no consigue el bloqueo
+SCHEMA_LOCK_TIMEOUT = os.getenv("SCHEMA_LOCK_TIMEOUT", "5s")
+
+
+def _create_index_concurrently(connection, name: str, definition: str):
+    """
+    Crea un índice con CREATE INDEX CONCURRENTLY. Si una ejecución anterior se interrumpió y
+    dejó el índice inválido, lo elimina y lo vuelve a construir.
+    """
+    valid = connection.execute(text(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+    ), {"name": name}).scalar()
+    if valid:
+        return
+    if valid is not None:
+        logger.warning("El índice %s quedó inválido; se vuelve a construir", name)
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    connection.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"))
+    logger.info("Índice %s creado", name)
+
+
+def ensure_schema(engine):
+    """
+    Crea las tablas de SCHEMA_TABLES que falten, aplica SCHEMA_STATEMENTS (cada una en su
+    propia transacción, para no retener los bloqueos de todas hasta el final) y construye
+    los índices de SCHEMA_INDEXES sin bloquear las escrituras.
+
+    Args:
+        engine (Engine): Engine de la base de datos.
+    """
+    for table in SCHEMA_TABLES:
+        table.create(bind=engine, checkfirst=True)
+    for statement in SCHEMA_STATEMENTS:
+        with engine.begin() as connection:
+            connection.execute(text("SELECT set_config('lock_timeout', :timeout, true)"), {"timeout": SCHEMA_LOCK_TIMEOUT})
+            connection.execute(text(statement))
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for name, definition in SCHEMA_INDEXES.items():
+            _create_index_concurrently(connection, name, definition)
+    logger.info("Esquema verificado: %s tablas, %s sentencias, %s índices",
+                len(SCHEMA_TABLES), len(SCHEMA_STATEMENTS), len(SCHEMA_INDEXES))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aplica las tablas, columnas e índices que falten en la base de datos")
+    parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    from dataBase import engine
+
+    ensure_schema(engine)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
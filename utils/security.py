@@ -1,28 +1,161 @@
-from passlib.context import CryptContext
+import os
+import hmac
+import time
+import logging
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 from fastapi import Depends, HTTPException
 from sqlalchemy.orm import Session
 from models.models import Users
 from dataBase import get_db_session
 from fastapi.security import OAuth2PasswordBearer
+from utils.passwords import hash_password_sync, verify_password_sync, verify_and_update_sync
+from utils.session_tokens import is_signed_token, verify_signed_session_token
+from utils.user_sessions import verify_user_session
+from utils.metrics import PASSWORD_HASH_LATENCY, PASSWORD_HASH_QUEUE_DEPTH, PASSWORD_HASH_REJECTED
+
+logger = logging.getLogger(__name__)
+
+# Procesos dedicados al hash de contraseñas (0 = hashear en el hilo del endpoint)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(2, os.cpu_count() or 1)))
+
+# Operaciones admitidas a la vez (en cola o en ejecución); por encima se responde 503
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", max(PASSWORD_HASH_WORKERS, 1) * 4))
+
+# Segundos sugeridos al cliente en la cabecera Retry-After cuando la cola está llena
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", 1))
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+class PasswordHashingBusy(HTTPException):
+    """La cola del pool de hashing está llena; se responde 503 sin esperar."""
+
+    def __init__(self):
+        super().__init__(
+            status_code=503,
+            detail="El servicio está ocupado, intenta de nuevo en unos segundos",
+            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+        )
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # "spawn" evita heredar hilos y conexiones del proceso de la aplicación
+                _executor = ProcessPoolExecutor(
+                    max_workers=PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                logger.info("Pool de hash de contraseñas iniciado con %s procesos", PASSWORD_HASH_WORKERS)
+    return _executor
+
+
+@contextmanager
+def _admit(operation: str, count: int = 1):
+    """
+    Reserva `count` lugares en la cola del pool de hashing mientras dura el bloque.
+
+    Raises:
+        PasswordHashingBusy: Si no caben: ya hay PASSWORD_HASH_MAX_QUEUE operaciones pendientes.
+    """
+    global _pending
+    with _pending_lock:
+        if _pending + count > PASSWORD_HASH_MAX_QUEUE:
+            PASSWORD_HASH_REJECTED.labels(operation).inc()
+            logger.warning("Cola de hash de contraseñas llena (%s pendientes); operación rechazada", _pending)
+            raise PasswordHashingBusy()
+        _pending += count
+    PASSWORD_HASH_QUEUE_DEPTH.inc(count)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PASSWORD_HASH_LATENCY.labels(operation).observe(time.perf_counter() - start)
+        PASSWORD_HASH_QUEUE_DEPTH.dec(count)
+        with _pending_lock:
+            _pending -= count
+
+
+def _run_password_operation(operation: str, fn, *args):
+    """
+    Ejecuta una operación de Argon2 en el pool dedicado, con control de admisión.
+
+    Raises:
+        PasswordHashingBusy: Si ya hay PASSWORD_HASH_MAX_QUEUE operaciones pendientes.
+    """
+    with _admit(operation):
+        if PASSWORD_HASH_WORKERS <= 0:
+            return fn(*args)
+        return _get_executor().submit(fn, *args).result()
+
+
+def shutdown_password_executor():
+    """Detiene el pool de hash de contraseñas, si se inició."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
 
-# Cambia el esquema a "argon2"
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
 def hash_password(password: str) -> str:
     """
-    Hashea una contraseña utilizando el esquema configurado en CryptContext.
+    Hashea una contraseña utilizando el esquema configurado en CryptContext, en el pool
+    dedicado de procesos.
 
     Args:
         password (str): La contraseña en texto plano a hashear.
 
     Returns:
         str: La contraseña hasheada.
+
+    Raises:
+        PasswordHashingBusy: Si la cola del pool está llena.
+    """
+    return _run_password_operation("hash", hash_password_sync, password)
+
+def hash_passwords(passwords: list) -> list:
+    """
+    Hashea varias contraseñas en el pool dedicado (aprovisionamiento masivo).
+
+    Se envían como máximo PASSWORD_HASH_WORKERS contraseñas a la vez y cada grupo pasa por
+    el mismo control de admisión que los hashes de login y registro, que se intercalan en la
+    cola en lugar de esperar a que termine todo el lote.
+
+    Args:
+        passwords (list): Contraseñas en texto plano.
+
+    Returns:
+        list: Hashes en el mismo orden.
+
+    Raises:
+        PasswordHashingBusy: Si la cola del pool se llena durante el lote; en ese caso no se
+            devuelve ningún hash.
     """
-    return pwd_context.hash(password)
+    window_size = max(PASSWORD_HASH_WORKERS, 1)
+    hashes = []
+    for start in range(0, len(passwords), window_size):
+        window = passwords[start:start + window_size]
+        with _admit("bulk_hash", len(window)):
+            if PASSWORD_HASH_WORKERS <= 0:
+                hashes.extend(hash_password_sync(password) for password in window)
+            else:
+                executor = _get_executor()
+                hashes.extend(future.result() for future in [executor.submit(hash_password_sync, p) for p in window])
+    return hashes
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
-    Verifica una contraseña en texto plano contra una contraseña hasheada.
+    Verifica una contraseña en texto plano contra una contraseña hasheada, en el pool
+    dedicado de procesos.
 
     Args:
         plain_password (str): La contraseña en texto plano.
@@ -30,8 +163,28 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
     Returns:
         bool: Verdadero si las contraseñas coinciden, falso en caso contrario.
+
+    Raises:
+        PasswordHashingBusy: Si la cola del pool está llena.
+    """
+    return _run_password_operation("verify", verify_password_sync, plain_password, hashed_password)
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple:
+    """
+    Verifica una contraseña y, si el hash se creó con parámetros de Argon2 distintos a los
+    configurados, devuelve un hash nuevo para reemplazarlo.
+
+    Args:
+        plain_password (str): La contraseña en texto plano.
+        hashed_password (str): La contraseña hasheada a comparar.
+
+    Returns:
+        tuple: (verdadero si coinciden, nuevo hash o None si no hace falta actualizarlo).
+
+    Raises:
+        PasswordHashingBusy: Si la cola del pool está llena.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return _run_password_operation("verify", verify_and_update_sync, plain_password, hashed_password)
 
 import random
 import string
@@ -77,6 +230,11 @@ def verify_session_token(session_token: str, db: Session) -> Users:
     """
     Verifica si un token de sesión es válido y devuelve el usuario correspondiente.
 
+    Los tokens firmados se verifican sin consultar la base de datos (ver utils.session_tokens)
+    y los opacos se buscan en `user_sessions` (ver utils.user_sessions); ambos devuelven un
+    `SessionUser`, que carga la fila de `users` solo si se accede a algo más que `user_id`.
+    Los tokens emitidos antes de `user_sessions` se buscan en `Users.session_token`.
+
     Args:
         session_token (str): El token de sesión a verificar.
         db (Session): La sesión de base de datos.
@@ -84,7 +242,32 @@ def verify_session_token(session_token: str, db: Session) -> Users:
     Returns:
         Users: El objeto usuario correspondiente al token de sesión, o None si no se encuentra.
     """
+    if not session_token:
+        return None
+    if is_signed_token(session_token):
+        return verify_signed_session_token(session_token, db)
+    user = verify_user_session(session_token, db)
+    if user:
+        return user
     user = db.query(Users).filter(Users.session_token == session_token).first()
     if not user:
         return None
     return user
+
+
+# Token para los endpoints de administración (diagnóstico y métricas internas)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def verify_admin_token(admin_token: str) -> bool:
+    """
+    Verifica el token de administración contra el configurado en la variable de entorno ADMIN_TOKEN.
+
+    Args:
+        admin_token (str): El token de administración recibido.
+
+    Returns:
+        bool: Verdadero si el token es válido, falso si no coincide o no hay token configurado.
+    """
+    if not ADMIN_TOKEN or not admin_token:
+        return False
+    return hmac.compare_digest(admin_token, ADMIN_TOKEN)
@@ -0,0 +1,238 @@
+"""
+Tokens de sesión firmados con HMAC.
+
+Con SESSION_TOKEN_FORMAT=signed, `auth.login` emite tokens con la forma
+`st1.<user_id>.<token_version>.<emitido_en>.<firma>` que se verifican sin consultar la
+tabla `users`. La revocación usa el contador `users.token_version`: logout, cambio de
+contraseña y eliminación de cuenta lo incrementan y todos los tokens anteriores del usuario
+dejan de ser válidos. Cada worker guarda las versiones en una caché que se invalida en
+todos los workers por LISTEN/NOTIFY (utils.invalidation); el TTL (SESSION_VERSION_CACHE_TTL)
+acota el tiempo que un token revocado puede aceptarse si se pierde una notificación.
+
+Los tokens opacos (SESSION_TOKEN_FORMAT=opaque, por defecto) siguen funcionando igual.
+"""
+import os
+import time
+import hmac
+import base64
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from models.models import Users
+from utils.invalidation import publish, register_handler
+
+logger = logging.getLogger(__name__)
+
+SESSION_TOKEN_FORMAT = os.getenv("SESSION_TOKEN_FORMAT", "opaque")
+SESSION_SECRET = os.getenv("SESSION_SECRET")
+
+# Vigencia máxima de un token firmado en segundos (0 = sin vencimiento, como los opacos)
+SESSION_TOKEN_MAX_AGE = int(os.getenv("SESSION_TOKEN_MAX_AGE", 30 * 24 * 3600))
+
+SESSION_VERSION_CACHE_TTL = float(os.getenv("SESSION_VERSION_CACHE_TTL", 30))
+SESSION_VERSION_CACHE_SIZE = int(os.getenv("SESSION_VERSION_CACHE_SIZE", 10000))
+
+SIGNED_TOKEN_PREFIX = "st1"
+
+TOKEN_VERSION_NAMESPACE = "session_version"
+
+if SESSION_TOKEN_FORMAT not in ("opaque", "signed"):
+    raise ValueError(f"SESSION_TOKEN_FORMAT desconocido: {SESSION_TOKEN_FORMAT}")
+if SESSION_TOKEN_FORMAT == "signed" and not SESSION_SECRET:
+    raise ValueError("SESSION_TOKEN_FORMAT=signed requiere definir SESSION_SECRET")
+
+_version_cache = OrderedDict()
+_version_cache_lock = threading.Lock()
+
+
+def signed_tokens_enabled() -> bool:
+    """Indica si `auth.login` debe emitir tokens firmados."""
+    return SESSION_TOKEN_FORMAT == "signed"
+
+
+def is_signed_token(token: str) -> bool:
+    """Indica si el token tiene el formato firmado (los opacos no contienen puntos)."""
+    return bool(token) and token.startswith(SIGNED_TOKEN_PREFIX + ".")
+
+
+def _signature(payload: str) -> str:
+    digest = hmac.new(SESSION_SECRET.encode(), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def sign_session_token(user_id: int, token_version: int, issued_at: int = None) -> str:
+    """
+    Crea un token de sesión firmado.
+
+    Args:
+        user_id (int): ID del usuario.
+        token_version (int): Versión de tokens vigente del usuario.
+        issued_at (int): Momento de emisión (segundos Unix); por defecto, ahora.
+
+    Returns:
+        str: Token firmado.
+    """
+    payload = f"{SIGNED_TOKEN_PREFIX}.{user_id}.{token_version}.{int(issued_at or time.time())}"
+    return f"{payload}.{_signature(payload)}"
+
+
+def parse_signed_token(token: str):
+    """
+    Verifica la firma y la vigencia de un token firmado.
+
+    Args:
+        token (str): Token recibido.
+
+    Returns:
+        tuple: (user_id, token_version, issued_at), o None si el token no es válido.
+    """
+    if not SESSION_SECRET or not is_signed_token(token):
+        return None
+    payload, _, signature = token.rpartition(".")
+    if not hmac.compare_digest(signature, _signature(payload)):
+        return None
+    try:
+        _, user_id, token_version, issued_at = payload.split(".")
+        user_id, token_version, issued_at = int(user_id), int(token_version), int(issued_at)
+    except ValueError:
+        return None
+    if SESSION_TOKEN_MAX_AGE and time.time() - issued_at > SESSION_TOKEN_MAX_AGE:
+        return None
+    return user_id, token_version, issued_at
+
+
+def get_token_version(db: Session, user_id: int):
+    """
+    Obtiene la versión de tokens vigente de un usuario, con caché local de TTL corto.
+
+    Returns:
+        int: Versión vigente, o None si el usuario no existe.
+    """
+    now = time.monotonic()
+    with _version_cache_lock:
+        entry = _version_cache.get(user_id)
+        if entry is not None and entry[1] > now:
+            _version_cache.move_to_end(user_id)
+            return entry[0]
+
+    version = db.query(Users.token_version).filter(Users.user_id == user_id).scalar()
+
+    with _version_cache_lock:
+        _version_cache[user_id] = (version, now + SESSION_VERSION_CACHE_TTL)
+        _version_cache.move_to_end(user_id)
+        while len(_version_cache) > SESSION_VERSION_CACHE_SIZE:
+            _version_cache.popitem(last=False)
+    return version
+
+
+def invalidate_token_version(user_id: int = None):
+    """
+    Descarta la versión en caché de un usuario, o de todos si no se indica.
+
+    Args:
+        user_id (int): ID del usuario.
+    """
+    with _version_cache_lock:
+        if user_id is None:
+            _version_cache.clear()
+        else:
+            _version_cache.pop(user_id, None)
+
+
+def publish_token_version_change(db: Session, user_id: int):
+    """
+    Descarta la versión en caché de un usuario en este worker y, al confirmar la
+    transacción de `db`, en los demás. Debe llamarse antes de `db.commit()`.
+
+    Args:
+        db (Session): Sesión con la transacción que modifica al usuario.
+        user_id (int): ID del usuario.
+    """
+    invalidate_token_version(user_id)
+    publish(db, TOKEN_VERSION_NAMESPACE, user_id)
+
+
+register_handler(TOKEN_VERSION_NAMESPACE, lambda key: invalidate_token_version(None if key is None else int(key)))
+
+
+def revoke_user_sessions(db: Session, user_id: int) -> int:
+    """
+    Revoca todos los tokens firmados de un usuario incrementando su `token_version`.
+    El cambio se confirma con el siguiente `db.commit()` del llamador.
+
+    Args:
+        db (Session): Sesión de base de datos.
+        user_id (int): ID del usuario.
+
+    Returns:
+        int: Nueva versión de tokens del usuario.
+    """
+    new_version = db.execute(
+        update(Users)
+        .where(Users.user_id == user_id)
+        .values(token_version=Users.token_version + 1)
+        .returning(Users.token_version)
+    ).scalar()
+    publish_token_version_change(db, user_id)
+    return new_version
+
+
+class SessionUser:
+    """
+    Usuario autenticado por un token firmado. Expone `user_id` sin consultar la base de
+    datos; el resto de atributos carga la fila de `users` la primera vez que se accede.
+
+    Si el usuario se eliminó mientras su versión de tokens seguía en caché, la sesión se
+    trata como inválida: se descarta la versión en caché (la siguiente verificación del
+    token devuelve None) y la solicitud termina con 401.
+    """
+
+    def __init__(self, user_id: int, db: Session):
+        object.__setattr__(self, "user_id", user_id)
+        object.__setattr__(self, "_db", db)
+        object.__setattr__(self, "_instance", None)
+
+    @property
+    def instance(self) -> Users:
+        """Fila de `users` del usuario, cargada bajo demanda."""
+        if self._instance is None:
+            instance = self._db.get(Users, self.user_id)
+            if instance is None:
+                invalidate_token_version(self.user_id)
+                logger.warning("Token de sesión de un usuario eliminado: %s", self.user_id)
+                raise HTTPException(status_code=401, detail="Credenciales expiradas, cerrando sesión.")
+            object.__setattr__(self, "_instance", instance)
+        return self._instance
+
+    def __getattr__(self, name):
+        return getattr(self.instance, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.instance, name, value)
+
+    def __repr__(self):
+        return f"SessionUser(user_id={self.user_id})"
+
+
+def verify_signed_session_token(session_token: str, db: Session):
+    """
+    Verifica un token firmado y su versión.
+
+    Args:
+        session_token (str): Token recibido.
+        db (Session): Sesión de base de datos (solo se usa si la versión no está en caché).
+
+    Returns:
+        SessionUser: Usuario autenticado, o None si el token no es válido o fue revocado.
+    """
+    parsed = parse_signed_token(session_token)
+    if parsed is None:
+        return None
+    user_id, token_version, _ = parsed
+    if get_token_version(db, user_id) != token_version:
+        return None
+    return SessionUser(user_id, db)
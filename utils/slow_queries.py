@@ -0,0 +1,264 @@
+import os
+import re
+import hashlib
+import logging
+import queue
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from utils.instrumentation import add_statement_observer, get_current_request_stats, get_route_path
+
+logger = logging.getLogger(__name__)
+
+# Duración a partir de la cual una sentencia se considera lenta, en milisegundos
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+
+# Número máximo de huellas distintas conservadas en el buffer circular
+SLOW_QUERY_BUFFER_SIZE = int(os.getenv("SLOW_QUERY_BUFFER_SIZE", "100"))
+
+# Número máximo de rutas distintas registradas por huella
+MAX_ROUTES_PER_ENTRY = 10
+
+# Planes pendientes de capturar; si la cola está llena la consulta se registra sin plan
+SLOW_QUERY_EXPLAIN_QUEUE_SIZE = int(os.getenv("SLOW_QUERY_EXPLAIN_QUEUE_SIZE", "20"))
+
+_EXPLAINABLE_STATEMENTS = ("select", "insert", "update", "delete", "with")
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# Buffer circular {huella: entrada}; la entrada más recientemente vista queda al final
+_slow_queries = OrderedDict()
+_slow_queries_lock = threading.Lock()
+
+# Sentencias cuyo plan captura el hilo de EXPLAIN, fuera del hilo de la solicitud
+_explain_queue = queue.Queue(maxsize=SLOW_QUERY_EXPLAIN_QUEUE_SIZE)
+_explain_worker = None
+_explain_worker_lock = threading.Lock()
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    Normaliza una sentencia SQL reemplazando literales y parámetros por `?` y colapsando
+    listas `IN (...)` y espacios, de modo que variantes de la misma consulta coincidan.
+
+    Args:
+        statement (str): Sentencia SQL tal como se envió al driver.
+
+    Returns:
+        str: Sentencia normalizada.
+    """
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _IN_LIST.sub("(...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def statement_fingerprint(statement: str) -> str:
+    """
+    Calcula la huella de una sentencia a partir de su forma normalizada.
+
+    Args:
+        statement (str): Sentencia SQL.
+
+    Returns:
+        str: Huella hexadecimal de 16 caracteres.
+    """
+    return hashlib.sha1(normalize_statement(statement).encode("utf-8")).hexdigest()[:16]
+
+
+def _value_shape(value) -> str:
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}({len(value)})"
+    if isinstance(value, (list, tuple, set)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def parameter_shapes(parameters):
+    """
+    Describe los parámetros de una sentencia por tipo y tamaño, sin exponer sus valores.
+
+    Args:
+        parameters: Parámetros enviados al driver (dict, secuencia o lista de ellos en executemany).
+
+    Returns:
+        Estructura con la misma forma que los parámetros y el tipo de cada valor.
+    """
+    if isinstance(parameters, dict):
+        return {key: _value_shape(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return {"executemany": len(parameters), "first": parameter_shapes(parameters[0])}
+        return [_value_shape(value) for value in parameters]
+    return None
+
+
+def explain_statement(engine, statement: str, parameters) -> list:
+    """
+    Obtiene el plan de ejecución estimado (EXPLAIN sin ANALYZE) de una sentencia, usando
+    una conexión propia para no afectar la transacción de la solicitud. Si el pool ya usa
+    todas sus conexiones base no se toma otra y el plan se omite.
+
+    Args:
+        engine (Engine): Engine desde el que se toma la conexión.
+        statement (str): Sentencia SQL a explicar.
+        parameters: Parámetros de la sentencia.
+
+    Returns:
+        list: Líneas del plan, o una línea con el error si no se pudo obtener.
+    """
+    if not statement.lstrip().lower().startswith(_EXPLAINABLE_STATEMENTS):
+        return []
+    if _pool_is_busy(engine):
+        return ["EXPLAIN omitido: el pool de conexiones está ocupado"]
+    try:
+        raw_connection = engine.raw_connection()
+        try:
+            cursor = raw_connection.cursor()
+            cursor.execute("EXPLAIN (ANALYZE off) " + statement, parameters)
+            plan = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+            raw_connection.rollback()
+            return plan
+        finally:
+            raw_connection.close()
+    except Exception as e:
+        logger.warning("No se pudo obtener el plan de la consulta lenta: %s", str(e))
+        return [f"EXPLAIN no disponible: {str(e)}"]
+
+
+def _pool_is_busy(engine) -> bool:
+    """Indica si el pool ya usa todas sus conexiones base (EXPLAIN tomaría una de desborde)."""
+    pool = engine.pool
+    try:
+        return pool.checkedout() >= pool.size()
+    except (AttributeError, NotImplementedError):
+        return False
+
+
+def _explain_loop():
+    while True:
+        engine, statement, parameters, entry = _explain_queue.get()
+        try:
+            plan = explain_statement(engine, statement, parameters)
+            with _slow_queries_lock:
+                entry["plan"] = plan
+        finally:
+            _explain_queue.task_done()
+
+
+def _queue_explain(engine, statement: str, parameters, entry: dict):
+    """Encola la captura del plan para el hilo de EXPLAIN, iniciándolo la primera vez."""
+    global _explain_worker
+    if _explain_worker is None:
+        with _explain_worker_lock:
+            if _explain_worker is None:
+                _explain_worker = threading.Thread(target=_explain_loop, name="slow-query-explain", daemon=True)
+                _explain_worker.start()
+    try:
+        _explain_queue.put_nowait((engine, statement, parameters, entry))
+    except queue.Full:
+        with _slow_queries_lock:
+            entry["plan"] = ["EXPLAIN omitido: hay demasiados planes pendientes"]
+
+
+def _current_route():
+    stats = get_current_request_stats()
+    if stats is None or stats.request is None:
+        return None
+    return get_route_path(stats.request)
+
+
+def record_slow_query(conn, statement, parameters, executemany, elapsed):
+    """
+    Observador de sentencias: registra en el buffer las que superan SLOW_QUERY_THRESHOLD_MS.
+
+    Args:
+        conn (Connection): Conexión de SQLAlchemy que ejecutó la sentencia.
+        statement (str): Sentencia SQL ejecutada.
+        parameters: Parámetros de la sentencia.
+        executemany (bool): Si la sentencia se ejecutó con executemany.
+        elapsed (float): Duración de la sentencia en segundos.
+    """
+    elapsed_ms = elapsed * 1000
+    if elapsed_ms < SLOW_QUERY_THRESHOLD_MS:
+        return
+
+    fingerprint = statement_fingerprint(statement)
+    route = _current_route()
+    now = datetime.now(timezone.utc).isoformat()
+
+    with _slow_queries_lock:
+        entry = _slow_queries.get(fingerprint)
+        is_new = entry is None
+        if is_new:
+            entry = {
+                "fingerprint": fingerprint,
+                "statement": statement,
+                "normalized": normalize_statement(statement),
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "first_seen": now,
+                "routes": {},
+                "plan": None,
+            }
+            _slow_queries[fingerprint] = entry
+            while len(_slow_queries) > SLOW_QUERY_BUFFER_SIZE:
+                _slow_queries.popitem(last=False)
+        else:
+            _slow_queries.move_to_end(fingerprint)
+
+        entry["count"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+        entry["last_ms"] = elapsed_ms
+        entry["last_seen"] = now
+        entry["parameter_shapes"] = parameter_shapes(parameters)
+        if route and (route in entry["routes"] or len(entry["routes"]) < MAX_ROUTES_PER_ENTRY):
+            entry["routes"][route] = entry["routes"].get(route, 0) + 1
+
+    logger.warning("Consulta lenta (%.1f ms, huella %s, ruta %s): %s", elapsed_ms, fingerprint, route, statement)
+
+    # El plan solo se captura la primera vez que aparece la huella, en segundo plano: la
+    # solicitud no espera el EXPLAIN ni toma una segunda conexión del pool
+    if is_new and not executemany:
+        _queue_explain(conn.engine, statement, parameters, entry)
+
+
+def get_slow_queries() -> list:
+    """
+    Devuelve las consultas lentas del buffer, ordenadas por tiempo acumulado descendente.
+
+    Returns:
+        list: Entradas con huella, sentencia, conteo, tiempos, rutas, forma de los parámetros y plan.
+    """
+    with _slow_queries_lock:
+        entries = [
+            {
+                **entry,
+                "routes": dict(entry["routes"]),
+                "total_ms": round(entry["total_ms"], 2),
+                "max_ms": round(entry["max_ms"], 2),
+                "last_ms": round(entry["last_ms"], 2),
+                "avg_ms": round(entry["total_ms"] / entry["count"], 2),
+            }
+            for entry in _slow_queries.values()
+        ]
+    return sorted(entries, key=lambda entry: entry["total_ms"], reverse=True)
+
+
+def reset_slow_queries():
+    """Vacía el buffer de consultas lentas."""
+    with _slow_queries_lock:
+        _slow_queries.clear()
+
+
+def register_slow_query_log():
+    """Activa el registro de consultas lentas sobre los engines instrumentados."""
+    add_statement_observer(record_slow_query)
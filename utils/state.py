@@ -1,4 +1,7 @@
+import threading
+from sqlalchemy import inspect
 from sqlalchemy.orm import Session
+from utils.invalidation import publish, register_handler
 from models.models import (
     UserStates, FarmStates, PlotStates, NotificationStates, 
     UserRoleFarmStates, TransactionStates, InvitationStates
@@ -40,3 +43,49 @@ def get_state(db: Session, state_name: str, entity_type: str):
     except Exception as e:
         logger.error(f"Error al obtener el estado '{state_name}' para '{entity_type}': {str(e)}")
         return None
+
+
+# IDs de estados por (entidad, nombre); los estados son datos de referencia que casi no cambian
+_state_id_cache = {}
+_state_id_cache_lock = threading.Lock()
+
+def get_state_id(db: Session, state_name: str, entity_type: str):
+    """
+    Obtiene el ID de un estado, consultando la base de datos solo la primera vez.
+
+    Args:
+        db (Session): Sesión de la base de datos.
+        state_name (str): Nombre del estado (e.g., "Activo", "Verificado").
+        entity_type (str): Tipo de entidad (e.g., "Farms", "Users", "Plots").
+
+    Returns:
+        int: ID del estado, o None si no existe (los estados inexistentes no se guardan en caché).
+    """
+    key = (entity_type.lower(), state_name)
+    state_id = _state_id_cache.get(key)
+    if state_id is not None:
+        return state_id
+    state = get_state(db, state_name, entity_type)
+    if state is None:
+        return None
+    state_id = inspect(state).identity[0]
+    with _state_id_cache_lock:
+        _state_id_cache[key] = state_id
+    return state_id
+
+def clear_state_cache():
+    """Descarta los IDs de estados en caché (p. ej. después de modificar la tabla de estados)."""
+    with _state_id_cache_lock:
+        _state_id_cache.clear()
+
+STATE_NAMESPACE = "state"
+
+def publish_state_change(db: Session):
+    """
+    Descarta los IDs de estados en caché en todos los workers al confirmar la transacción
+    de `db`. Debe llamarse antes de `db.commit()`.
+    """
+    clear_state_cache()
+    publish(db, STATE_NAMESPACE)
+
+register_handler(STATE_NAMESPACE, lambda key: clear_state_cache())
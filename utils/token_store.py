@@ -0,0 +1,248 @@
+"""
+Almacén de tokens de restablecimiento de contraseña compartido entre workers.
+
+El backend por defecto es la tabla `password_reset_tokens` de Postgres (índice por
+`expires_at`), de modo que un token emitido por un worker es visible para todos. Con
+RESET_TOKEN_STORE=memory se usa un diccionario local (solo para un único worker). Con
+RESET_TOKEN_CACHE_SIZE > 0 se antepone una caché LRU local para las consultas.
+"""
+import os
+import abc
+import time
+import logging
+import datetime
+import threading
+from collections import OrderedDict
+from sqlalchemy import select, delete, text
+from sqlalchemy.dialects.postgresql import insert
+from dataBase import SessionLocal
+from models.models import PasswordResetTokens
+
+logger = logging.getLogger(__name__)
+
+RESET_TOKEN_STORE = os.getenv("RESET_TOKEN_STORE", "database")
+
+# Entradas de la caché LRU local (0 = sin caché) y segundos que se confía en una entrada
+RESET_TOKEN_CACHE_SIZE = int(os.getenv("RESET_TOKEN_CACHE_SIZE", 0))
+RESET_TOKEN_CACHE_TTL = float(os.getenv("RESET_TOKEN_CACHE_TTL", 30))
+
+# Barrido de tokens expirados: como máximo uno cada SWEEP_INTERVAL segundos, en lotes
+RESET_TOKEN_SWEEP_INTERVAL = float(os.getenv("RESET_TOKEN_SWEEP_INTERVAL", 300))
+RESET_TOKEN_SWEEP_BATCH = int(os.getenv("RESET_TOKEN_SWEEP_BATCH", 1000))
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class TokenStore(abc.ABC):
+    """
+    Interfaz de los almacenes de tokens. Cada token se guarda como un dict con
+    `user_id`, `email` y `expires_at`; los tokens expirados nunca se devuelven.
+    """
+
+    @abc.abstractmethod
+    def put(self, token: str, user_id: int, email: str, expires_at: datetime.datetime):
+        """Guarda un token, reemplazando los tokens anteriores del mismo usuario."""
+
+    @abc.abstractmethod
+    def get(self, token: str):
+        """Devuelve la información del token, o None si no existe o expiró."""
+
+    @abc.abstractmethod
+    def consume(self, token: str, db=None):
+        """
+        Elimina el token de forma atómica y devuelve su información, o None si no era válido.
+
+        Con `db`, los almacenes respaldados por la base de datos eliminan el token en la
+        transacción de esa sesión sin confirmarla: si el llamador revierte, el token sigue
+        siendo válido.
+        """
+
+    @abc.abstractmethod
+    def sweep_expired(self, batch_size: int = RESET_TOKEN_SWEEP_BATCH) -> int:
+        """Elimina los tokens expirados y devuelve cuántos se eliminaron."""
+
+    _last_sweep = 0.0
+    _sweep_lock = threading.Lock()
+
+    def maybe_sweep(self):
+        """Ejecuta `sweep_expired` si pasó RESET_TOKEN_SWEEP_INTERVAL desde el último barrido."""
+        now = time.monotonic()
+        if now - self._last_sweep < RESET_TOKEN_SWEEP_INTERVAL or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = now
+            removed = self.sweep_expired()
+            if removed:
+                logger.info("Tokens de restablecimiento expirados eliminados: %s", removed)
+        except Exception as e:
+            logger.error("Error al eliminar tokens de restablecimiento expirados: %s", str(e))
+        finally:
+            self._sweep_lock.release()
+
+
+class DatabaseTokenStore(TokenStore):
+    """Almacén respaldado por la tabla `password_reset_tokens`, compartido por todos los workers."""
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    @staticmethod
+    def _as_dict(row):
+        return {"user_id": row.user_id, "email": row.email, "expires_at": row.expires_at}
+
+    def put(self, token, user_id, email, expires_at):
+        with self.session_factory() as db:
+            db.execute(delete(PasswordResetTokens).where(PasswordResetTokens.user_id == user_id))
+            db.execute(
+                insert(PasswordResetTokens)
+                .values(token=token, user_id=user_id, email=email, expires_at=expires_at)
+                .on_conflict_do_update(
+                    index_elements=[PasswordResetTokens.token],
+                    set_={"user_id": user_id, "email": email, "expires_at": expires_at},
+                )
+            )
+            db.commit()
+        self.maybe_sweep()
+
+    def get(self, token):
+        with self.session_factory() as db:
+            row = db.execute(
+                select(PasswordResetTokens.user_id, PasswordResetTokens.email, PasswordResetTokens.expires_at)
+                .where(PasswordResetTokens.token == token, PasswordResetTokens.expires_at > _now())
+            ).first()
+        return self._as_dict(row) if row else None
+
+    @staticmethod
+    def _delete_returning(db, token):
+        return db.execute(
+            delete(PasswordResetTokens)
+            .where(PasswordResetTokens.token == token, PasswordResetTokens.expires_at > _now())
+            .returning(PasswordResetTokens.user_id, PasswordResetTokens.email, PasswordResetTokens.expires_at)
+        ).first()
+
+    def consume(self, token, db=None):
+        if db is not None:
+            row = self._delete_returning(db, token)
+        else:
+            with self.session_factory() as own_db:
+                row = self._delete_returning(own_db, token)
+                own_db.commit()
+        return self._as_dict(row) if row else None
+
+    def sweep_expired(self, batch_size=RESET_TOKEN_SWEEP_BATCH):
+        # Lotes acotados con SKIP LOCKED: no bloquea la tabla ni compite con otros workers
+        statement = text(
+            "DELETE FROM password_reset_tokens WHERE token IN ("
+            "SELECT token FROM password_reset_tokens WHERE expires_at < now() "
+            "ORDER BY expires_at LIMIT :batch_size FOR UPDATE SKIP LOCKED)"
+        )
+        removed = 0
+        while True:
+            with self.session_factory() as db:
+                deleted = db.execute(statement, {"batch_size": batch_size}).rowcount
+                db.commit()
+            removed += deleted
+            if deleted < batch_size:
+                return removed
+
+
+class MemoryTokenStore(TokenStore):
+    """Almacén en memoria del proceso; solo válido con un único worker."""
+
+    def __init__(self):
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def put(self, token, user_id, email, expires_at):
+        with self._lock:
+            for existing in [t for t, info in self._tokens.items() if info["user_id"] == user_id]:
+                del self._tokens[existing]
+            self._tokens[token] = {"user_id": user_id, "email": email, "expires_at": expires_at}
+        self.maybe_sweep()
+
+    def get(self, token):
+        info = self._tokens.get(token)
+        if info is None or info["expires_at"] <= _now():
+            return None
+        return dict(info)
+
+    def consume(self, token, db=None):
+        # En memoria no hay transacción: el token se elimina de inmediato
+        with self._lock:
+            info = self._tokens.pop(token, None)
+        if info is None or info["expires_at"] <= _now():
+            return None
+        return info
+
+    def sweep_expired(self, batch_size=RESET_TOKEN_SWEEP_BATCH):
+        now = _now()
+        with self._lock:
+            expired = [t for t, info in self._tokens.items() if info["expires_at"] <= now]
+            for token in expired:
+                del self._tokens[token]
+        return len(expired)
+
+
+class CachedTokenStore(TokenStore):
+    """
+    Caché LRU local delante de otro almacén. Solo acelera `get`; `consume` siempre se
+    resuelve en el almacén de respaldo, así que un token no puede usarse dos veces aunque
+    otro worker lo tenga en caché.
+    """
+
+    def __init__(self, backend: TokenStore, maxsize: int, ttl: float = RESET_TOKEN_CACHE_TTL):
+        self.backend = backend
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _forget(self, token):
+        with self._lock:
+            self._cache.pop(token, None)
+
+    def put(self, token, user_id, email, expires_at):
+        self.backend.put(token, user_id, email, expires_at)
+        self._forget(token)
+
+    def get(self, token):
+        with self._lock:
+            entry = self._cache.get(token)
+            if entry is not None:
+                info, cached_at = entry
+                if time.monotonic() - cached_at < self.ttl and info["expires_at"] > _now():
+                    self._cache.move_to_end(token)
+                    return dict(info)
+                del self._cache[token]
+        info = self.backend.get(token)
+        if info is not None:
+            with self._lock:
+                self._cache[token] = (info, time.monotonic())
+                self._cache.move_to_end(token)
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+        return info
+
+    def consume(self, token, db=None):
+        self._forget(token)
+        return self.backend.consume(token, db)
+
+    def sweep_expired(self, batch_size=RESET_TOKEN_SWEEP_BATCH):
+        return self.backend.sweep_expired(batch_size)
+
+
+def _build_token_store() -> TokenStore:
+    if RESET_TOKEN_STORE == "memory":
+        store = MemoryTokenStore()
+    elif RESET_TOKEN_STORE == "database":
+        store = DatabaseTokenStore()
+    else:
+        raise ValueError(f"RESET_TOKEN_STORE desconocido: {RESET_TOKEN_STORE}")
+    if RESET_TOKEN_CACHE_SIZE > 0:
+        store = CachedTokenStore(store, RESET_TOKEN_CACHE_SIZE)
+    return store
+
+
+reset_token_store = _build_token_store()
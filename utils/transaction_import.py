@@ -0,0 +1,229 @@
+"""
+Importación masiva de transacciones desde CSV.
+
+Las filas se validan por lotes con operaciones vectorizadas de NumPy (valores, fechas,
+lote y categoría de toda la columna a la vez) y las válidas se acumulan en un archivo
+temporal mientras llega el archivo. Al final se cargan con COPY en una tabla temporal y
+pasan a `transactions` con un solo INSERT ... SELECT, en una transacción corta.
+
+Columnas del CSV: `plot_id` o `plot_name`, `transaction_type_name`,
+`transaction_category_name`, `value`, `transaction_date` (AAAA-MM-DD) y `description`
+(opcional).
+"""
+import re
+import numpy as np
+from sqlalchemy import text
+from utils.pg_copy import write_copy_rows, copy_from_file
+
+REQUIRED_COLUMNS = {"transaction_type_name", "transaction_category_name", "value", "transaction_date"}
+
+DESCRIPTION_MAX_LENGTH = 50
+MAX_TRANSACTION_VALUE = 10 ** 13  # Numeric(15, 2)
+MIN_YEAR, MAX_YEAR = 1900, 2100
+
+_ASCII_DIGITS = re.compile(r"[0-9]+")
+
+STAGING_TABLE = "transaction_import"
+STAGING_COLUMNS = ["line_number", "plot_id", "transaction_category_id", "description", "value", "transaction_date"]
+
+
+def check_columns(header: list):
+    """
+    Verifica los encabezados del CSV.
+
+    Returns:
+        str: Mensaje de error, o None si los encabezados son válidos.
+    """
+    columns = {column.strip() for column in header}
+    missing = REQUIRED_COLUMNS - columns
+    if missing:
+        return f"Faltan columnas en el CSV: {', '.join(sorted(missing))}"
+    if not {"plot_id", "plot_name"} & columns:
+        return "El CSV debe tener la columna plot_id o plot_name"
+    return None
+
+
+def _column(rows: list, header_index: dict, name: str) -> np.ndarray:
+    index = header_index.get(name)
+    if index is None:
+        return np.full(len(rows), "", dtype=object).astype(str)
+    return np.char.strip(np.array([row[index] if index < len(row) else "" for row in rows], dtype=str))
+
+
+def _ascii_digits(raw: np.ndarray) -> np.ndarray:
+    """
+    Máscara de las cadenas formadas solo por dígitos ASCII (una comprobación por valor
+    distinto). `np.char.isdigit` también acepta dígitos Unicode como "²" que después no se
+    pueden convertir a número.
+    """
+    if raw.size == 0:
+        return np.zeros(raw.shape, dtype=bool)
+    unique, inverse = np.unique(raw, return_inverse=True)
+    matches = np.fromiter((_ASCII_DIGITS.fullmatch(value) is not None for value in unique), dtype=bool, count=len(unique))
+    return matches[inverse].reshape(raw.shape)
+
+
+def _parse_values(raw: np.ndarray):
+    """Convierte la columna de valores; devuelve (valores, máscara de válidos)."""
+    digits = np.char.replace(raw, ".", "", count=1)
+    numeric = _ascii_digits(digits) & (np.char.str_len(digits) <= 15)
+    values = np.where(numeric, raw, "0").astype(float)
+    return values, numeric & (values > 0) & (values < MAX_TRANSACTION_VALUE)
+
+
+def _parse_dates(raw: np.ndarray):
+    """Convierte la columna de fechas AAAA-MM-DD; devuelve (fechas, máscara de válidas)."""
+    well_formed = (
+        (np.char.str_len(raw) == 10)
+        & (np.char.find(raw, "-") == 4)
+        & (np.char.rfind(raw, "-") == 7)
+    )
+    padded = np.where(well_formed, raw, "1970-01-01")
+    parts = np.char.partition(padded, "-")
+    year_part = parts[:, 0]
+    month_day = np.char.partition(parts[:, 2], "-")
+    month_part, day_part = month_day[:, 0], month_day[:, 2]
+    well_formed &= _ascii_digits(year_part) & _ascii_digits(month_part) & _ascii_digits(day_part)
+    year = np.where(well_formed, year_part, "1970").astype(int)
+    month = np.where(well_formed, month_part, "1").astype(int)
+    day = np.where(well_formed, day_part, "1").astype(int)
+    in_range = (year >= MIN_YEAR) & (year <= MAX_YEAR) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31)
+    month = np.where(in_range, month, 1)
+    first_of_month = (year - 1970) * 12 + (month - 1)
+    dates = first_of_month.astype("datetime64[M]").astype("datetime64[D]") + (np.where(in_range, day, 1) - 1)
+    # 31 de abril y similares pasan al mes siguiente: se descartan
+    same_month = dates.astype("datetime64[M]").astype(int) == first_of_month
+    return dates, well_formed & in_range & same_month
+
+
+def _lookup(keys: np.ndarray, mapping: dict) -> np.ndarray:
+    """Resuelve cada clave con `mapping` (una búsqueda por valor distinto); -1 si no existe."""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    resolved = np.fromiter((mapping.get(key, -1) for key in unique), dtype=np.int64, count=len(unique))
+    return resolved[inverse]
+
+
+class TransactionImportBatchValidator:
+    """
+    Valida lotes de filas del CSV contra los lotes activos de una finca y las categorías
+    existentes, ambos cargados una sola vez.
+
+    Args:
+        header (list): Encabezados del CSV.
+        plots_by_id (dict): `plot_id -> plot_id` de los lotes activos de la finca.
+        plots_by_name (dict): `nombre en minúsculas -> plot_id` de los mismos lotes.
+        categories (dict): `"tipo\\x1fcategoría"` en minúsculas -> transaction_category_id.
+    """
+
+    def __init__(self, header: list, plots_by_id: dict, plots_by_name: dict, categories: dict):
+        self.header_index = {name.strip(): index for index, name in enumerate(header)}
+        self.plots_by_id = {str(plot_id): plot_id for plot_id in plots_by_id}
+        self.plots_by_name = plots_by_name
+        self.categories = categories
+
+    def validate(self, rows: list, lines: list):
+        """
+        Valida un lote de filas.
+
+        Args:
+            rows (list): Filas del CSV (listas de cadenas).
+            lines (list): Número de línea del archivo de cada fila (para el reporte).
+
+        Returns:
+            tuple: (filas válidas para COPY, errores como lista de {"line", "errors"}).
+        """
+        count = len(rows)
+        lines = np.asarray(lines, dtype=np.int64)
+        errors = [[] for _ in range(count)]
+
+        def report(mask, message):
+            for position in np.flatnonzero(mask):
+                errors[position].append(message)
+
+        plot_ids = np.full(count, -1, dtype=np.int64)
+        if "plot_id" in self.header_index:
+            plot_ids = _lookup(_column(rows, self.header_index, "plot_id"), self.plots_by_id)
+        if "plot_name" in self.header_index:
+            by_name = _lookup(np.char.lower(_column(rows, self.header_index, "plot_name")), self.plots_by_name)
+            plot_ids = np.where(plot_ids >= 0, plot_ids, by_name)
+        report(plot_ids < 0, "El lote no existe, no está activo o no pertenece a la finca")
+
+        type_names = np.char.lower(_column(rows, self.header_index, "transaction_type_name"))
+        category_names = np.char.lower(_column(rows, self.header_index, "transaction_category_name"))
+        category_ids = _lookup(np.char.add(np.char.add(type_names, "\x1f"), category_names), self.categories)
+        report(category_ids < 0, "La categoría no existe para el tipo de transacción")
+
+        values, valid_values = _parse_values(_column(rows, self.header_index, "value"))
+        report(~valid_values, "El valor debe ser un número positivo")
+
+        dates, valid_dates = _parse_dates(_column(rows, self.header_index, "transaction_date"))
+        report(~valid_dates, "La fecha no es válida; usa el formato AAAA-MM-DD")
+
+        descriptions = _column(rows, self.header_index, "description")
+        report(np.char.str_len(descriptions) > DESCRIPTION_MAX_LENGTH,
+               f"La descripción no puede tener más de {DESCRIPTION_MAX_LENGTH} caracteres")
+
+        valid = (plot_ids >= 0) & (category_ids >= 0) & valid_values & valid_dates & \
+            (np.char.str_len(descriptions) <= DESCRIPTION_MAX_LENGTH)
+        positions = np.flatnonzero(valid)
+        copy_batch = list(zip(
+            lines[positions].tolist(),
+            plot_ids[positions].tolist(),
+            category_ids[positions].tolist(),
+            [description or None for description in descriptions[positions].tolist()],
+            np.round(values[positions], 2).tolist(),
+            dates[positions].astype(str).tolist(),
+        ))
+        error_report = [
+            {"line": int(lines[position]), "errors": errors[position]}
+            for position in np.flatnonzero(~valid)
+        ]
+        return copy_batch, error_report
+
+
+def create_staging_table(cursor):
+    """Crea la tabla temporal de la importación (se elimina al terminar la transacción)."""
+    cursor.execute(
+        f"CREATE TEMP TABLE {STAGING_TABLE} ("
+        "line_number INTEGER NOT NULL, plot_id INTEGER NOT NULL, transaction_category_id INTEGER NOT NULL, "
+        "description VARCHAR(255), value NUMERIC(15, 2) NOT NULL, transaction_date DATE NOT NULL"
+        ") ON COMMIT DROP"
+    )
+
+
+def spool_rows(spool, rows: list) -> int:
+    """Agrega filas validadas al archivo temporal de la importación."""
+    return write_copy_rows(spool, rows)
+
+
+def stage_spooled_rows(cursor, spool):
+    """Carga en la tabla temporal, con COPY, las filas acumuladas en el archivo temporal."""
+    copy_from_file(cursor, STAGING_TABLE, STAGING_COLUMNS, spool)
+
+
+def insert_staged_transactions(db, farm_id: int, active_plot_state_id: int, active_transaction_state_id: int,
+                               creator_id: int) -> int:
+    """
+    Pasa las filas de la tabla temporal a `transactions` con un solo INSERT ... SELECT. Los
+    lotes se vuelven a comprobar en la misma sentencia por si cambiaron durante la carga.
+
+    Returns:
+        int: Número de transacciones insertadas.
+    """
+    result = db.execute(
+        text(
+            "INSERT INTO transactions (plot_id, description, transaction_date, transaction_state_id, "
+            "value, transaction_category_id, creator_id) "
+            f"SELECT s.plot_id, s.description, s.transaction_date, :state_id, s.value, s.transaction_category_id, :creator_id "
+            f"FROM {STAGING_TABLE} s JOIN plots p ON p.plot_id = s.plot_id "
+            "WHERE p.farm_id = :farm_id AND p.plot_state_id = :plot_state_id "
+            "ORDER BY s.line_number"
+        ),
+        {
+            "state_id": active_transaction_state_id,
+            "creator_id": creator_id,
+            "farm_id": farm_id,
+            "plot_state_id": active_plot_state_id,
+        },
+    )
+    return result.rowcount
@@ -0,0 +1,94 @@
+"""
+Conversión de unidades de área.
+
+Las unidades viven en la tabla `area_units`; aquí se define su equivalencia en metros
+cuadrados, identificada por abreviatura o nombre (sin distinguir mayúsculas). Las unidades
+que no aparecen aquí no se pueden convertir y las expresiones devuelven NULL.
+"""
+from sqlalchemy import case, func, literal, Numeric
+from sqlalchemy.sql.elements import ColumnElement
+
+# Metros cuadrados por unidad
+SQUARE_METERS_PER_UNIT = {
+    "m²": 1,
+    "m2": 1,
+    "metro cuadrado": 1,
+    "metros cuadrados": 1,
+    "ha": 10000,
+    "hectárea": 10000,
+    "hectáreas": 10000,
+    "km²": 1000000,
+    "km2": 1000000,
+    "kilómetro cuadrado": 1000000,
+    "ac": 4046.8564224,
+    "acre": 4046.8564224,
+    "acres": 4046.8564224,
+    # Unidades tradicionales colombianas
+    "fanegada": 6400,
+    "fanegadas": 6400,
+    "cuadra": 6400,
+    "cuadras": 6400,
+}
+
+
+def square_meters_per_unit(unit_name: str = None, abbreviation: str = None):
+    """
+    Obtiene los metros cuadrados de una unidad de área.
+
+    Args:
+        unit_name (str): Nombre de la unidad (p. ej. "Hectárea").
+        abbreviation (str): Abreviatura de la unidad (p. ej. "ha").
+
+    Returns:
+        float: Metros cuadrados por unidad, o None si la unidad no es conocida.
+    """
+    for value in (abbreviation, unit_name):
+        if value and value.strip().lower() in SQUARE_METERS_PER_UNIT:
+            return SQUARE_METERS_PER_UNIT[value.strip().lower()]
+    return None
+
+
+def convert_area(area, from_unit: str, to_unit: str):
+    """
+    Convierte un área entre dos unidades (nombre o abreviatura).
+
+    Returns:
+        float: Área convertida, o None si alguna unidad no es conocida.
+    """
+    if from_unit == to_unit:
+        return float(area)
+    from_factor = square_meters_per_unit(from_unit)
+    to_factor = square_meters_per_unit(to_unit)
+    if from_factor is None or to_factor is None:
+        return None
+    return float(area) * from_factor / to_factor
+
+
+def square_meters_to_unit(area_m2: float, unit_name: str = None, abbreviation: str = None):
+    """
+    Convierte un área en metros cuadrados a una unidad de `area_units`.
+
+    Returns:
+        float: Área en la unidad indicada, o None si la unidad no es conocida.
+    """
+    factor = square_meters_per_unit(unit_name, abbreviation)
+    if factor is None:
+        return None
+    return float(area_m2) / factor
+
+
+def square_meters_factor_sql(unit_name: ColumnElement, abbreviation: ColumnElement) -> ColumnElement:
+    """
+    Expresión SQL con los metros cuadrados por unidad de las columnas de `area_units`
+    indicadas, para convertir áreas dentro de una consulta.
+
+    Args:
+        unit_name: Columna con el nombre de la unidad.
+        abbreviation: Columna con la abreviatura de la unidad.
+
+    Returns:
+        ColumnElement: Factor numérico, o NULL si la unidad no es conocida.
+    """
+    factors = {key: literal(factor, Numeric) for key, factor in SQUARE_METERS_PER_UNIT.items()}
+    by_name = case(factors, value=func.lower(func.trim(unit_name)), else_=None)
+    return case(factors, value=func.lower(func.trim(abbreviation)), else_=by_name)
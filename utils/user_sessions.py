@@ -0,0 +1,275 @@
+"""
+Sesiones por dispositivo en la tabla `user_sessions`.
+
+Cada login crea una fila con el hash SHA-256 del token (el token en claro no se guarda),
+la información del dispositivo y las fechas de creación y último uso. Un usuario puede
+tener varias sesiones abiertas y cada una se revoca por separado.
+
+El último uso (`last_seen_at`) no se escribe en cada solicitud: se acumula en memoria y un
+hilo en segundo plano lo vuelca en un solo UPDATE por lote cada
+SESSION_LAST_SEEN_FLUSH_INTERVAL segundos.
+"""
+import os
+import secrets
+import hashlib
+import logging
+import datetime
+import threading
+from sqlalchemy import select, insert, update, delete, literal, text, bindparam, DateTime, Integer, String
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import ARRAY
+from dataBase import SessionLocal
+from models.models import Users, UserSessions
+from utils.session_tokens import SessionUser
+
+logger = logging.getLogger(__name__)
+
+SESSION_LAST_SEEN_FLUSH_INTERVAL = float(os.getenv("SESSION_LAST_SEEN_FLUSH_INTERVAL", 60))
+SESSION_LAST_SEEN_BATCH_SIZE = int(os.getenv("SESSION_LAST_SEEN_BATCH_SIZE", 500))
+
+DEVICE_INFO_MAX_LENGTH = 255
+
+ARRAY_INTEGER = ARRAY(Integer)
+ARRAY_TIMESTAMP = ARRAY(DateTime(timezone=True))
+
+
+def hash_session_token(session_token: str) -> str:
+    """
+    Calcula el hash con el que se guarda un token de sesión.
+
+    Args:
+        session_token (str): Token en claro.
+
+    Returns:
+        str: Hash SHA-256 en hexadecimal.
+    """
+    return hashlib.sha256(session_token.encode()).hexdigest()
+
+
+class LastSeenTracker:
+    """
+    Acumula el último uso de cada sesión y lo escribe en lotes desde un hilo propio, que se
+    inicia con el primer uso registrado. Si una sesión se usa varias veces entre dos volcados
+    solo se guarda la marca más reciente; si un volcado falla, sus marcas vuelven a quedar
+    pendientes para el siguiente.
+    """
+
+    def __init__(self, session_factory=SessionLocal, interval: float = SESSION_LAST_SEEN_FLUSH_INTERVAL,
+                 batch_size: int = SESSION_LAST_SEEN_BATCH_SIZE):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def touch(self, user_session_id: int):
+        """Registra el uso de una sesión; el volcado lo hace el hilo en segundo plano."""
+        with self._lock:
+            self._pending[user_session_id] = datetime.datetime.now(datetime.timezone.utc)
+        if self._worker is None:
+            self._start()
+
+    def forget(self, user_session_id: int):
+        """Descarta el último uso pendiente de una sesión revocada."""
+        with self._lock:
+            self._pending.pop(user_session_id, None)
+
+    def _start(self):
+        with self._worker_lock:
+            if self._worker is None and not self._stop.is_set():
+                self._worker = threading.Thread(target=self._run, name="session-last-seen", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def stop(self):
+        """Detiene el hilo de volcado y escribe lo que quede pendiente."""
+        self._stop.set()
+        with self._worker_lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.join()
+        self.flush()
+
+    def _restore(self, pending: dict):
+        """Vuelve a dejar pendientes las marcas de un volcado fallido, sin pisar las más recientes."""
+        with self._lock:
+            for user_session_id, seen in pending.items():
+                current = self._pending.get(user_session_id)
+                if current is None or current < seen:
+                    self._pending[user_session_id] = seen
+
+    def flush(self) -> int:
+        """
+        Escribe los últimos usos pendientes.
+
+        Returns:
+            int: Número de sesiones actualizadas.
+        """
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        pending = {}
+        try:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            items = list(pending.items())
+            statement = text(
+                "UPDATE user_sessions AS s SET last_seen_at = v.seen "
+                "FROM unnest(:ids, :seen) AS v(id, seen) "
+                "WHERE s.user_session_id = v.id AND s.last_seen_at < v.seen"
+            ).bindparams(
+                bindparam("ids", type_=ARRAY_INTEGER),
+                bindparam("seen", type_=ARRAY_TIMESTAMP),
+            )
+            with self.session_factory() as db:
+                for start in range(0, len(items), self.batch_size):
+                    chunk = items[start:start + self.batch_size]
+                    db.execute(statement, {"ids": [i for i, _ in chunk], "seen": [s for _, s in chunk]})
+                db.commit()
+            return len(items)
+        except Exception as e:
+            logger.error("Error al guardar el último uso de las sesiones: %s", str(e))
+            self._restore(pending)
+            return 0
+        finally:
+            self._flush_lock.release()
+
+
+last_seen_tracker = LastSeenTracker()
+
+
+def login_verified_user(db: Session, user_id: int, verified_state_id: int, user_values: dict,
+                        device_info: str = None):
+    """
+    Actualiza el usuario y abre su sesión en una sola sentencia:
+    `WITH updated AS (UPDATE users ... WHERE user_id = ? AND user_state_id = <verificado>
+    RETURNING user_id) INSERT INTO user_sessions ... SELECT ... FROM updated`.
+    Si el usuario dejó de estar verificado no se actualiza nada ni se crea la sesión.
+    Se confirma con el siguiente `db.commit()`.
+
+    Args:
+        db (Session): Sesión de base de datos.
+        user_id (int): ID del usuario.
+        verified_state_id (int): ID del estado "Verificado" de usuarios.
+        user_values (dict): Columnas de `users` a actualizar (p. ej. fcm_token).
+        device_info (str): Descripción del dispositivo.
+
+    Returns:
+        str: Token de sesión en claro, o None si el usuario no está verificado.
+    """
+    session_token = secrets.token_urlsafe(32)
+    updated = (
+        update(Users)
+        .where(Users.user_id == user_id, Users.user_state_id == verified_state_id)
+        .values(**user_values)
+        .returning(Users.user_id)
+        .cte("updated")
+    )
+    statement = (
+        insert(UserSessions)
+        .from_select(
+            ["user_id", "token_hash", "device_info"],
+            select(
+                updated.c.user_id,
+                literal(hash_session_token(session_token), String),
+                literal(device_info[:DEVICE_INFO_MAX_LENGTH] if device_info else None, String),
+            ),
+        )
+        .returning(UserSessions.user_session_id)
+    )
+    if db.execute(statement).scalar() is None:
+        return None
+    return session_token
+
+
+def verify_user_session(session_token: str, db: Session):
+    """
+    Busca la sesión del token en `user_sessions` y registra su uso.
+
+    Args:
+        session_token (str): Token de sesión recibido.
+        db (Session): Sesión de base de datos.
+
+    Returns:
+        SessionUser: Usuario de la sesión (con `user_session_id`), o None si no existe.
+    """
+    row = db.execute(
+        select(UserSessions.user_session_id, UserSessions.user_id)
+        .where(UserSessions.token_hash == hash_session_token(session_token))
+    ).first()
+    if row is None:
+        return None
+    last_seen_tracker.touch(row.user_session_id)
+    user = SessionUser(row.user_id, db)
+    object.__setattr__(user, "user_session_id", row.user_session_id)
+    return user
+
+
+def list_sessions(db: Session, user_id: int) -> list:
+    """
+    Lista las sesiones abiertas de un usuario, de la más reciente a la más antigua.
+
+    Returns:
+        list: Filas de `UserSessions`.
+    """
+    last_seen_tracker.flush()
+    return (
+        db.query(UserSessions)
+        .filter(UserSessions.user_id == user_id)
+        .order_by(UserSessions.last_seen_at.desc())
+        .all()
+    )
+
+
+def revoke_session(db: Session, user_id: int, user_session_id: int) -> bool:
+    """
+    Cierra una sesión del usuario. Se confirma con el siguiente `db.commit()`.
+
+    Returns:
+        bool: Verdadero si la sesión existía y pertenecía al usuario.
+    """
+    deleted = db.execute(
+        delete(UserSessions)
+        .where(UserSessions.user_session_id == user_session_id, UserSessions.user_id == user_id)
+    ).rowcount
+    last_seen_tracker.forget(user_session_id)
+    return deleted > 0
+
+
+def revoke_session_token(db: Session, session_token: str) -> bool:
+    """
+    Cierra la sesión de un token. Se confirma con el siguiente `db.commit()`.
+
+    Returns:
+        bool: Verdadero si el token correspondía a una sesión.
+    """
+    user_session_id = db.execute(
+        delete(UserSessions)
+        .where(UserSessions.token_hash == hash_session_token(session_token))
+        .returning(UserSessions.user_session_id)
+    ).scalar()
+    if user_session_id is not None:
+        last_seen_tracker.forget(user_session_id)
+    return user_session_id is not None
+
+
+def revoke_other_sessions(db: Session, user_id: int, keep_session_token: str = None) -> int:
+    """
+    Cierra todas las sesiones del usuario excepto la del token `keep_session_token`. Se
+    confirma con el siguiente `db.commit()`.
+
+    Returns:
+        int: Número de sesiones cerradas.
+    """
+    query = delete(UserSessions).where(UserSessions.user_id == user_id)
+    if keep_session_token:
+        query = query.where(UserSessions.token_hash != hash_session_token(keep_session_token))
+    return db.execute(query).rowcount